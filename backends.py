@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+
+# Backend de inferencia de la API (variables de entorno):
+#   keras  -> modelo .h5 con TensorFlow (por defecto)
+#   tflite -> modelo .tflite convertido con convert_models.py (tflite-runtime o tf.lite)
+#   onnx   -> modelo .onnx convertido con convert_models.py (onnxruntime, sin TensorFlow)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+# Variante de cuantización del modelo TFLite: none o dynamic. float16 no se ofrece: con las LSTM
+# de estos modelos sus salidas no coinciden con Keras (top-1 ~3 %) y varían entre llamadas
+TFLITE_QUANTIZATION = os.environ.get('TFLITE_QUANTIZATION', 'none')
+# Hilos de los backends TFLite y ONNX Runtime: se usa el mismo valor que para TensorFlow
+# (0 = valor por defecto del runtime); gunicorn.conf.py lo reparte entre los workers
+INFERENCE_THREADS = int(os.environ.get('TF_INTRA_OP_THREADS', 0))
+
+BACKENDS = ('keras', 'tflite', 'onnx')
+QUANTIZATIONS = ('none', 'dynamic')
+
+
+def converted_path(h5_path, backend, quantization='none'):
+    """Ruta del modelo convertido junto al .h5: actionAbecedario.onnx, actionAbecedario.dynamic.tflite..."""
+    stem = os.path.splitext(h5_path)[0]
+    if backend == 'onnx':
+        return f"{stem}.onnx"
+    if backend == 'tflite':
+        return f"{stem}.tflite" if quantization == 'none' else f"{stem}.{quantization}.tflite"
+    return h5_path
+
+
+class _BackendModel:
+    """Interfaz común con CompiledModel: model_id, input_shape, output_shape, warmup() y predict()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.model_id = f"{path}@{time.time_ns()}"
+
+    def warmup(self, batch_size=1):
+        start = time.perf_counter()
+        self.predict(np.zeros((batch_size, self.input_shape[1], self.input_shape[2]), dtype=np.float32))
+        return time.perf_counter() - start
+
+
+class TFLiteModel(_BackendModel):
+    """
+    Modelo .tflite. El convertidor solo puede fusionar las LSTM con un tamaño de batch fijo,
+    así que el modelo se exporta con batch 1 y `predict` recorre las filas del batch.
+    El intérprete no es seguro entre hilos: las llamadas se serializan con un lock.
+    """
+
+    def __init__(self, path, num_threads=INFERENCE_THREADS):
+        super().__init__(path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf # Sin tflite-runtime se usa el intérprete de TensorFlow
+            Interpreter = tf.lite.Interpreter
+        self._interpreter = Interpreter(model_path=path, num_threads=num_threads or None)
+        self._interpreter.allocate_tensors()
+        input_details = self._interpreter.get_input_details()[0]
+        output_details = self._interpreter.get_output_details()[0]
+        self._input_index = input_details['index']
+        self._output_index = output_details['index']
+        self.input_shape = (None, *[int(d) for d in input_details['shape'][1:]])
+        self.output_shape = (None, *[int(d) for d in output_details['shape'][1:]])
+        self._lock = threading.Lock()
+
+    def predict(self, input_data):
+        input_data = np.asarray(input_data, dtype=np.float32)
+        outputs = np.empty((len(input_data), self.output_shape[1]), dtype=np.float32)
+        with self._lock:
+            for i, sample in enumerate(input_data):
+                self._interpreter.set_tensor(self._input_index, sample[np.newaxis])
+                self._interpreter.invoke()
+                outputs[i] = self._interpreter.get_tensor(self._output_index)[0]
+        return outputs
+
+
+class OnnxModel(_BackendModel):
+    """Modelo .onnx ejecutado con ONNX Runtime en CPU (batch dinámico; la sesión es segura entre hilos)."""
+
+    def __init__(self, path, num_threads=INFERENCE_THREADS):
+        super().__init__(path)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self._session.get_inputs()[0]
+        model_output = self._session.get_outputs()[0]
+        self._input_name = model_input.name
+        self.input_shape = (None, *model_input.shape[1:])
+        self.output_shape = (None, *model_output.shape[1:])
+
+    def predict(self, input_data):
+        input_data = np.ascontiguousarray(input_data, dtype=np.float32)
+        return self._session.run(None, {self._input_name: input_data})[0]
+
+
+def load_backend_model(h5_path, backend=INFERENCE_BACKEND, quantization=TFLITE_QUANTIZATION, warmup=True):
+    """
+    Carga el modelo `h5_path` con el backend indicado. Los backends tflite y onnx usan el
+    archivo convertido junto al .h5 (ver convert_models.py) y no importan TensorFlow salvo
+    que haga falta el intérprete de tf.lite.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de inferencia desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    if backend == 'keras':
+        from inference import load_compiled_model
+        return load_compiled_model(h5_path, warmup=warmup)
+    if backend == 'tflite' and quantization not in QUANTIZATIONS:
+        raise ValueError(f"Cuantización TFLite no soportada: {quantization} (opciones: {', '.join(QUANTIZATIONS)})")
+
+    path = converted_path(h5_path, backend, quantization)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No se encontró {path}. Genera el modelo con: python convert_models.py --formats {backend}")
+    model = TFLiteModel(path) if backend == 'tflite' else OnnxModel(path)
+    if warmup:
+        elapsed = model.warmup()
+        print(f"Modelo {path} ({backend}) precalentado en {elapsed * 1000:.1f} ms.")
+    return model
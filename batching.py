@@ -0,0 +1,114 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+
+
+# Configuración del micro-batching (se puede ajustar con variables de entorno)
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 32))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 5))
+# Máximo de secuencias aceptadas por solicitud en los endpoints /batch
+BATCH_ENDPOINT_MAX_ITEMS = int(os.environ.get('BATCH_ENDPOINT_MAX_ITEMS', 256))
+
+
+class MicroBatcher:
+    """
+    Agrupa las solicitudes de inferencia que llegan al mismo tiempo en un solo batch.
+
+    Cada llamada a `predict` encola una muestra de forma (SEQUENCE_LENGTH, FEATURES) y
+    espera su resultado. Un hilo de fondo toma la primera muestra de la cola, espera
+    como máximo `max_wait_ms` a que lleguen más (hasta `max_batch_size`), ejecuta una
+    única pasada del modelo y devuelve a cada llamador su fila de probabilidades.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, name='batcher'):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # El hilo se arranca en el primer uso (y de nuevo tras un fork del proceso),
+        # porque los hilos no sobreviven a un fork.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f"micro-batcher-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit(self, sample):
+        """Encola una muestra y devuelve un Future con su fila de probabilidades."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((np.asarray(sample, dtype=np.float32), future))
+        metrics.set_queue_depth(f"batcher:{self.name}", self._queue.qsize())
+        return future
+
+    def predict(self, sample, timeout=None):
+        """Encola una muestra y bloquea hasta obtener su fila de probabilidades."""
+        return self.submit(sample).result(timeout=timeout)
+
+    def close(self):
+        """Detiene el hilo de fondo después de atender lo que ya está en cola (p. ej., al descargar el modelo)."""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                self._queue.put(None) # Marca de fin para el hilo
+            self._thread = None
+
+    def _collect_batch(self):
+        """Devuelve (batch, closing); `closing` indica que llegó la marca de fin de close()."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Tomar lo que ya esté en cola sin esperar más
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        metrics.set_context('micro_batcher', self.name)
+        while True:
+            batch, closing = self._collect_batch()
+            if not batch:
+                return
+            futures = [future for _, future in batch]
+            metrics.set_queue_depth(f"batcher:{self.name}", self._queue.qsize())
+            try:
+                inputs = np.stack([sample for sample, _ in batch])
+                # La pasada del modelo se registra con endpoint 'micro_batcher': agrupa solicitudes de varios endpoints
+                with metrics.stage('forward'):
+                    outputs = np.asarray(self.predict_fn(inputs))
+                for i, future in enumerate(futures):
+                    future.set_result(outputs[i])
+            except Exception as e:
+                print(f"Error en el micro-batcher '{self.name}' (batch de {len(batch)}): {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            if closing:
+                return
@@ -0,0 +1,305 @@
+# benchmark_api.py
+# Banco de pruebas reproducible de la API, sin red: las solicitudes se hacen con el cliente de
+# pruebas de Flask sobre la aplicación de main.py. Mide latencia (p50/p95/p99) y throughput de
+# cada endpoint con varios niveles de concurrencia y tamaños de lote, y por separado las piezas
+# que los componen: process_video_sign, la pasada del modelo y la codificación JSON.
+# Usa test/secuencia_r.json, test/secuencia_adios.json, keypoints sintéticos (semilla fija) y
+# un video pequeño generado localmente. El informe se guarda en JSON para comparar ejecuciones.
+#
+#   python benchmark_api.py                                  # suite completa
+#   python benchmark_api.py --quick                          # menos solicitudes (CI)
+#   python benchmark_api.py --groups endpoints --concurrency 1 8
+#   python benchmark_api.py --compare cache/benchmarks/base.json --max-regression 15
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+GROUPS = ('endpoints', 'video', 'components')
+FIXTURES = {'alphabet': './test/secuencia_r.json', 'words_v2': './test/secuencia_adios.json'}
+
+
+def latency_summary(latencies, wall_seconds):
+    """Percentiles en milisegundos y throughput (solicitudes por segundo) de una medición."""
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies_ms),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(latencies_ms.mean()),
+        "max_ms": float(latencies_ms.max()),
+        "throughput_rps": len(latencies_ms) / wall_seconds if wall_seconds > 0 else None,
+    }
+
+
+def run_load(call, requests, concurrency):
+    """
+    Ejecuta `call()` `requests` veces con `concurrency` hilos. Si `call` devuelve un código
+    HTTP (int), se cuenta en `statuses`. Devuelve el resumen de latencias y el conteo de códigos.
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        status = call()
+        elapsed = time.perf_counter() - start
+        status = str(status) if isinstance(status, int) else 'None' # Los componentes no devuelven código HTTP
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    summary = latency_summary(latencies, time.perf_counter() - start)
+    summary["statuses"] = statuses
+    summary["errors"] = sum(count for status, count in statuses.items() if status not in ('200', '202', 'None'))
+    return summary
+
+
+def make_video(path, frames=60, fps=30, size=(320, 240)):
+    """Genera un video MP4 sintético y determinista (un círculo que se desplaza sobre fondo liso)."""
+    import cv2
+
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    try:
+        for i in range(frames):
+            frame = np.full((height, width, 3), 200, dtype=np.uint8)
+            center = (int(width * (0.2 + 0.6 * i / max(1, frames - 1))), height // 2)
+            cv2.circle(frame, center, height // 6, (90, 140, 200), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def load_fixture(name):
+    with open(FIXTURES[name]) as f:
+        return np.asarray(json.load(f)['keypoints'], dtype=np.float32)
+
+
+class Benchmark:
+    """Ejecuta los escenarios seleccionados y acumula los resultados del informe."""
+
+    def __init__(self, args):
+        self.args = args
+        self.results = []
+        self.rng = np.random.default_rng(args.seed)
+
+    def record(self, group, name, concurrency=1, batch_size=None, **summary):
+        result = {"group": group, "name": name, "concurrency": concurrency, "batch_size": batch_size, **summary}
+        self.results.append(result)
+        label = name if batch_size is None else f"{name} (lote {batch_size})"
+        throughput = f"{summary['throughput_rps']:.1f}" if summary.get('throughput_rps') else '-'
+        print(f"{group:<11} {label:<44} {concurrency:>4} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} "
+              f"{summary['p99_ms']:>9.2f} {throughput:>9} {summary.get('errors', 0):>7}")
+
+    def synthetic_batch(self, batch_size, shape):
+        # Valores en [0, 1) como las coordenadas normalizadas de MediaPipe
+        return self.rng.random((batch_size, *shape), dtype=np.float32)
+
+    def run_endpoints(self, client_factory):
+        """Endpoints de keypoints: JSON y binario con las secuencias de test/, y /batch con lotes sintéticos."""
+        adios = load_fixture('words_v2')
+        scenarios = [
+            ('/predict_recognition_alphabet', 'alphabet_json', {'json': {'keypoints': load_fixture('alphabet').tolist()}}),
+            ('/predict_recognition_words_v2', 'words_v2_json', {'json': {'keypoints': adios.tolist()}}),
+            ('/predict_recognition_words_v2', 'words_v2_raw',
+             {'data': adios.astype('<f4').tobytes(), 'content_type': 'application/octet-stream'}),
+            ('/predict_recognition_words_v2?top_k=3&precision=4', 'words_v2_json_top3', {'json': {'keypoints': adios.tolist()}}),
+            ('/predict_recognition_words_v2?format=msgpack', 'words_v2_raw_msgpack',
+             {'data': adios.astype('<f4').tobytes(), 'content_type': 'application/octet-stream'}),
+        ]
+        for model_name, shape in (('alphabet', (30, 126)), ('words_v2', (30, 258))):
+            for batch_size in self.args.batch_sizes:
+                payload = {'json': {'sequences': self.synthetic_batch(batch_size, shape).tolist()}}
+                scenarios.append((f'/predict_recognition_{model_name}/batch', f'{model_name}_batch', payload, batch_size))
+
+        for scenario in scenarios:
+            path, name, payload = scenario[:3]
+            batch_size = scenario[3] if len(scenario) > 3 else None
+            self.measure_endpoint(client_factory, path, name, payload, batch_size, self.args.requests)
+
+    def run_video(self, client_factory, video_path):
+        """Endpoints de video y transcripción con el video local (pool de Holistic incluido)."""
+        self.measure_endpoint(client_factory, '/predict_recognition_video_words_v2', 'video_words_v2',
+                              {'json': {'url_video': video_path}}, None, self.args.video_requests)
+        self.measure_endpoint(client_factory, '/predict_recognition_video_alphabet', 'video_alphabet',
+                              {'json': {'url_video': video_path}}, None, self.args.video_requests)
+        self.measure_endpoint(client_factory, '/transcribe', 'transcribe_words_v2',
+                              {'json': {'url_video': video_path}}, None, self.args.video_requests, concurrency_levels=[1])
+
+    def measure_endpoint(self, client_factory, path, name, payload, batch_size, requests, concurrency_levels=None):
+        if 'json' in payload:
+            # Se codifica una sola vez: con json= el cliente de pruebas lo haría en cada solicitud y se mediría también
+            payload = {'data': json.dumps(payload['json']), 'content_type': 'application/json'}
+        local = threading.local()
+
+        def call():
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = client_factory()
+            return client.post(path, **payload).status_code
+
+        call() # Calentamiento: carga del modelo, trazado y arranque del pool de Holistic
+        for concurrency in concurrency_levels or self.args.concurrency:
+            self.record('endpoint', name, concurrency, batch_size, **run_load(call, requests, concurrency))
+
+    def run_components(self, video_path):
+        """Piezas por separado: codificación JSON, pasada del modelo y process_video_sign."""
+        import main
+        import utils
+
+        adios = load_fixture('words_v2')
+        body = json.dumps({'keypoints': adios.tolist()})
+        response = {"prediction": "adios", "probabilities": self.rng.random(28).tolist()}
+        components = [
+            ('json_decode_keypoints', lambda: json.loads(body)),
+            ('array_conversion', lambda: np.array(json.loads(body)['keypoints'], dtype=np.float32)),
+            ('json_encode_keypoints', lambda: json.dumps({'keypoints': adios.tolist()})),
+            ('json_encode_response', lambda: json.dumps(response)),
+            ('flask_json_encode_response', lambda: main.app.json.dumps(response)), # orjson si está instalado
+        ]
+        for name, fn in components:
+            fn()
+            self.record('component', name, **run_load(fn, self.args.requests * 10, 1))
+
+        for model_name in ('alphabet', 'words_v2'):
+            with main.model_registry.acquire(model_name) as entry:
+                for batch_size in self.args.batch_sizes:
+                    batch = self.synthetic_batch(batch_size, entry.input_shape)
+                    entry.model.predict(batch)
+                    self.record('component', f'forward_{model_name}', 1, batch_size,
+                                **run_load(lambda: entry.model.predict(batch), self.args.requests, 1))
+
+        holistic = utils.create_holistic()
+        try:
+            for type_extract, target_frames in (('pose_hands', 30), ('pose_hands', None), ('hands', 30)):
+                def extract():
+                    utils.process_video_sign(type_extract, video_path, holistic=holistic, target_frames=target_frames)
+                extract()
+                sampled = 'muestreado' if target_frames else 'completo'
+                self.record('component', f'process_video_sign_{type_extract}_{sampled}',
+                            **run_load(extract, self.args.video_requests, 1))
+        finally:
+            holistic.close()
+
+
+def environment_info(args):
+    """Datos de la ejecución para saber si dos informes son comparables."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "inference_backend": os.environ.get('INFERENCE_BACKEND', 'keras'),
+        "caches": args.with_caches,
+        "seed": args.seed,
+        "requests": args.requests,
+        "video_requests": args.video_requests,
+        "concurrency": args.concurrency,
+        "batch_sizes": args.batch_sizes,
+    }
+
+
+def result_key(result):
+    return (result['group'], result['name'], result['concurrency'], result['batch_size'])
+
+
+def compare_reports(baseline, current, max_regression):
+    """Imprime la variación de p50/p95 respecto a `baseline`; devuelve las regresiones de p95 mayores a `max_regression` %."""
+    previous = {result_key(r): r for r in baseline['results']}
+    regressions = []
+    print(f"\nComparación con {baseline['environment'].get('commit')} ({baseline['environment'].get('timestamp')})")
+    print(f"{'escenario':<52} {'p50 %':>8} {'p95 %':>8}")
+    for result in current['results']:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        p50_change = (result['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] else 0.0
+        p95_change = (result['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0.0
+        group, name, concurrency, batch_size = result_key(result)
+        label = f"{name} c={concurrency}" + (f" lote={batch_size}" if batch_size is not None else '')
+        flag = '  <-- regresión' if p95_change > max_regression else ''
+        print(f"{label:<52} {p50_change:>+8.1f} {p95_change:>+8.1f}{flag}")
+        if p95_change > max_regression:
+            regressions.append(label)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reproducible de la API (sin red, con el cliente de pruebas de Flask).")
+    parser.add_argument('--groups', nargs='+', choices=GROUPS, default=list(GROUPS), help="Partes de la suite a ejecutar")
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16], help="Niveles de concurrencia (hilos)")
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32], help="Tamaños de lote para /batch y el modelo")
+    parser.add_argument('--requests', type=int, default=100, help="Solicitudes por escenario de keypoints")
+    parser.add_argument('--video-requests', type=int, default=8, help="Solicitudes por escenario de video")
+    parser.add_argument('--video', help="Video local a usar (por defecto se genera uno sintético)")
+    parser.add_argument('--video-frames', type=int, default=60, help="Fotogramas del video sintético")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla de los keypoints sintéticos")
+    parser.add_argument('--with-caches', action='store_true',
+                        help="Mantener las cachés de predicciones y keypoints (por defecto se desactivan para medir el trabajo real)")
+    parser.add_argument('--quick', action='store_true', help="20 solicitudes por escenario y 3 por video")
+    parser.add_argument('--report', help="Archivo JSON del informe (por defecto cache/benchmarks/api-<fecha>.json)")
+    parser.add_argument('--compare', help="Informe anterior con el que comparar")
+    parser.add_argument('--max-regression', type=float, default=10.0,
+                        help="Aumento máximo de p95 (%%) respecto a --compare antes de terminar con código 1")
+    args = parser.parse_args()
+    if args.quick:
+        args.requests, args.video_requests = 20, 3
+
+    # Las cachés se configuran al importar main.py: sin ellas, cada solicitud repetida pasa por el modelo y por Holistic
+    if not args.with_caches:
+        os.environ['PREDICTION_CACHE_ENABLED'] = '0'
+        os.environ['KEYPOINT_CACHE_ENABLED'] = '0'
+    import main as app_main
+
+    benchmark = Benchmark(args)
+    print(f"{'grupo':<11} {'escenario':<44} {'conc':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sol/s':>9} {'errores':>7}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        video_path = args.video
+        if video_path is None and ('video' in args.groups or 'components' in args.groups):
+            video_path = make_video(os.path.join(tmpdir, 'benchmark.mp4'), frames=args.video_frames)
+
+        if 'endpoints' in args.groups:
+            benchmark.run_endpoints(app_main.app.test_client)
+        if 'video' in args.groups:
+            benchmark.run_video(app_main.app.test_client, video_path)
+        if 'components' in args.groups:
+            benchmark.run_components(video_path)
+
+    report = {"environment": environment_info(args), "results": benchmark.results}
+    report_path = args.report or os.path.join('cache', 'benchmarks', f"api-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nInforme guardado en {report_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_reports(json.load(f), report, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} escenarios con p95 más de {args.max_regression:.0f} % peor que el informe anterior.")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
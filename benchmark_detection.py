@@ -0,0 +1,235 @@
+# benchmark_detection.py
+# Informe de precisión frente a velocidad de los modos de detección de Holistic: reducción de
+# resolución (VIDEO_MAX_SIDE), recorte a la región de la persona (VIDEO_ROI_CROP) y complejidad
+# del modelo de pose (HOLISTIC_MODEL_COMPLEXITY). Cada variante se compara con la detección a
+# resolución completa, sin recorte y con la complejidad por defecto sobre los mismos clips:
+# tiempo por video, acuerdo de detección (fotogramas en que ambas detectan o no cada parte) y
+# error absoluto en x, y de los puntos detectados por ambas (coordenadas normalizadas).
+# Con --model también se compara la predicción del modelo. Termina con código 1 si alguna
+# variante supera la tolerancia, para validar una configuración antes de desplegarla.
+#
+#   python benchmark_detection.py --video clip1.mp4 clip2.mp4
+#   python benchmark_detection.py --video clip.mp4 --variants max_side=480 roi+max_side=480 complexity=0 --tolerance 0.01
+#   python benchmark_detection.py --video clip.mp4 --model words_v2 --report deteccion.json
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_VARIANTS = ('max_side=640', 'max_side=480', 'max_side=320', 'roi', 'roi+max_side=480', 'complexity=0')
+
+# Partes de cada tipo de extracción: (nombre, inicio, puntos, columnas) dentro del vector de keypoints
+PARTS = {
+    'hands': (('left_hand', 0, 21, 3), ('right_hand', 63, 21, 3)),
+    'pose_hands': (('pose', 0, 33, 4), ('left_hand', 132, 21, 3), ('right_hand', 195, 21, 3)),
+}
+
+
+def parse_variant(spec, default_complexity):
+    """
+    Convierte 'max_side=480', 'roi', 'complexity=0' o combinaciones con '+' (p. ej.,
+    'roi+max_side=480') en los parámetros de process_video_sign.
+    """
+    variant = {'name': spec, 'max_side': 0, 'roi_crop': False, 'model_complexity': default_complexity}
+    for option in spec.split('+'):
+        key, _, value = option.partition('=')
+        if key == 'roi' and not value:
+            variant['roi_crop'] = True
+        elif key == 'max_side' and value.isdigit():
+            variant['max_side'] = int(value)
+        elif key == 'complexity' and value in ('0', '1', '2'):
+            variant['model_complexity'] = int(value)
+        else:
+            raise argparse.ArgumentTypeError(f"Variante no válida: '{spec}' (opciones: max_side=N, roi, complexity=0|1|2)")
+    return variant
+
+
+def compare_keypoints(reference, candidate, type_extract):
+    """
+    Compara los keypoints de una variante con los de referencia, fotograma a fotograma.
+    Devuelve el acuerdo de detección por parte y los errores absolutos en x, y de los puntos
+    que ambas detectan.
+    """
+    frames = min(len(reference), len(candidate))
+    agreement = {}
+    errors = []
+    for name, start, points, columns in PARTS[type_extract]:
+        ref = reference[:frames, start:start + points * columns].reshape(frames, points, columns)
+        cand = candidate[:frames, start:start + points * columns].reshape(frames, points, columns)
+        ref_detected = ref.any(axis=(1, 2))
+        cand_detected = cand.any(axis=(1, 2))
+        agreement[name] = float(np.mean(ref_detected == cand_detected)) if frames else 1.0
+        both = ref_detected & cand_detected
+        errors.append(np.abs(ref[both, :, :2] - cand[both, :, :2]).ravel())
+    errors = np.concatenate(errors)
+    return {
+        "frames": frames,
+        "frame_count_match": len(reference) == len(candidate),
+        "detection_agreement": agreement,
+        "min_detection_agreement": min(agreement.values()),
+        "mean_error": float(errors.mean()) if errors.size else 0.0,
+        "p95_error": float(np.percentile(errors, 95)) if errors.size else 0.0,
+        "max_error": float(errors.max()) if errors.size else 0.0,
+    }
+
+
+def extract(utils, holistic, type_extract, video, target_frames, variant, repeats):
+    """Keypoints de `video` con la variante y mediana del tiempo de extracción (segundos) en `repeats` ejecuciones."""
+    seconds = []
+    keypoints = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        keypoints = utils.process_video_sign(type_extract, video, holistic=holistic, target_frames=target_frames,
+                                             max_side=variant['max_side'], roi_crop=variant['roi_crop'])
+        seconds.append(time.perf_counter() - start)
+    if keypoints is None:
+        raise RuntimeError(f"No se pudo abrir el video {video}")
+    return keypoints, float(np.median(seconds))
+
+
+def environment_info(args):
+    """Datos de la ejecución para saber si dos informes son comparables."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "videos": args.video,
+        "type_extract": args.type_extract,
+        "target_frames": args.target_frames,
+        "repeats": args.repeats,
+        "tolerance": args.tolerance,
+        "min_agreement": args.min_agreement,
+        "model": args.model,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión frente a velocidad de la detección reducida, con recorte o con otra complejidad de Holistic.")
+    parser.add_argument('--video', nargs='+', required=True, help="Clips de muestra (con una persona señando)")
+    parser.add_argument('--variants', nargs='+', default=list(DEFAULT_VARIANTS),
+                        help="Variantes a comparar: max_side=N, roi, complexity=0|1|2 o combinaciones con '+'")
+    parser.add_argument('--type-extract', choices=sorted(PARTS), default='pose_hands')
+    parser.add_argument('--target-frames', type=int, help="Procesar solo N fotogramas muestreados, como los endpoints (por defecto todos)")
+    parser.add_argument('--repeats', type=int, default=3, help="Ejecuciones por clip y variante (se usa la mediana del tiempo)")
+    parser.add_argument('--tolerance', type=float, default=0.02, help="Error medio máximo en x, y (coordenadas normalizadas)")
+    parser.add_argument('--min-agreement', type=float, default=0.95, help="Acuerdo de detección mínimo de cada parte")
+    parser.add_argument('--model', help="Modelo del registro con el que comparar también las predicciones (fija --type-extract)")
+    parser.add_argument('--report', help="Archivo JSON del informe (por defecto cache/benchmarks/detection-<fecha>.json)")
+    args = parser.parse_args()
+
+    import utils
+
+    baseline = {'name': 'referencia', 'max_side': 0, 'roi_crop': False, 'model_complexity': utils.HOLISTIC_MODEL_COMPLEXITY}
+    try:
+        variants = [parse_variant(spec, baseline['model_complexity']) for spec in args.variants]
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    pipeline = None
+    if args.model:
+        os.environ['PREDICTION_CACHE_ENABLED'] = '0'
+        import main as app_main
+        from pipeline import InferencePipeline
+        # El modelo queda cargado (y sin descargarse) hasta que termina el script
+        entry = contextlib.ExitStack().enter_context(app_main.model_registry.acquire(args.model))
+        if entry is None:
+            sys.exit(f"No se pudo cargar el modelo {args.model}")
+        pipeline = InferencePipeline.for_model(entry, micro_batcher=None)
+        args.type_extract = entry.type_extract
+
+    # Una instancia de Holistic por complejidad; las que no se pueden crear (modelo de pose no
+    # descargado) se informan como error de sus variantes
+    holistics = {}
+    for complexity in {baseline['model_complexity'], *(v['model_complexity'] for v in variants)}:
+        try:
+            holistics[complexity] = utils.create_holistic(complexity)
+        except Exception as e:
+            holistics[complexity] = e
+    if isinstance(holistics[baseline['model_complexity']], Exception):
+        sys.exit(f"No se pudo crear Holistic de referencia: {holistics[baseline['model_complexity']]}")
+
+    def run(variant, video):
+        holistic = holistics[variant['model_complexity']]
+        # Calentamiento: grafo, códecs y buffers
+        utils.process_video_sign(args.type_extract, video, holistic=holistic, target_frames=args.target_frames,
+                                 max_side=variant['max_side'], roi_crop=variant['roi_crop'])
+        return extract(utils, holistic, args.type_extract, video, args.target_frames, variant, args.repeats)
+
+    references = {video: run(baseline, video) for video in args.video}
+    reference_seconds = sum(seconds for _, seconds in references.values())
+
+    results = []
+    print(f"{'variante':<22} {'ms/video':>9} {'acelerac.':>9} {'acuerdo':>8} {'err medio':>10} {'err p95':>9} {'err máx':>9} {'predic.':>8}  resultado")
+    print(f"{baseline['name']:<22} {reference_seconds / len(args.video) * 1000:>9.1f} {1.0:>8.2f}x")
+    for variant in variants:
+        result = {**variant, "error": None, "clips": []}
+        results.append(result)
+        if isinstance(holistics[variant['model_complexity']], Exception):
+            result["error"] = str(holistics[variant['model_complexity']])
+            result["passed"] = False
+            print(f"{variant['name']:<22} error: {result['error']}")
+            continue
+
+        seconds = 0.0
+        for video in args.video:
+            reference, _ = references[video]
+            keypoints, clip_seconds = run(variant, video)
+            seconds += clip_seconds
+            clip = {"video": video, "seconds": clip_seconds, **compare_keypoints(reference, keypoints, args.type_extract)}
+            if pipeline is not None:
+                predictions = pipeline.forward(np.stack([pipeline.sample(reference), pipeline.sample(keypoints)]))
+                clip["reference_prediction"] = pipeline.label(np.argmax(predictions[0]))
+                clip["prediction"] = pipeline.label(np.argmax(predictions[1]))
+            result["clips"].append(clip)
+
+        clips = result["clips"]
+        result["ms_per_video"] = seconds / len(clips) * 1000
+        result["speedup"] = reference_seconds / seconds if seconds > 0 else None
+        result["min_detection_agreement"] = min(c["min_detection_agreement"] for c in clips)
+        result["mean_error"] = float(np.mean([c["mean_error"] for c in clips]))
+        result["p95_error"] = max(c["p95_error"] for c in clips)
+        result["max_error"] = max(c["max_error"] for c in clips)
+        result["prediction_agreement"] = (float(np.mean([c["prediction"] == c["reference_prediction"] for c in clips]))
+                                          if pipeline is not None else None)
+        result["passed"] = (result["mean_error"] <= args.tolerance and result["min_detection_agreement"] >= args.min_agreement
+                            and all(c["frame_count_match"] for c in clips) and result["prediction_agreement"] in (None, 1.0))
+        prediction = f"{result['prediction_agreement']:>8.2f}" if pipeline is not None else f"{'-':>8}"
+        print(f"{variant['name']:<22} {result['ms_per_video']:>9.1f} {result['speedup'] or 0:>8.2f}x {result['min_detection_agreement']:>8.3f} "
+              f"{result['mean_error']:>10.4f} {result['p95_error']:>9.4f} {result['max_error']:>9.4f} {prediction}  "
+              f"{'OK' if result['passed'] else 'FUERA DE TOLERANCIA'}")
+
+    for holistic in holistics.values():
+        if not isinstance(holistic, Exception):
+            holistic.close()
+
+    report = {
+        "environment": environment_info(args),
+        "baseline": {**baseline, "ms_per_video": reference_seconds / len(args.video) * 1000},
+        "results": results,
+    }
+    report_path = args.report or os.path.join('cache', 'benchmarks', f"detection-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nInforme guardado en {report_path}")
+
+    failed = [r["name"] for r in results if not r["passed"]]
+    if failed:
+        print(f"\n{len(failed)} variantes fuera de tolerancia: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
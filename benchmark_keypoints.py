@@ -0,0 +1,153 @@
+# benchmark_keypoints.py
+# Micro-benchmark de la extracción de keypoints por fotograma: compara las funciones
+# extract_keypoints_* (listas por punto + np.array + concatenate) con write_keypoints_*
+# (escritura directa en el buffer preasignado que usa process_video_sign).
+#
+#   python benchmark_keypoints.py                        # resultados reconstruidos desde test/*.json
+#   python benchmark_keypoints.py --video ./video.mp4    # resultados grabados con Holistic
+#   python benchmark_keypoints.py --report keypoints.json
+import argparse
+import glob
+import json
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+import utils
+
+
+def landmark_list(values, columns):
+    """NormalizedLandmarkList a partir de un vector plano (None si son todo ceros: sin detección)."""
+    points = np.asarray(values, dtype=np.float32).reshape(-1, columns)
+    if not points.any():
+        return None
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+    for point in points:
+        landmark = landmarks.landmark.add()
+        landmark.x, landmark.y, landmark.z = (float(v) for v in point[:3])
+        if columns == 4:
+            landmark.visibility = float(point[3])
+    return landmarks
+
+
+def results_from_sequences():
+    """Reconstruye los resultados de Holistic de las secuencias de test/ (126 o 258 valores por fotograma)."""
+    recorded = []
+    for path in sorted(glob.glob('./test/*.json')):
+        with open(path) as f:
+            frames = np.asarray(json.load(f)['keypoints'], dtype=np.float32)
+        pose_size = 132 if frames.shape[1] == 258 else 0
+        for frame in frames:
+            recorded.append(SimpleNamespace(
+                pose_landmarks=landmark_list(frame[:pose_size], 4) if pose_size else None,
+                left_hand_landmarks=landmark_list(frame[pose_size:pose_size + 63], 3),
+                right_hand_landmarks=landmark_list(frame[pose_size + 63:], 3),
+            ))
+    return recorded
+
+
+def results_from_video(path, max_frames):
+    """Ejecuta Holistic sobre el video y guarda una copia de los resultados de cada fotograma."""
+    import cv2
+
+    recorded = []
+    holistic = utils.create_holistic()
+    cap = cv2.VideoCapture(path)
+    try:
+        while len(recorded) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            _, results = utils.mediapipe_detection(frame, holistic)
+            copies = {}
+            for name in ('pose_landmarks', 'left_hand_landmarks', 'right_hand_landmarks'):
+                landmarks = getattr(results, name)
+                if landmarks is not None:
+                    copies[name] = landmark_pb2.NormalizedLandmarkList()
+                    copies[name].CopyFrom(landmarks)
+                else:
+                    copies[name] = None
+            recorded.append(SimpleNamespace(**copies))
+    finally:
+        cap.release()
+        holistic.close()
+    return recorded
+
+
+def extract_with_lists(recorded, type_extract):
+    """Camino anterior: un vector por fotograma y conversión final a float32, como hacían los endpoints."""
+    extract_keypoints = utils.extract_keypoints_hands if type_extract == 'hands' else utils.extract_keypoints_pose_hands
+    sequence_keypoints = [extract_keypoints(results) for results in recorded]
+    return np.asarray(sequence_keypoints, dtype=np.float32)
+
+
+def extract_with_buffer(recorded, type_extract):
+    """Camino nuevo: escritura directa en un buffer (fotogramas, 126 | 258) float32."""
+    write_keypoints = utils.write_keypoints_hands if type_extract == 'hands' else utils.write_keypoints_pose_hands
+    sequence_keypoints = np.zeros((len(recorded), utils.FEATURES_BY_TYPE[type_extract]), dtype=np.float32)
+    for i, results in enumerate(recorded):
+        write_keypoints(results, sequence_keypoints[i])
+    return sequence_keypoints
+
+
+def measure(extract_fn, recorded, type_extract, repeats):
+    """Microsegundos por fotograma (mejor de `repeats`) y pico de memoria de Python por fotograma en bytes."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        extract_fn(recorded, type_extract)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    extract_fn(recorded, type_extract)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best / len(recorded) * 1e6, peak_bytes / len(recorded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara extract_keypoints_* con write_keypoints_* sobre resultados de Holistic grabados.")
+    parser.add_argument('--video', help="Grabar los resultados de Holistic de este video (por defecto, reconstruirlos desde test/*.json)")
+    parser.add_argument('--max-frames', type=int, default=300, help="Fotogramas a grabar del video")
+    parser.add_argument('--repeats', type=int, default=20, help="Repeticiones de cada medición (se toma la mejor)")
+    parser.add_argument('--report', help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    recorded = results_from_video(args.video, args.max_frames) if args.video else results_from_sequences()
+    if not recorded:
+        parser.error("No hay resultados de Holistic para medir.")
+    # Se repiten los fotogramas para que cada medición dure lo suficiente
+    recorded = recorded * max(1, 1000 // len(recorded))
+
+    report = {"frames": len(recorded), "source": args.video or "test/*.json", "results": []}
+    print(f"{len(recorded)} fotogramas ({report['source']})")
+    print(f"{'type_extract':<12} {'método':<8} {'µs/fotograma':>13} {'pico B/fotograma':>17} {'aceleración':>12}")
+    for type_extract in ('hands', 'pose_hands'):
+        expected = extract_with_lists(recorded, type_extract)
+        if not np.array_equal(extract_with_buffer(recorded, type_extract), expected):
+            raise SystemExit(f"write_keypoints ({type_extract}) no coincide con extract_keypoints.")
+
+        lists_us, lists_peak_bytes = measure(extract_with_lists, recorded, type_extract, args.repeats)
+        buffer_us, buffer_peak_bytes = measure(extract_with_buffer, recorded, type_extract, args.repeats)
+        print(f"{type_extract:<12} {'listas':<8} {lists_us:>13.2f} {lists_peak_bytes:>17.0f} {'':>12}")
+        print(f"{type_extract:<12} {'buffer':<8} {buffer_us:>13.2f} {buffer_peak_bytes:>17.0f} {lists_us / buffer_us:>11.1f}x")
+        report["results"].append({
+            "type_extract": type_extract,
+            "lists_us_per_frame": lists_us,
+            "buffer_us_per_frame": buffer_us,
+            "lists_peak_bytes_per_frame": lists_peak_bytes,
+            "buffer_peak_bytes_per_frame": buffer_peak_bytes,
+            "speedup": lists_us / buffer_us,
+        })
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nInforme guardado en {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# benchmark_video.py
+# Mide el costo en memoria y tiempo de extraer la secuencia de un video (Holistic + muestreo),
+# como lo hacen los endpoints de video, comparando el camino anterior (listas por fotograma,
+# conversión BGR -> RGB -> BGR, relleno con listas) con el actual (buffers reutilizados y un
+# único array float32 contiguo). Cada modo se ejecuta en un proceso nuevo para medir el pico de RSS.
+#
+#   python benchmark_video.py --video ./video.mp4
+#   python benchmark_video.py --video ./video.mp4 --type-extract hands --requests 10 --report video.json
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+MODES = ('legacy', 'current')
+
+
+def legacy_extract(utils, holistic, type_extract, url_video, target_frames):
+    """Camino anterior de process_video_sign + endpoint (solo para comparar)."""
+    import cv2
+
+    cap = cv2.VideoCapture(url_video)
+    extract_keypoints = utils.extract_keypoints_hands if type_extract == 'hands' else utils.extract_keypoints_pose_hands
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    keep_frames, process_frames = utils.select_frames(total_frames, target_frames) if total_frames > target_frames else (None, None)
+    keep_frames = set(keep_frames.tolist()) if keep_frames is not None else None
+    sequence_keypoints = []
+    holistic.reset()
+    frame_index = -1
+    while cap.isOpened():
+        frame_index += 1
+        if process_frames is not None:
+            if frame_index > max(process_frames):
+                break
+            if frame_index not in process_frames:
+                if not cap.grab():
+                    break
+                continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        image.flags.writeable = False
+        results = holistic.process(image)
+        image.flags.writeable = True
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        if keep_frames is None or frame_index in keep_frames:
+            sequence_keypoints.append(extract_keypoints(results))
+    cap.release()
+
+    total_frames_extracted = len(sequence_keypoints)
+    if total_frames_extracted <= target_frames:
+        final_sequence_for_model = sequence_keypoints
+        if total_frames_extracted < target_frames:
+            padding_array = np.zeros((target_frames - total_frames_extracted, len(sequence_keypoints[0])), dtype=np.float32)
+            final_sequence_for_model.extend(padding_array.tolist())
+    else:
+        indices = np.linspace(0, total_frames_extracted - 1, target_frames).astype(int)
+        final_sequence_for_model = [sequence_keypoints[i] for i in indices]
+    return np.array(final_sequence_for_model, dtype=np.float32)
+
+
+def current_extract(utils, holistic, type_extract, url_video, target_frames):
+    """Camino actual: utils.process_video_sign + pipeline.sample_sequence."""
+    from pipeline import sample_sequence
+
+    keypoints = utils.process_video_sign(type_extract, url_video, holistic=holistic, target_frames=target_frames)
+    return sample_sequence(keypoints, target_frames)
+
+
+def run_mode(mode, video, type_extract, target_frames, requests):
+    """Ejecuta `requests` extracciones en este proceso y devuelve las métricas del modo."""
+    import main  # noqa: F401 (ambos modos importan lo mismo, para comparar el RSS)
+    import utils
+
+    extract = legacy_extract if mode == 'legacy' else current_extract
+    holistic = utils.create_holistic() # Una instancia por proceso, como en el pool de Holistic
+    extract(utils, holistic, type_extract, video, target_frames) # Calentamiento: grafo, códecs, imports
+
+    latencies = []
+    peaks = []
+    for _ in range(requests):
+        tracemalloc.start()
+        start = time.perf_counter()
+        input_data = extract(utils, holistic, type_extract, video, target_frames)
+        latencies.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    holistic.close()
+
+    return {
+        "mode": mode,
+        "shape": list(input_data.shape),
+        "checksum": float(np.abs(input_data).sum()),
+        "ms_per_request": float(np.median(latencies) * 1000),
+        # Memoria asignada por Python, NumPy y OpenCV (sus arrays usan el asignador de NumPy) durante la solicitud
+        "traced_peak_kb_per_request": float(np.median(peaks) / 1024),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la memoria y el tiempo del pipeline de video anterior y el actual.")
+    parser.add_argument('--video', required=True, help="Ruta o URL del video")
+    parser.add_argument('--type-extract', choices=['hands', 'pose_hands'], default='pose_hands')
+    parser.add_argument('--target-frames', type=int, default=30, help="Longitud de secuencia del modelo")
+    parser.add_argument('--requests', type=int, default=5, help="Solicitudes medidas por modo")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--report', help="Guardar los resultados en este archivo JSON")
+    parser.add_argument('--run-mode', choices=MODES, help=argparse.SUPPRESS) # Uso interno: un modo por proceso
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args.run_mode, args.video, args.type_extract, args.target_frames, args.requests)))
+        return
+
+    results = []
+    for mode in args.modes:
+        command = [sys.executable, __file__, '--video', args.video, '--type-extract', args.type_extract,
+                   '--target-frames', str(args.target_frames), '--requests', str(args.requests), '--run-mode', mode]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{args.video} ({args.type_extract}, {args.target_frames} fotogramas, {args.requests} solicitudes por modo)")
+    print(f"{'modo':<8} {'ms/solicitud':>13} {'pico KB/solicitud':>18} {'pico RSS MB':>12}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['ms_per_request']:>13.1f} {r['traced_peak_kb_per_request']:>18.0f} {r['peak_rss_mb']:>12.0f}")
+    if len({(tuple(r['shape']), round(r['checksum'], 3)) for r in results}) > 1:
+        print("Advertencia: los modos produjeron secuencias distintas.")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nInforme guardado en {args.report}")
+
+
+if __name__ == '__main__':
+    main()
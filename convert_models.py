@@ -0,0 +1,215 @@
+# convert_models.py
+# Convierte los modelos .h5 de models/ a TFLite y/o ONNX y compara sus salidas con el
+# modelo Keras original (verificación de paridad) antes de elegir INFERENCE_BACKEND.
+#
+#   python convert_models.py                                   # TFLite + ONNX de todos los .h5
+#   python convert_models.py --formats tflite --quantization none dynamic
+#   python convert_models.py --check-only --report parity.json # solo verificación de paridad
+#
+# Un archivo convertido cuya clase predicha (top-1) coincide con Keras en menos de --min-top1 de
+# las entradas de referencia se elimina (para que INFERENCE_BACKEND no lo cargue) y el script
+# termina con código 1.
+#
+# Dependencias solo para la conversión: tensorflow (TFLite) y tf2onnx + onnx (ONNX).
+# Para servir: onnxruntime (backend onnx) y, opcionalmente, tflite-runtime (backend tflite).
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from backends import QUANTIZATIONS, converted_path, OnnxModel, TFLiteModel
+
+
+def load_keras_model(h5_path):
+    from tensorflow.keras.models import load_model
+    return load_model(h5_path, compile=False)
+
+
+def convert_tflite(model, h5_path, quantization='none'):
+    """
+    Exporta el modelo a TFLite. La entrada se fija en batch 1: con batch dinámico el
+    convertidor no puede fusionar las capas LSTM (TensorList) sin Select TF ops.
+    """
+    import keras
+    import tensorflow as tf
+
+    _, sequence_length, feature_dim = model.input_shape
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        archive = keras.export.ExportArchive()
+        archive.track(model)
+        archive.add_endpoint('serve', lambda keypoints: model(keypoints, training=False),
+                             input_signature=[tf.TensorSpec((1, sequence_length, feature_dim), tf.float32, name='keypoints')])
+        archive.write_out(saved_model_dir)
+
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if quantization == 'dynamic':
+            converter.optimizations = [tf.lite.Optimize.DEFAULT] # Pesos int8, activaciones float32
+        tflite_model = converter.convert()
+
+    path = converted_path(h5_path, 'tflite', quantization)
+    with open(path, 'wb') as f:
+        f.write(tflite_model)
+    return path
+
+
+def convert_onnx(model, h5_path, opset=17):
+    """Exporta el modelo a ONNX con batch dinámico."""
+    import tensorflow as tf
+    import tf2onnx
+
+    _, sequence_length, feature_dim = model.input_shape
+    input_signature = [tf.TensorSpec((None, sequence_length, feature_dim), tf.float32, name='keypoints')]
+    serve = tf.function(lambda keypoints: model(keypoints, training=False))
+    path = converted_path(h5_path, 'onnx')
+    tf2onnx.convert.from_function(serve, input_signature=input_signature, opset=opset, output_path=path)
+    return path
+
+
+def reference_inputs(sequence_length, feature_dim, samples, seed=0):
+    """
+    Conjunto de entradas de referencia: las secuencias de test/ con la misma forma que el
+    modelo, copias con ruido gaussiano pequeño (variaciones realistas de los keypoints) y una
+    secuencia de ceros (sin manos detectadas). Si no hay secuencias de ejemplo se usa ruido uniforme.
+    """
+    rng = np.random.default_rng(seed)
+    base = []
+    for path in sorted(glob.glob('./test/*.json')):
+        with open(path) as f:
+            keypoints = np.asarray(json.load(f)['keypoints'], dtype=np.float32)
+        if keypoints.shape == (sequence_length, feature_dim):
+            base.append(keypoints)
+
+    inputs = [np.zeros((sequence_length, feature_dim), dtype=np.float32), *base]
+    while len(inputs) < samples:
+        if base:
+            sample = base[len(inputs) % len(base)]
+            noisy = sample + rng.normal(0, 0.01, sample.shape).astype(np.float32)
+            inputs.append(np.where(sample == 0, 0, noisy)) # Los puntos no detectados siguen en cero
+        else:
+            inputs.append(rng.uniform(0, 1, (sequence_length, feature_dim)).astype(np.float32))
+    return np.stack(inputs[:samples])
+
+
+def time_predict(predict_fn, inputs, batch_size, repeats):
+    """Latencia media en ms de una llamada a `predict_fn` con `batch_size` secuencias."""
+    batch = inputs[:batch_size]
+    predict_fn(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict_fn(batch)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def check_parity(h5_path, candidates, samples=64, repeats=20, min_top1=1.0):
+    """
+    Compara cada backend convertido con el modelo Keras sobre el conjunto de referencia:
+    diferencia absoluta máxima y media de las probabilidades, coincidencia de la clase
+    predicha (top-1) y latencia con batch 1 y batch 32. Cada resultado indica con `passed`
+    si su top-1 alcanza `min_top1` y la salida se repite al predecir dos veces la misma entrada.
+    """
+    from inference import CompiledModel
+
+    keras_model = CompiledModel(load_keras_model(h5_path), path=h5_path)
+    _, sequence_length, feature_dim = keras_model.input_shape
+    inputs = reference_inputs(sequence_length, feature_dim, samples)
+    expected = keras_model.predict(inputs)
+
+    results = [{
+        "backend": "keras",
+        "path": h5_path,
+        "max_abs_diff": 0.0,
+        "mean_abs_diff": 0.0,
+        "top1_agreement": 1.0,
+        "deterministic": True,
+        "passed": True,
+        "latency_ms_batch1": time_predict(keras_model.predict, inputs, 1, repeats),
+        "latency_ms_batch32": time_predict(keras_model.predict, inputs, 32, repeats),
+    }]
+    for backend, _, path in candidates:
+        model = OnnxModel(path) if backend == 'onnx' else TFLiteModel(path)
+        outputs = model.predict(inputs)
+        diff = np.abs(outputs - expected)
+        top1_agreement = float(np.mean(outputs.argmax(axis=1) == expected.argmax(axis=1)))
+        deterministic = bool(np.array_equal(outputs, model.predict(inputs)))
+        results.append({
+            "backend": backend,
+            "path": path,
+            "max_abs_diff": float(diff.max()),
+            "mean_abs_diff": float(diff.mean()),
+            "top1_agreement": top1_agreement,
+            "deterministic": deterministic,
+            "passed": top1_agreement >= min_top1 and deterministic,
+            "latency_ms_batch1": time_predict(model.predict, inputs, 1, repeats),
+            "latency_ms_batch32": time_predict(model.predict, inputs, 32, repeats),
+        })
+    return {"model": h5_path, "samples": len(inputs), "results": results}
+
+
+def print_report(report):
+    print(f"\nParidad de {report['model']} ({report['samples']} entradas de referencia):")
+    print(f"{'archivo':<45} {'max |Δ|':>10} {'media |Δ|':>10} {'top-1':>7} {'ms b=1':>8} {'ms b=32':>8}  resultado")
+    for r in report['results']:
+        status = 'OK' if r['passed'] else ('NO DETERMINISTA' if not r['deterministic'] else 'SIN PARIDAD')
+        print(f"{os.path.basename(r['path']):<45} {r['max_abs_diff']:>10.2e} {r['mean_abs_diff']:>10.2e} "
+              f"{r['top1_agreement']:>7.1%} {r['latency_ms_batch1']:>8.2f} {r['latency_ms_batch32']:>8.2f}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte los modelos .h5 a TFLite/ONNX y verifica la paridad con Keras.")
+    parser.add_argument('--models', nargs='+', default=sorted(glob.glob('./models/*.h5')), help="Modelos .h5 (por defecto, todos los de models/)")
+    parser.add_argument('--formats', nargs='+', choices=['tflite', 'onnx'], default=['tflite', 'onnx'])
+    parser.add_argument('--quantization', nargs='+', choices=QUANTIZATIONS, default=['none'], help="Variantes TFLite a generar")
+    parser.add_argument('--samples', type=int, default=64, help="Tamaño del conjunto de referencia")
+    parser.add_argument('--check-only', action='store_true', help="No convertir; verificar los archivos ya generados")
+    parser.add_argument('--no-check', action='store_true', help="Convertir sin verificar la paridad")
+    parser.add_argument('--min-top1', type=float, default=1.0,
+                        help="Coincidencia top-1 mínima con Keras; por debajo el archivo convertido se elimina")
+    parser.add_argument('--report', help="Guardar el informe de paridad en este archivo JSON")
+    args = parser.parse_args()
+
+    reports = []
+    failed = []
+    for h5_path in args.models:
+        candidates = []
+        if 'tflite' in args.formats:
+            candidates += [('tflite', q, converted_path(h5_path, 'tflite', q)) for q in args.quantization]
+        if 'onnx' in args.formats:
+            candidates.append(('onnx', 'none', converted_path(h5_path, 'onnx')))
+
+        if not args.check_only:
+            model = load_keras_model(h5_path)
+            for backend, quantization, path in candidates:
+                start = time.perf_counter()
+                if backend == 'onnx':
+                    convert_onnx(model, h5_path)
+                else:
+                    convert_tflite(model, h5_path, quantization=quantization)
+                print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB, convertido en {time.perf_counter() - start:.1f} s.")
+
+        if not args.no_check:
+            candidates = [candidate for candidate in candidates if os.path.exists(candidate[2])]
+            report = check_parity(h5_path, candidates, samples=args.samples, min_top1=args.min_top1)
+            print_report(report)
+            reports.append(report)
+            for result in report['results']:
+                if not result['passed']:
+                    failed.append(result['path'])
+                    os.remove(result['path']) # Un archivo sin paridad no debe poder servirse
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nInforme de paridad guardado en {args.report}")
+
+    if failed:
+        print(f"\n{len(failed)} archivos convertidos sin paridad con Keras (eliminados): {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
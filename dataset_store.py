@@ -0,0 +1,358 @@
+# dataset_store.py
+# Empaqueta un dataset de keypoints con la estructura de ./datasets/LSC_* (seña/muestra/fotograma.npy)
+# en un único archivo float32 contiguo (keypoints.npy) más un índice (index.json) con la etiqueta,
+# el desplazamiento y la longitud de cada secuencia. Los .npy se leen en paralelo y cada proceso
+# escribe sus secuencias directamente en el archivo mapeado en memoria, sin listas ni JSON.
+# SequenceStore abre el almacén con np.load(mmap_mode='r'): cada secuencia es una vista sin copia,
+# de modo que evaluar un dataset completo o reproducir sus secuencias contra la API no carga todo
+# en memoria.
+#
+#   python dataset_store.py pack ./datasets/LSC_words_Data_v2 ./cache/datasets/words_v2
+#   python dataset_store.py info ./cache/datasets/words_v2
+#   python dataset_store.py evaluate ./cache/datasets/words_v2 --model words_v2
+#   python dataset_store.py replay ./cache/datasets/words_v2 --endpoint /predict_recognition_words_v2 --concurrency 8
+#   python dataset_store.py replay ./cache/datasets/words_v2 --url https://tu-api-url.com --requests 1000
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+STORE_FORMAT = 1
+KEYPOINTS_FILE = 'keypoints.npy'
+INDEX_FILE = 'index.json'
+# Muestras que escribe cada tarea del pool al empaquetar
+PACK_CHUNK_SAMPLES = 64
+
+_FRAME_FILE = re.compile(r'^(\d+)\.npy$')
+
+
+def _natural_key(name):
+    """Ordena '2' antes que '10' (las muestras y los fotogramas del dataset se numeran desde 0)."""
+    return (0, int(name), name) if name.isdigit() else (1, 0, name)
+
+
+def scan_dataset(root):
+    """
+    Recorre `root`/seña/muestra/ y devuelve (etiquetas, muestras), con cada muestra como
+    (índice de etiqueta, nombre de la muestra, rutas de los fotogramas en orden). Igual que
+    tools.construir_secuencia, los fotogramas que faltan en la numeración se omiten con una advertencia.
+    """
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"No se encontró el dataset: {root}")
+    labels = sorted((entry.name for entry in os.scandir(root) if entry.is_dir()), key=_natural_key)
+    samples = []
+    for label_index, label in enumerate(labels):
+        label_dir = os.path.join(root, label)
+        for sample in sorted((entry.name for entry in os.scandir(label_dir) if entry.is_dir()), key=_natural_key):
+            sample_dir = os.path.join(label_dir, sample)
+            frames = sorted(int(match.group(1)) for match in map(_FRAME_FILE.match, os.listdir(sample_dir)) if match)
+            if not frames:
+                print(f"Advertencia: la muestra {sample_dir} no tiene fotogramas .npy, se omitirá.")
+                continue
+            missing = frames[-1] + 1 - len(frames)
+            if missing:
+                print(f"Advertencia: faltan {missing} fotogramas en {sample_dir}, se omitirán.")
+            samples.append((label_index, sample, [os.path.join(sample_dir, f'{i}.npy') for i in frames]))
+    return labels, samples
+
+
+def _pack_chunk(keypoints_path, tasks):
+    """Escribe en el almacén (abierto en modo r+) los fotogramas de cada (desplazamiento, rutas); devuelve los errores."""
+    keypoints = np.load(keypoints_path, mmap_mode='r+')
+    features = keypoints.shape[1]
+    errors = []
+    for offset, paths in tasks:
+        for row, path in enumerate(paths, start=offset):
+            try:
+                frame = np.load(path)
+            except Exception as e:
+                errors.append(f"{path}: {e}")
+                continue
+            if frame.size != features:
+                errors.append(f"{path}: {frame.size} características, se esperaban {features}")
+                continue
+            keypoints[row] = frame.reshape(features)
+    keypoints.flush()
+    return errors
+
+
+def pack_dataset(root, output, workers=None, overwrite=False):
+    """
+    Empaqueta el dataset `root` en el directorio `output` y devuelve el SequenceStore resultante.
+    El número de características se toma del primer fotograma; un fotograma con otro tamaño o
+    ilegible es un error (no se escribe un almacén incompleto). `workers` procesos leen los .npy
+    en paralelo (por defecto, uno por núcleo).
+    """
+    keypoints_path = os.path.join(output, KEYPOINTS_FILE)
+    index_path = os.path.join(output, INDEX_FILE)
+    if os.path.exists(index_path) and not overwrite:
+        raise FileExistsError(f"Ya existe un almacén en {output} (usa overwrite=True / --overwrite para reemplazarlo).")
+
+    start = time.perf_counter()
+    labels, samples = scan_dataset(root)
+    if not samples:
+        raise ValueError(f"No se encontraron muestras en {root} (estructura esperada: seña/muestra/0.npy).")
+    features = int(np.load(samples[0][2][0], mmap_mode='r').size)
+    lengths = np.array([len(paths) for _, _, paths in samples], dtype=np.int64)
+    offsets = np.zeros(len(samples), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    total_frames = int(lengths.sum())
+
+    # Se escribe en archivos temporales y se renombran al final: un almacén a medias nunca queda con índice
+    os.makedirs(output, exist_ok=True)
+    tmp_keypoints_path = keypoints_path + '.tmp'
+    np.lib.format.open_memmap(tmp_keypoints_path, mode='w+', dtype=np.float32, shape=(total_frames, features)).flush()
+    tasks = [(int(offset), paths) for offset, (_, _, paths) in zip(offsets, samples)]
+    chunks = [tasks[i:i + PACK_CHUNK_SAMPLES] for i in range(0, len(tasks), PACK_CHUNK_SAMPLES)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks)))
+    errors = []
+    try:
+        if workers == 1:
+            for chunk in chunks:
+                errors.extend(_pack_chunk(tmp_keypoints_path, chunk))
+        else:
+            with multiprocessing.Pool(processes=workers) as pool:
+                for chunk_errors in pool.starmap(_pack_chunk, [(tmp_keypoints_path, chunk) for chunk in chunks]):
+                    errors.extend(chunk_errors)
+        if errors:
+            raise ValueError(f"{len(errors)} fotogramas no se pudieron empaquetar; por ejemplo: " + "; ".join(errors[:5]))
+    except BaseException:
+        os.remove(tmp_keypoints_path)
+        raise
+
+    index = {
+        "format": STORE_FORMAT,
+        "source": os.path.abspath(root),
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "dtype": "float32",
+        "features": features,
+        "total_frames": total_frames,
+        "labels": labels,
+        "sequences": {
+            "label": [label_index for label_index, _, _ in samples],
+            "sample": [sample for _, sample, _ in samples],
+            "offset": offsets.tolist(),
+            "length": lengths.tolist(),
+        },
+    }
+    if os.path.exists(index_path):
+        os.remove(index_path) # Sin índice el almacén anterior deja de abrirse antes de reemplazar sus keypoints
+    os.replace(tmp_keypoints_path, keypoints_path)
+    with open(index_path + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(index_path + '.tmp', index_path)
+    print(f"Dataset {root} empaquetado en {output}: {len(samples)} secuencias, {total_frames} fotogramas de "
+          f"{features} características ({total_frames * features * 4 / 1e6:.1f} MB) en {time.perf_counter() - start:.2f} s "
+          f"con {workers} procesos.")
+    return SequenceStore(output)
+
+
+class SequenceStore:
+    """
+    Almacén de secuencias creado con pack_dataset, abierto sin copiar: `keypoints` es un memmap
+    de solo lectura (fotogramas, características) y `store[i]` la vista de la secuencia `i`.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            index = json.load(f)
+        if index.get("format") != STORE_FORMAT:
+            raise ValueError(f"Formato de almacén no soportado en {path}: {index.get('format')}")
+        self.path = path
+        self.index = index
+        self.labels = index["labels"]
+        self.features = index["features"]
+        sequences = index["sequences"]
+        self.label_ids = np.asarray(sequences["label"], dtype=np.int64)
+        self.samples = sequences["sample"]
+        self.offsets = np.asarray(sequences["offset"], dtype=np.int64)
+        self.lengths = np.asarray(sequences["length"], dtype=np.int64)
+        self.keypoints = np.load(os.path.join(path, KEYPOINTS_FILE), mmap_mode='r')
+        if self.keypoints.shape != (index["total_frames"], self.features) or self.keypoints.dtype != np.float32:
+            raise ValueError(f"{KEYPOINTS_FILE} no coincide con el índice de {path}: {self.keypoints.shape} {self.keypoints.dtype}")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        """Keypoints (fotogramas, características) de la secuencia `i`: una vista del memmap, sin copia."""
+        offset = self.offsets[i]
+        return self.keypoints[offset:offset + self.lengths[i]]
+
+    def label(self, i):
+        return self.labels[self.label_ids[i]]
+
+    def indices(self, label=None):
+        """Índices de todas las secuencias, o solo de las de `label`."""
+        if label is None:
+            return np.arange(len(self))
+        return np.flatnonzero(self.label_ids == self.labels.index(label))
+
+    def batch(self, indices, sequence_length):
+        """
+        Lote (secuencias, `sequence_length`, características) listo para el modelo: cada secuencia
+        se ajusta a la longitud como en los endpoints de video (pipeline.sample_sequence).
+        """
+        from pipeline import sample_sequence
+
+        batch = np.empty((len(indices), sequence_length, self.features), dtype=np.float32)
+        for row, i in enumerate(indices):
+            batch[row] = sample_sequence(self[i], sequence_length)
+        return batch
+
+    def info(self):
+        """Resumen del almacén: secuencias por etiqueta y longitudes."""
+        counts = np.bincount(self.label_ids, minlength=len(self.labels))
+        return {
+            "path": self.path,
+            "source": self.index.get("source"),
+            "created": self.index.get("created"),
+            "sequences": len(self),
+            "frames": int(self.keypoints.shape[0]),
+            "features": self.features,
+            "size_mb": self.keypoints.nbytes / 1e6,
+            "min_length": int(self.lengths.min()) if len(self) else 0,
+            "max_length": int(self.lengths.max()) if len(self) else 0,
+            "sequences_by_label": {label: int(count) for label, count in zip(self.labels, counts)},
+        }
+
+
+def evaluate(store, pipeline, batch_size=256):
+    """
+    Predice todas las secuencias del almacén en lotes de `batch_size` con el backend del
+    pipeline (sin caché ni micro-batcher) y devuelve la exactitud global y por etiqueta.
+    """
+    if store.features != pipeline.input_shape[-1]:
+        raise ValueError(f"El almacén tiene {store.features} características y el modelo espera {pipeline.input_shape[-1]}.")
+    correct = np.zeros(len(store), dtype=bool)
+    errors = {}
+    start = time.perf_counter()
+    for first in range(0, len(store), batch_size):
+        indices = np.arange(first, min(first + batch_size, len(store)))
+        probabilities = pipeline.forward(store.batch(indices, pipeline.sequence_length))
+        for i, row in zip(indices, probabilities):
+            expected, predicted = store.label(i), pipeline.label(np.argmax(row))
+            correct[i] = expected == predicted
+            if not correct[i]:
+                errors[f"{expected} -> {predicted}"] = errors.get(f"{expected} -> {predicted}", 0) + 1
+    seconds = time.perf_counter() - start
+    return {
+        "sequences": len(store),
+        "accuracy": float(correct.mean()) if len(store) else None,
+        "accuracy_by_label": {label: float(correct[store.indices(label)].mean())
+                              for label in store.labels if len(store.indices(label))},
+        "confusions": dict(sorted(errors.items(), key=lambda item: -item[1])),
+        "seconds": seconds,
+        "sequences_per_second": len(store) / seconds if seconds > 0 else None,
+    }
+
+
+def replay(store, call, sequence_length, requests, concurrency, seed=0):
+    """
+    Reproduce secuencias del almacén (elegidas al azar con `seed`) como cuerpos float32 crudos:
+    `call(body)` envía una solicitud y devuelve su código HTTP. Devuelve el resumen de latencias
+    de benchmark_api.run_load. Antes de medir se envía una solicitud de calentamiento (carga del modelo).
+    """
+    from benchmark_api import run_load
+    from pipeline import sample_sequence
+
+    def body(i):
+        return sample_sequence(store[i], sequence_length).astype('<f4', copy=False).tobytes()
+
+    order = np.random.default_rng(seed).integers(0, len(store), size=requests)
+    position = iter(range(requests))
+    call(body(order[0]))
+    return run_load(lambda: call(body(order[next(position)])), requests, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacén de secuencias de keypoints mapeado en memoria.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack_parser = commands.add_parser('pack', help="Empaqueta un dataset seña/muestra/fotograma.npy")
+    pack_parser.add_argument('root', help="Directorio del dataset (p. ej., ./datasets/LSC_words_Data_v2)")
+    pack_parser.add_argument('output', help="Directorio del almacén")
+    pack_parser.add_argument('--workers', type=int, help="Procesos de lectura (por defecto, uno por núcleo)")
+    pack_parser.add_argument('--overwrite', action='store_true', help="Reemplazar un almacén existente")
+    info_parser = commands.add_parser('info', help="Resumen del almacén")
+    info_parser.add_argument('store')
+    evaluate_parser = commands.add_parser('evaluate', help="Exactitud de un modelo del registro sobre todo el almacén")
+    evaluate_parser.add_argument('store')
+    evaluate_parser.add_argument('--model', required=True, help="Modelo del registro (p. ej., words_v2)")
+    evaluate_parser.add_argument('--version', help="Versión del modelo (por defecto, la predeterminada)")
+    evaluate_parser.add_argument('--batch-size', type=int, default=256)
+    evaluate_parser.add_argument('--report', help="Archivo JSON donde guardar el resultado")
+    replay_parser = commands.add_parser('replay', help="Reproduce las secuencias contra un endpoint de keypoints")
+    replay_parser.add_argument('store')
+    replay_parser.add_argument('--endpoint', default='/predict_recognition_words_v2', help="Ruta del endpoint de keypoints")
+    replay_parser.add_argument('--url', help="URL base de la API (por defecto, el cliente de pruebas de Flask sin red)")
+    replay_parser.add_argument('--sequence-length', type=int, default=30)
+    replay_parser.add_argument('--requests', type=int, default=200)
+    replay_parser.add_argument('--concurrency', type=int, default=4)
+    replay_parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        pack_dataset(args.root, args.output, workers=args.workers, overwrite=args.overwrite)
+        return
+
+    store = SequenceStore(args.store)
+    if args.command == 'info':
+        print(json.dumps(store.info(), indent=2, ensure_ascii=False))
+
+    elif args.command == 'evaluate':
+        os.environ['PREDICTION_CACHE_ENABLED'] = '0'
+        import main as app_main
+        from pipeline import InferencePipeline
+
+        with app_main.model_registry.acquire(args.model, args.version) as entry:
+            if entry is None:
+                sys.exit(f"No se pudo cargar el modelo {args.model}")
+            result = evaluate(store, InferencePipeline.for_model(entry, micro_batcher=None), args.batch_size)
+        print(f"Exactitud de {args.model}: {result['accuracy']:.4f} en {result['sequences']} secuencias "
+              f"({result['sequences_per_second']:.0f} secuencias/s)")
+        for label, accuracy in result["accuracy_by_label"].items():
+            print(f"  {label:<20} {accuracy:.4f}")
+        for confusion, count in list(result["confusions"].items())[:10]:
+            print(f"  confusión {confusion}: {count}")
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+            print(f"Resultado guardado en {args.report}")
+
+    elif args.command == 'replay':
+        if args.url:
+            import urllib.error
+            import urllib.request
+
+            def call(body):
+                request = urllib.request.Request(args.url.rstrip('/') + args.endpoint, data=body,
+                                                 headers={'Content-Type': 'application/octet-stream'})
+                try:
+                    with urllib.request.urlopen(request, timeout=30) as response:
+                        response.read()
+                        return response.status
+                except urllib.error.HTTPError as e:
+                    return e.code
+        else:
+            import threading
+            import main as app_main
+
+            local = threading.local()
+
+            def call(body):
+                client = getattr(local, 'client', None)
+                if client is None:
+                    client = local.client = app_main.app.test_client()
+                return client.post(args.endpoint, data=body, content_type='application/octet-stream').status_code
+
+        summary = replay(store, call, args.sequence_length, args.requests, args.concurrency, args.seed)
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
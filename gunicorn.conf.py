@@ -0,0 +1,92 @@
+# gunicorn.conf.py
+# Configuración del servidor de producción. Gunicorn lee este archivo automáticamente:
+#   gunicorn main:app
+# Todos los valores se pueden ajustar con variables de entorno (ver env.example).
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+cpu_count = multiprocessing.cpu_count()
+
+# Puerto: el mismo PORT que usa Cloud Run y el servidor de desarrollo
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Procesos worker: cada uno tiene su propio intérprete, así que usa núcleos distintos. Por defecto
+# uno: las sesiones en tiempo real (sessions.py) viven en la memoria del worker que las creó, así
+# que con varios workers el balanceador debe enviar todas las solicitudes de una sesión al mismo
+# (afinidad de sesión) o sus fotogramas y eventos responden 404. Gunicorn reparte las conexiones
+# entre sus workers sin afinidad, así que con más de uno las sesiones se desactivan
+workers = max(1, int(os.environ.get('WEB_WORKERS', 1)))
+
+# Hilos por worker (gthread): atienden solicitudes concurrentes que el micro-batcher
+# agrupa en una sola pasada del modelo, y mantienen abiertos los canales SSE y las subidas
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+
+# WEB_PRELOAD=1 importa la aplicación una vez en el proceso maestro antes del fork, junto con
+# TensorFlow, MediaPipe y OpenCV, que se comparten entre workers por copy-on-write y no se
+# reimportan en cada uno. Los modelos se cargan siempre en cada worker tras el fork (ver
+# model_registry.py): el runtime de TensorFlow inicializado en el maestro se bloquea en los hijos.
+# Con WEB_PRELOAD=0 (por defecto) cada worker importa la aplicación por su cuenta.
+preload_app = os.environ.get('WEB_PRELOAD', '0') == '1'
+
+# Los endpoints de video pueden tardar tanto como el pool de Holistic (HOLISTIC_POOL_TIMEOUT)
+timeout = int(os.environ.get('WEB_TIMEOUT', 300))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+accesslog = '-'
+errorlog = '-'
+
+# Reparto de núcleos entre workers: si no se configuraron explícitamente, cada worker usa
+# cpu_count / workers hilos intra-op de TensorFlow y procesos de Holistic, para no sobresuscribir
+# la CPU. Se exporta al entorno para que main.py lo lea al importarse (en el maestro o en cada worker).
+cores_per_worker = max(1, cpu_count // workers)
+os.environ.setdefault('TF_INTRA_OP_THREADS', str(cores_per_worker))
+os.environ.setdefault('TF_INTER_OP_THREADS', '1')
+os.environ.setdefault('HOLISTIC_POOL_SIZE', str(cores_per_worker))
+
+# Estado compartido entre workers: las sesiones no se comparten (ver arriba), los trabajos asíncronos se guardan en SQLite (con 'memory' cada
+# worker solo conoce los suyos y GET /jobs/<id> falla según qué worker atienda) y cada worker
+# comprueba el manifiesto de modelos, donde /models/reload y /models/<name>/<version>/activate
+# dejan los cambios para todos (ver model_registry.py)
+if workers > 1:
+    os.environ.setdefault('JOB_STORE', 'sqlite')
+    os.environ.setdefault('SESSIONS_ENABLED', '0')
+    if float(os.environ.get('MODEL_MANIFEST_CHECK_SECONDS', 10)) <= 0:
+        print("MODEL_MANIFEST_CHECK_SECONDS=0 no es válido con varios workers: se usa 10 para que los cambios de modelos lleguen a todos.")
+        os.environ['MODEL_MANIFEST_CHECK_SECONDS'] = '10'
+
+# Métricas de Prometheus: cada worker escribe las suyas en este directorio y GET /metrics, lo
+# atienda el worker que sea, devuelve la suma de todos (ver metrics.py). Debe estar en el entorno
+# antes de que los workers importen prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'lsc-prometheus'))
+
+
+def on_starting(server):
+    """Con preload, importa las bibliotecas pesadas en el maestro (importarlas no inicializa el runtime de TF)."""
+    # Las métricas de una ejecución anterior no deben sumarse a las de esta
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    if preload_app:
+        import startup
+        startup.import_libraries()
+
+
+def post_worker_init(worker):
+    """Se ejecuta en cada worker con la aplicación ya importada (precarga en segundo plano si MODEL_PRELOAD=1)."""
+    import main
+    main.on_worker_start()
+    worker.log.info("Worker %s listo (TF intra-op=%s, Holistic=%s procesos).", worker.pid,
+                    os.environ['TF_INTRA_OP_THREADS'], os.environ['HOLISTIC_POOL_SIZE'])
+
+
+def child_exit(server, worker):
+    """Descarta las métricas 'en vivo' (solicitudes en curso, colas) del worker que terminó."""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
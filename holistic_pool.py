@@ -0,0 +1,252 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import metrics
+import startup
+
+
+# Configuración del pool de MediaPipe Holistic (se puede ajustar con variables de entorno)
+HOLISTIC_POOL_SIZE = int(os.environ.get('HOLISTIC_POOL_SIZE', os.cpu_count() or 1))
+# Máximo de videos en proceso o en espera; por encima se responde 503
+HOLISTIC_POOL_MAX_PENDING = int(os.environ.get('HOLISTIC_POOL_MAX_PENDING', HOLISTIC_POOL_SIZE * 2))
+# Segundos sugeridos al cliente en la cabecera Retry-After cuando el pool está lleno
+HOLISTIC_POOL_RETRY_AFTER = int(os.environ.get('HOLISTIC_POOL_RETRY_AFTER', 5))
+# Tiempo máximo de espera por un video antes de abandonar la solicitud (504)
+HOLISTIC_POOL_TIMEOUT = float(os.environ.get('HOLISTIC_POOL_TIMEOUT', 300))
+# Tiempo máximo para que todos los procesos tengan Holistic listo; si se supera, el pool no
+# arranca, los videos responden 503 y no se vuelve a intentar hasta que pase ese mismo tiempo
+HOLISTIC_POOL_START_TIMEOUT = float(os.environ.get('HOLISTIC_POOL_START_TIMEOUT', 120))
+
+# Valores aceptados para 'model_complexity' (el valor por defecto es HOLISTIC_MODEL_COMPLEXITY de utils.py)
+HOLISTIC_MODEL_COMPLEXITIES = (0, 1, 2)
+
+
+class PoolBusyError(RuntimeError):
+    """El pool tiene la cola llena; el endpoint debe responder 503 con Retry-After."""
+
+    def __init__(self, retry_after=HOLISTIC_POOL_RETRY_AFTER):
+        super().__init__("El servicio de procesamiento de video está ocupado. Intenta de nuevo más tarde.")
+        self.retry_after = retry_after
+
+
+class PoolUnavailableError(PoolBusyError):
+    """Los procesos del pool no llegaron a iniciarse (MediaPipe no carga, falta memoria...); también 503."""
+
+    def __init__(self, retry_after=HOLISTIC_POOL_RETRY_AFTER):
+        super().__init__(retry_after)
+        self.args = ("El servicio de procesamiento de video no está disponible. Intenta de nuevo más tarde.",)
+
+
+class PoolTimeoutError(RuntimeError):
+    """El video no terminó en HOLISTIC_POOL_TIMEOUT segundos; el endpoint debe responder 504."""
+
+    def __init__(self, timeout):
+        super().__init__(f"El procesamiento del video superó el tiempo máximo de {timeout:g} s.")
+        self.timeout = timeout
+
+
+# Instancias de Holistic de cada proceso trabajador por complejidad del modelo: la predeterminada
+# se crea en _init_worker y las demás la primera vez que una solicitud las pide
+_worker_holistics = {}
+
+
+def _init_worker(ready_queue):
+    start = time.perf_counter()
+    import utils # OpenCV y MediaPipe solo se importan en los procesos del pool
+    _worker_holistics[utils.HOLISTIC_MODEL_COMPLEXITY] = utils.create_holistic()
+    ready_queue.put((os.getpid(), time.perf_counter() - start))
+
+
+def _pool_context():
+    """
+    Contexto de multiprocessing del pool. Al arrancar el pool el proceso ya tiene hilos
+    (TensorFlow, micro-batchers, trabajos) y un fork podría copiar un lock tomado por alguno de
+    ellos y bloquear al hijo; con 'forkserver' los trabajadores se crean desde un proceso servidor
+    sin hilos, que importa OpenCV y MediaPipe una sola vez (utils). El script de entrada no se
+    precarga: el servidor no necesita la aplicación Flask ni sus registros. Donde no existe, 'spawn'.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['holistic_pool', 'utils'])
+    return context
+
+
+def _worker_holistic(model_complexity):
+    import utils
+    if model_complexity is None:
+        model_complexity = utils.HOLISTIC_MODEL_COMPLEXITY
+    if model_complexity not in _worker_holistics:
+        try:
+            _worker_holistics[model_complexity] = utils.create_holistic(model_complexity)
+        except Exception as e:
+            # Los modelos de pose 0 y 2 se descargan en el primer uso y pueden no estar disponibles
+            raise RuntimeError(f"No se pudo crear Holistic con model_complexity={model_complexity}: {e}") from None
+    return _worker_holistics[model_complexity]
+
+
+def _process_video(type_extract, url_video, target_frames, api_preference, model_complexity=None):
+    import utils
+    stats = {}
+    kwargs = {} if api_preference is None else {'api_preference': api_preference}
+    keypoints = utils.process_video_sign(type_extract, url_video, holistic=_worker_holistic(model_complexity), stats=stats,
+                                         target_frames=target_frames, **kwargs)
+    return keypoints, stats
+
+
+class HolisticPool:
+    """
+    Pool de procesos con instancias de MediaPipe Holistic de larga duración.
+
+    Cada proceso trabajador crea su grafo de Holistic una sola vez y lo reutiliza para
+    todos los videos, de modo que ni la inicialización del grafo ni la extracción de
+    keypoints ocupan el hilo de la solicitud Flask. La cola está acotada por
+    `max_pending`: si está llena, `process_video` lanza PoolBusyError de inmediato.
+    """
+
+    def __init__(self, size=HOLISTIC_POOL_SIZE, max_pending=HOLISTIC_POOL_MAX_PENDING, timeout=HOLISTIC_POOL_TIMEOUT,
+                 start_timeout=HOLISTIC_POOL_START_TIMEOUT):
+        self.size = max(1, int(size))
+        self.max_pending = max(self.size, int(max_pending))
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self._pool = None
+        self._pid = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._pending = 0
+        self._videos = 0
+        self._rejected = 0
+        self._errors = 0
+        self._frames = 0
+        self._detection_seconds = 0.0
+        self._startup_seconds = None
+        self._worker_init_seconds = []
+
+    def start(self):
+        """
+        Arranca los procesos trabajadores y espera a que todos tengan su Holistic listo. Si no lo
+        están en `start_timeout` segundos (un proceso que falla al iniciarse se vuelve a crear
+        indefinidamente) se termina el pool y se lanza PoolUnavailableError, también durante los
+        `start_timeout` segundos siguientes, sin volver a intentarlo.
+        """
+        if self._pool is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                return
+            if self._failed_at is not None and self._pid == os.getpid() and time.monotonic() - self._failed_at < self.start_timeout:
+                raise PoolUnavailableError()
+            # Tras un fork el pool del proceso padre no es utilizable: se crea uno nuevo
+            self._slots = threading.BoundedSemaphore(self.max_pending)
+            with self._stats_lock:
+                self._reset_stats()
+
+            start = time.perf_counter()
+            context = _pool_context()
+            ready_queue = context.Queue()
+            self._pool = context.Pool(processes=self.size, initializer=_init_worker, initargs=(ready_queue,))
+            self._pid = os.getpid()
+            deadline = time.monotonic() + self.start_timeout
+            try:
+                worker_init_seconds = [ready_queue.get(timeout=max(0.0, deadline - time.monotonic()))[1] for _ in range(self.size)]
+            except queue.Empty:
+                print(f"El pool de MediaPipe Holistic no se inició en {self.start_timeout:g} s; se descarta.")
+                self._pool.terminate()
+                self._pool = None
+                self._failed_at = time.monotonic()
+                raise PoolUnavailableError() from None
+            self._failed_at = None
+            startup_seconds = time.perf_counter() - start
+
+            with self._stats_lock:
+                self._startup_seconds = startup_seconds
+                self._worker_init_seconds = worker_init_seconds
+            print(f"Pool de MediaPipe Holistic iniciado con {self.size} procesos en {startup_seconds:.2f} s.")
+            startup.record_phase('holistic_pool', startup_seconds)
+
+    def submit_video(self, type_extract, url_video, target_frames=None, api_preference=None, model_complexity=None):
+        """
+        Envía un video al pool sin esperar el resultado. Devuelve un AsyncResult cuyo `get()`
+        produce `(keypoints, stats)`. Lanza PoolBusyError si la cola está llena.
+        `api_preference` fuerza un backend de OpenCV (None equivale a cv2.CAP_ANY) y
+        `model_complexity` el modelo de pose de Holistic (None: el predeterminado).
+        """
+        self.start()
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._rejected += 1
+            raise PoolBusyError()
+
+        with self._stats_lock:
+            self._pending += 1
+            metrics.set_queue_depth('holistic_pool', self._pending)
+
+        def on_done(result):
+            _, stats = result
+            with self._stats_lock:
+                self._pending -= 1
+                self._videos += 1
+                self._frames += stats.get('frames', 0)
+                self._detection_seconds += stats.get('detection_seconds', 0.0)
+                metrics.set_queue_depth('holistic_pool', self._pending)
+            self._slots.release()
+
+        def on_error(error):
+            with self._stats_lock:
+                self._pending -= 1
+                self._errors += 1
+                metrics.set_queue_depth('holistic_pool', self._pending)
+            self._slots.release()
+
+        return self._pool.apply_async(_process_video, (type_extract, url_video, target_frames, api_preference, model_complexity),
+                                      callback=on_done, error_callback=on_error)
+
+    def process_video(self, type_extract, url_video, target_frames=None, model_complexity=None):
+        """
+        Envía un video al pool y bloquea hasta obtener los keypoints por fotograma (array float32).
+        Con `target_frames` solo se procesan los fotogramas muestreados (ver utils.process_video_sign).
+        """
+        keypoints, _ = self.result(self.submit_video(type_extract, url_video, target_frames, model_complexity=model_complexity))
+        return keypoints
+
+    def result(self, async_result):
+        """
+        Espera el resultado de `submit_video` y devuelve `(keypoints, stats)`. Registra en las
+        métricas del hilo que espera (su endpoint) la decodificación y el tiempo de Holistic por fotograma.
+
+        Si no termina en `timeout` segundos lanza PoolTimeoutError. El proceso trabajador sigue con
+        el video y su plaza de la cola no se libera hasta que termine: videos que se atascan de
+        forma repetida acaban llenando la cola (503).
+        """
+        try:
+            keypoints, stats = async_result.get(timeout=self.timeout)
+        except multiprocessing.TimeoutError:
+            raise PoolTimeoutError(self.timeout) from None
+        metrics.observe_stage('video_decode', stats.get('decode_seconds', 0.0))
+        metrics.observe_stage_many('holistic_frame', stats.get('frame_seconds'))
+        return keypoints, stats
+
+    def stats(self):
+        """Métricas del pool: tiempo de arranque, latencia por fotograma y ocupación de la cola."""
+        with self._stats_lock:
+            return {
+                "size": self.size,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "videos_processed": self._videos,
+                "videos_rejected": self._rejected,
+                "errors": self._errors,
+                "frames_processed": self._frames,
+                "avg_frame_latency_ms": (self._detection_seconds / self._frames * 1000) if self._frames else None,
+                "startup_seconds": self._startup_seconds,
+                "worker_init_seconds": list(self._worker_init_seconds),
+            }
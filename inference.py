@@ -0,0 +1,78 @@
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+
+
+# Hilos de TensorFlow por proceso (0 = valor por defecto de TF, que usa todos los núcleos).
+# Con varios workers de Gunicorn conviene repartir los núcleos: ver gunicorn.conf.py
+TF_INTRA_OP_THREADS = int(os.environ.get('TF_INTRA_OP_THREADS', 0))
+TF_INTER_OP_THREADS = int(os.environ.get('TF_INTER_OP_THREADS', 0))
+
+
+def configure_threads(intra_op_threads=TF_INTRA_OP_THREADS, inter_op_threads=TF_INTER_OP_THREADS):
+    """
+    Fija el número de hilos de TensorFlow. Debe llamarse antes de cargar cualquier modelo:
+    una vez inicializado el runtime de TF los valores ya no se pueden cambiar.
+    """
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        print(f"No se pudo configurar los hilos de TensorFlow (runtime ya inicializado): {e}")
+        return
+    print(f"Hilos de TensorFlow: intra-op={tf.config.threading.get_intra_op_parallelism_threads() or 'auto'}, "
+          f"inter-op={tf.config.threading.get_inter_op_parallelism_threads() or 'auto'}.")
+
+
+class CompiledModel:
+    """
+    Envoltorio de inferencia para un modelo Keras.
+
+    `model.predict()` construye un data adapter y callbacks en cada llamada, lo que es
+    muy costoso para batches pequeños. Aquí el modelo se invoca desde una `tf.function`
+    trazada una sola vez con una `input_signature` fija de
+    (None, SEQUENCE_LENGTH, FEATURES), de modo que cualquier tamaño de batch reutiliza
+    el mismo grafo. Expone `input_shape`, `output_shape` y `predict()` igual que el
+    modelo Keras, así que puede usarse en su lugar.
+    """
+
+    def __init__(self, model, path=None):
+        self.model = model
+        self.path = path
+        # Identificador único de esta carga del modelo: una recarga produce otro id, por lo
+        # que las cachés de resultados nunca mezclan predicciones de versiones distintas
+        self.model_id = f"{path or id(model)}@{time.time_ns()}"
+        self.input_shape = model.input_shape
+        self.output_shape = model.output_shape
+        input_signature = [tf.TensorSpec(shape=(None, self.input_shape[1], self.input_shape[2]), dtype=tf.float32)]
+        self._infer = tf.function(self._call_model, input_signature=input_signature)
+
+    def _call_model(self, inputs):
+        return self.model(inputs, training=False)
+
+    def warmup(self, batch_size=1):
+        """Traza el grafo y ejecuta un batch de ceros para que la primera solicitud real no pague ese costo."""
+        start = time.perf_counter()
+        dummy = np.zeros((batch_size, self.input_shape[1], self.input_shape[2]), dtype=np.float32)
+        self.predict(dummy)
+        return time.perf_counter() - start
+
+    def predict(self, input_data):
+        """Ejecuta la inferencia sobre un batch (N, SEQUENCE_LENGTH, FEATURES) y devuelve un array NumPy."""
+        inputs = tf.convert_to_tensor(input_data, dtype=tf.float32)
+        return self._infer(inputs).numpy()
+
+
+def load_compiled_model(path, warmup=True):
+    """Carga un modelo .h5, crea su función de inferencia compilada y, opcionalmente, la precalienta."""
+    model = load_model(path, compile=False) # compile=False porque solo se usa para inferencia
+    compiled = CompiledModel(model, path=path)
+    if warmup:
+        elapsed = compiled.warmup()
+        print(f"Función de inferencia para {path} trazada y precalentada en {elapsed * 1000:.1f} ms.")
+    return compiled
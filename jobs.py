@@ -0,0 +1,413 @@
+import http.client
+import ipaddress
+import json
+import os
+import queue
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+import urllib.parse
+import uuid
+
+import metrics
+
+
+# Configuración de los trabajos asíncronos (variables de entorno)
+# Trabajos que se ejecutan a la vez en cada worker (hilos); el resto espera en la cola
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# Trabajos en espera como máximo; con la cola llena se responde 503
+JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED', 100))
+# Tiempo que se conserva el resultado de un trabajo terminado
+JOB_TTL_SECONDS = float(os.environ.get('JOB_TTL_SECONDS', 3600))
+# Un trabajo que sigue en cola o en ejecución tanto tiempo después de crearse se da por perdido
+# (p. ej., el worker que lo tenía se reinició) y se marca como fallido
+JOB_STALE_SECONDS = float(os.environ.get('JOB_STALE_SECONDS', 2 * 3600))
+# Almacén de los trabajos: memory (por proceso) o sqlite (compartido entre los workers de Gunicorn)
+JOB_STORE = os.environ.get('JOB_STORE', 'memory')
+JOB_SQLITE_PATH = os.environ.get('JOB_SQLITE_PATH', './cache/jobs.sqlite3')
+# Notificación del resultado a callback_url: tiempo máximo por intento y número de intentos
+JOB_CALLBACK_TIMEOUT = float(os.environ.get('JOB_CALLBACK_TIMEOUT', 10))
+JOB_CALLBACK_ATTEMPTS = int(os.environ.get('JOB_CALLBACK_ATTEMPTS', 3))
+# Hosts a los que se puede enviar callback_url, separados por comas ('*.ejemplo.com' incluye los
+# subdominios). Vacío (por defecto): las notificaciones están desactivadas y callback_url se rechaza
+JOB_CALLBACK_ALLOWED_HOSTS = tuple(host.strip().lower() for host in os.environ.get('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip())
+# Segundos sugeridos en Retry-After cuando la cola está llena
+JOB_RETRY_AFTER = int(os.environ.get('JOB_RETRY_AFTER', 5))
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+
+class JobQueueFullError(RuntimeError):
+    """La cola de trabajos está llena; el endpoint debe responder 503 con Retry-After."""
+
+    def __init__(self, message, retry_after=JOB_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobError(Exception):
+    """Error esperado de un trabajo (video inválido, modelo no disponible...) con el código HTTP equivalente."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def validate_callback_url(url, allowed_hosts=JOB_CALLBACK_ALLOWED_HOSTS):
+    """
+    Verifica que `callback_url` sea http(s) y que su host esté en `allowed_hosts`; lanza
+    ValueError si no. Sin hosts permitidos las notificaciones están desactivadas.
+    """
+    parsed = urllib.parse.urlsplit(str(url))
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError("El campo 'callback_url' debe ser una URL http(s).")
+    if not allowed_hosts:
+        raise ValueError("Las notificaciones a 'callback_url' están desactivadas en este servidor (JOB_CALLBACK_ALLOWED_HOSTS).")
+    host = parsed.hostname.rstrip('.')
+    if not any(host == pattern or (pattern.startswith('*.') and host.endswith(pattern[1:])) for pattern in allowed_hosts):
+        raise ValueError(f"El host de 'callback_url' no está permitido: {host}.")
+    return parsed
+
+
+def check_public_host(host, port):
+    """
+    Resuelve `host` y lanza ValueError si alguna de sus direcciones no es pública (loopback,
+    red privada, link-local como 169.254.169.254, reservada o multicast): un host permitido
+    no debe poder apuntar a servicios internos. Devuelve la primera dirección, a la que hay
+    que conectarse (ver _PinnedConnection) para que una segunda resolución no pueda cambiarla.
+    """
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    except socket.gaierror as e:
+        raise ValueError(f"No se pudo resolver el host de 'callback_url' {host}: {e}") from None
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"El host de 'callback_url' {host} resuelve a una dirección no pública: {ip}.")
+    return addresses[0]
+
+
+class _PinnedConnection(http.client.HTTPConnection):
+    """
+    Conexión HTTP(S) a `address`, la dirección ya validada con check_public_host. El nombre del
+    host se sigue usando en la cabecera Host, en SNI y en la verificación del certificado.
+    """
+
+    def __init__(self, host, port, address, tls, timeout):
+        super().__init__(host, port or (443 if tls else 80), timeout=timeout)
+        self.default_port = 443 if tls else 80 # Sin ':443' en la cabecera Host
+        self.address = address
+        self.tls = tls
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host) if self.tls else sock
+
+
+def _post_callback(parsed, address, body, timeout):
+    """POST JSON a la URL `parsed` conectándose a `address`; devuelve el código HTTP. Las redirecciones no se siguen."""
+    connection = _PinnedConnection(parsed.hostname, parsed.port, address, parsed.scheme == 'https', timeout)
+    try:
+        path = (parsed.path or '/') + (f"?{parsed.query}" if parsed.query else '')
+        connection.request('POST', path, body=body, headers={"Content-Type": "application/json"})
+        status = connection.getresponse().status
+    finally:
+        connection.close()
+    if status >= 300:
+        raise RuntimeError(f"HTTP {status}")
+    return status
+
+
+class MemoryJobStore:
+    """Trabajos en un diccionario del proceso. Con varios workers, cada uno solo ve los suyos."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job['job_id']] = dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def delete_expired(self, now):
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job['expires_at'] is not None and job['expires_at'] < now]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def unfinished(self):
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job['status'] in ('queued', 'running')]
+
+    def counts(self):
+        with self._lock:
+            statuses = [job['status'] for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in JOB_STATUSES}
+
+
+class SqliteJobStore:
+    """
+    Trabajos en una base SQLite local, compartida por todos los workers de Gunicorn de la
+    máquina: GET /jobs/<id> encuentra el trabajo aunque lo atienda otro worker.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=JOB_SQLITE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+
+    def _connect(self):
+        # Una conexión por hilo y por proceso: las conexiones de sqlite3 no se comparten entre
+        # hilos ni sobreviven al fork (el almacén se crea al importar main.py, quizá en el maestro)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                "expires_at REAL, data TEXT NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def save(self, job):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, expires_at, data) VALUES (?, ?, ?, ?)",
+                (job['job_id'], job['status'], job['expires_at'], json.dumps(job)),
+            )
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def delete_expired(self, now):
+        with self._connect() as connection:
+            return connection.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (now,)).rowcount
+
+    def unfinished(self):
+        rows = self._connect().execute("SELECT data FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update(dict(rows))
+        return counts
+
+
+def create_job_store(kind=JOB_STORE, sqlite_path=JOB_SQLITE_PATH):
+    if kind == 'memory':
+        return MemoryJobStore()
+    if kind == 'sqlite':
+        return SqliteJobStore(sqlite_path)
+    raise ValueError(f"Almacén de trabajos desconocido: {kind} (opciones: memory, sqlite)")
+
+
+class JobManager:
+    """
+    Cola acotada de trabajos asíncronos con un número fijo de hilos de ejecución.
+
+    `submit` registra el trabajo como 'queued' y lo encola sin bloquear (JobQueueFullError si
+    la cola está llena). Un hilo lo ejecuta, guarda el resultado o el error en el almacén y,
+    si se indicó `callback_url`, envía el trabajo terminado por POST. Los trabajos terminados
+    se eliminan del almacén `ttl_seconds` después de terminar. Los que siguen sin terminar
+    `stale_seconds` después de crearse (su worker se reinició) se marcan como fallidos.
+
+    Los hilos se inician con el primer trabajo, de modo que nunca existen antes del fork de Gunicorn.
+    """
+
+    def __init__(self, store=None, workers=JOB_WORKERS, max_queued=JOB_MAX_QUEUED, ttl_seconds=JOB_TTL_SECONDS,
+                 callback_timeout=JOB_CALLBACK_TIMEOUT, callback_attempts=JOB_CALLBACK_ATTEMPTS,
+                 callback_allowed_hosts=JOB_CALLBACK_ALLOWED_HOSTS, stale_seconds=JOB_STALE_SECONDS):
+        self.store = store if store is not None else create_job_store()
+        self.workers = max(1, int(workers))
+        self.max_queued = max(1, int(max_queued))
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.callback_timeout = callback_timeout
+        self.callback_attempts = max(1, int(callback_attempts))
+        self.callback_allowed_hosts = tuple(callback_allowed_hosts)
+        self._queue = queue.Queue(maxsize=self.max_queued)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self._running = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._callbacks_sent = 0
+        self._callbacks_failed = 0
+
+    def submit(self, kind, fn, params=None, callback_url=None):
+        """Encola `fn()` (que devuelve el resultado como dict) y devuelve el trabajo registrado."""
+        if callback_url is not None:
+            validate_callback_url(callback_url, self.callback_allowed_hosts)
+        self._purge_expired()
+        self._ensure_threads()
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            "params": params or {},
+            "callback_url": callback_url,
+            "callback": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": None,
+            "result": None,
+            "error": None,
+            "error_status": None,
+        }
+        self.store.save(job)
+        submitted = dict(job) # El hilo de ejecución modifica `job`; se devuelve el estado al encolar
+        try:
+            self._queue.put_nowait((job, fn))
+            metrics.set_queue_depth('jobs', self._queue.qsize())
+        except queue.Full:
+            job.update(status="failed", error="Cola de trabajos llena.", error_status=503,
+                       finished_at=time.time(), expires_at=time.time())
+            self.store.save(job)
+            with self._lock:
+                self._rejected += 1
+            raise JobQueueFullError("La cola de trabajos está llena. Intenta de nuevo más tarde.")
+        with self._lock:
+            self._submitted += 1
+        return submitted
+
+    def get(self, job_id):
+        self._purge_expired()
+        job = self.store.get(job_id)
+        if job is None or (job['expires_at'] is not None and job['expires_at'] < time.time()):
+            return None
+        return job
+
+    def _ensure_threads(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            job, fn = self._queue.get()
+            metrics.set_queue_depth('jobs', self._queue.qsize())
+            # Las etapas medidas durante el trabajo se etiquetan con el endpoint 'job:<tipo>'
+            metrics.set_context(f"job:{job['kind']}")
+            job.update(status="running", started_at=time.time())
+            self.store.save(job)
+            with self._lock:
+                self._running += 1
+            try:
+                job.update(status="succeeded", result=fn())
+            except JobError as e:
+                job.update(status="failed", error=e.message, error_status=e.status)
+            except Exception as e:
+                print(f"Error en el trabajo {job['job_id']} ({job['kind']}): {e}")
+                job.update(status="failed", error=f"Error interno del servidor durante la predicción: {str(e)}", error_status=500)
+            finally:
+                finished_at = time.time()
+                job.update(finished_at=finished_at, expires_at=finished_at + self.ttl_seconds)
+                self.store.save(job)
+                with self._lock:
+                    self._running -= 1
+                    if job['status'] == 'succeeded':
+                        self._succeeded += 1
+                    else:
+                        self._failed += 1
+                if job['status'] == 'failed':
+                    metrics.record_error(metrics.error_type(job['error_status']))
+
+            if job['callback_url']:
+                self._send_callback(job)
+
+    def _send_callback(self, job):
+        """
+        Envía el trabajo terminado a su callback_url (POST JSON), con reintentos y espera creciente.
+        Antes de cada intento se vuelve a validar el host y se resuelve: un host que apunta a una
+        dirección no pública no se notifica ni se reintenta. La conexión va a la dirección
+        validada, sin volver a resolver el nombre.
+        """
+        attempt = 0
+        for attempt in range(1, self.callback_attempts + 1):
+            try:
+                parsed = validate_callback_url(job['callback_url'], self.callback_allowed_hosts)
+                address = check_public_host(parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80))
+            except ValueError as e:
+                print(f"Notificación del trabajo {job['job_id']} rechazada: {e}")
+                job['callback'] = {"delivered": False, "attempts": attempt, "error": str(e)}
+                with self._lock:
+                    self._callbacks_failed += 1
+                break
+            try:
+                body = json.dumps(job).encode('utf-8')
+                status = _post_callback(parsed, address, body, self.callback_timeout)
+                job['callback'] = {"delivered": True, "attempts": attempt, "http_status": status}
+                with self._lock:
+                    self._callbacks_sent += 1
+                break
+            except Exception as e:
+                print(f"Error al notificar el trabajo {job['job_id']} a {job['callback_url']} (intento {attempt}): {e}")
+                job['callback'] = {"delivered": False, "attempts": attempt, "error": str(e)}
+                if attempt < self.callback_attempts:
+                    time.sleep(2 ** (attempt - 1))
+        else:
+            with self._lock:
+                self._callbacks_failed += 1
+        self.store.save(job)
+
+    def _purge_expired(self):
+        # Como mucho una vez cada 10 segundos: en SQLite es una consulta de borrado
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + 10
+        self.store.delete_expired(now)
+        for job in self.store.unfinished():
+            if job['created_at'] < now - self.stale_seconds:
+                print(f"Trabajo {job['job_id']} ({job['kind']}) sin terminar desde hace {now - job['created_at']:.0f} s; se marca como fallido.")
+                job.update(status="failed", error="El trabajo se perdió: el worker que lo ejecutaba se reinició o no terminó a tiempo.",
+                           error_status=500, finished_at=now, expires_at=now + self.ttl_seconds)
+                self.store.save(job)
+
+    def stats(self):
+        self._purge_expired()
+        with self._lock:
+            stats = {
+                "store": self.store.name,
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._queue.qsize(),
+                "max_queued": self.max_queued,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "succeeded": self._succeeded,
+                "failed": self._failed,
+                "callbacks_sent": self._callbacks_sent,
+                "callbacks_failed": self._callbacks_failed,
+            }
+        stats["stored"] = self.store.counts()
+        return stats
@@ -0,0 +1,265 @@
+import hashlib
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Configuración de la caché de keypoints extraídos de videos (variables de entorno)
+KEYPOINT_CACHE_ENABLED = os.environ.get('KEYPOINT_CACHE_ENABLED', '1') == '1'
+KEYPOINT_CACHE_MEMORY_MB = float(os.environ.get('KEYPOINT_CACHE_MEMORY_MB', 64))
+KEYPOINT_CACHE_DIR = os.environ.get('KEYPOINT_CACHE_DIR', './cache/keypoints')
+KEYPOINT_CACHE_DISK_MB = float(os.environ.get('KEYPOINT_CACHE_DISK_MB', 512))
+KEYPOINT_CACHE_TTL_SECONDS = float(os.environ.get('KEYPOINT_CACHE_TTL_SECONDS', 24 * 3600))
+# Tiempo máximo de la solicitud HEAD usada para obtener ETag / Last-Modified. La solicitud se
+# hace en el hilo de la petición, también cuando después hay acierto en la caché
+KEYPOINT_CACHE_HEAD_TIMEOUT = float(os.environ.get('KEYPOINT_CACHE_HEAD_TIMEOUT', 2))
+# Segundos durante los que se reutiliza la huella de una URL sin repetir la solicitud HEAD
+# (0 = una solicitud HEAD por petición). Un cambio del video en ese intervalo no se detecta
+KEYPOINT_CACHE_FINGERPRINT_SECONDS = float(os.environ.get('KEYPOINT_CACHE_FINGERPRINT_SECONDS', 60))
+# Número máximo de URLs cuya huella se recuerda
+_FINGERPRINT_MEMO_SIZE = 1024
+
+_fingerprint_memo = OrderedDict()  # url -> (timestamp, huella o None)
+_fingerprint_lock = threading.Lock()
+
+
+def _http_fingerprint(url_video, timeout):
+    """Huella de una URL HTTP(S) a partir de la solicitud HEAD, o None si no tiene validadores."""
+    try:
+        head = urllib.request.Request(url_video, method='HEAD')
+        with urllib.request.urlopen(head, timeout=timeout) as response:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            content_length = response.headers.get('Content-Length')
+    except Exception as e:
+        print(f"No se pudo obtener la cabecera del video {url_video}: {e}")
+        return None
+    # Content-Length por sí solo no identifica el contenido: un video reemplazado por otro del
+    # mismo tamaño devolvería keypoints ajenos
+    if etag is None and last_modified is None:
+        return None
+    return f"etag={etag};last_modified={last_modified};length={content_length}"
+
+
+def video_fingerprint(url_video, timeout=KEYPOINT_CACHE_HEAD_TIMEOUT, memo_seconds=KEYPOINT_CACHE_FINGERPRINT_SECONDS):
+    """
+    Identifica la versión del contenido de un video sin descargarlo: ETag o Last-Modified
+    (solicitud HEAD) para URLs HTTP(S), o tamaño y fecha de modificación para archivos locales.
+    La huella de una URL se recuerda `memo_seconds` segundos para no repetir la solicitud HEAD
+    en cada petición. Devuelve None si no hay forma de validar el contenido, en cuyo caso no se
+    usa la caché.
+    """
+    if url_video.startswith(('http://', 'https://')):
+        now = time.monotonic()
+        with _fingerprint_lock:
+            memo = _fingerprint_memo.get(url_video)
+            if memo is not None and now - memo[0] <= memo_seconds:
+                _fingerprint_memo.move_to_end(url_video)
+                return memo[1]
+        fingerprint = _http_fingerprint(url_video, timeout)
+        if memo_seconds > 0:
+            with _fingerprint_lock:
+                _fingerprint_memo[url_video] = (now, fingerprint)
+                _fingerprint_memo.move_to_end(url_video)
+                while len(_fingerprint_memo) > _FINGERPRINT_MEMO_SIZE:
+                    _fingerprint_memo.popitem(last=False)
+        return fingerprint
+
+    if os.path.isfile(url_video):
+        stat = os.stat(url_video)
+        return f"size={stat.st_size};mtime={stat.st_mtime_ns}"
+    return None
+
+
+class KeypointCache:
+    """
+    Caché de keypoints extraídos de videos, en dos niveles.
+
+    La clave combina la URL, la huella del contenido (ETag / Last-Modified), el tipo de
+    extracción y los parámetros de muestreo. El primer nivel es un LRU en memoria acotado
+    en bytes, con arrays de solo lectura porque se comparten entre peticiones; el segundo
+    guarda cada secuencia como `.npz` comprimido en disco, con TTL y desalojo de los
+    archivos usados hace más tiempo cuando se supera el tamaño máximo.
+
+    El TTL cuenta desde que se extrajeron los keypoints (fecha de modificación del archivo) y
+    un acierto no lo renueva: una entrada muy pedida también caduca y se vuelve a extraer. Cada
+    acierto en disco actualiza la fecha de acceso del archivo, que ordena el desalojo (LRU).
+    """
+
+    def __init__(self, directory=KEYPOINT_CACHE_DIR, memory_mb=KEYPOINT_CACHE_MEMORY_MB,
+                 disk_mb=KEYPOINT_CACHE_DISK_MB, ttl_seconds=KEYPOINT_CACHE_TTL_SECONDS, enabled=KEYPOINT_CACHE_ENABLED):
+        self.directory = directory
+        self.memory_limit = int(memory_mb * 1024 * 1024)
+        self.disk_limit = int(disk_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._memory = OrderedDict()  # clave -> (timestamp, array)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._uncacheable = 0
+        if self.enabled and self.disk_limit > 0:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def make_key(self, url_video, type_extract, *extra):
+        """Construye la clave de caché o devuelve None si el contenido del video no se puede validar."""
+        if not self.enabled:
+            return None
+        fingerprint = video_fingerprint(url_video)
+        if fingerprint is None:
+            with self._lock:
+                self._uncacheable += 1
+            return None
+        raw_key = '|'.join([url_video, fingerprint, type_extract, *[str(value) for value in extra]])
+        return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """Devuelve el array (frames, features) guardado para `key` (solo lectura), o None si no está o expiró."""
+        if key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            hit = False
+            if entry is not None:
+                created, array = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+                    hit = True
+                else:
+                    self._memory_bytes -= array.nbytes
+                    del self._memory[key]
+        if hit:
+            self._touch_disk(key, now, created)
+            return array
+
+        array, created = self._read_disk(key, now)
+        with self._lock:
+            if array is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+        self._put_memory(key, array, created) # Conserva la caducidad original
+        return array
+
+    def put(self, key, array):
+        """Guarda la secuencia de keypoints en memoria y en disco."""
+        if key is None or array is None:
+            return
+        array = np.array(array, dtype=np.float32, order='C', copy=True)
+        now = time.time()
+        self._put_memory(key, array, now)
+        self._write_disk(key, array)
+
+    def _put_memory(self, key, array, created):
+        array.setflags(write=False) # Se comparte entre peticiones: no debe modificarse
+        if array.nbytes > self.memory_limit:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous[1].nbytes
+            self._memory[key] = (created, array)
+            self._memory_bytes += array.nbytes
+            while self._memory_bytes > self.memory_limit:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.nbytes
+
+    def _read_disk(self, key, now):
+        """Devuelve `(array, created)` con la fecha en que se guardó la entrada, o `(None, None)`."""
+        if self.disk_limit <= 0:
+            return None, None
+        path = self._disk_path(key)
+        try:
+            created = os.path.getmtime(path)
+            if now - created > self.ttl_seconds:
+                os.remove(path)
+                return None, None
+            with np.load(path) as data:
+                array = data['keypoints']
+            os.utime(path, (now, created)) # Último acceso para el desalojo; la fecha de modificación no cambia
+            return array, created
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            print(f"Error al leer la caché de keypoints {path}: {e}")
+            return None, None
+
+    def _touch_disk(self, key, now, created):
+        """Registra un acierto en memoria como acceso al archivo, para que el desalojo en disco siga el mismo orden."""
+        if self.disk_limit <= 0:
+            return
+        try:
+            os.utime(self._disk_path(key), (now, created))
+        except OSError:
+            pass
+
+    def _write_disk(self, key, array):
+        if self.disk_limit <= 0:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, keypoints=array)
+            os.replace(tmp_path, path) # Escritura atómica: nunca se lee un archivo a medias
+            self._evict_disk()
+        except Exception as e:
+            print(f"Error al escribir la caché de keypoints {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict_disk(self):
+        """Elimina los archivos expirados y, si se supera el tamaño máximo, los usados hace más tiempo."""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.npz'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._remove_file(entry.path)
+            else:
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_limit:
+                break
+            self._remove_file(path)
+            total -= size
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        """Contadores de aciertos y fallos de la caché y ocupación de memoria."""
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "uncacheable": self._uncacheable,
+                "hit_rate": (self._memory_hits + self._disk_hits) / lookups if lookups else None,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
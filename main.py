@@ -1,14 +1,33 @@
 # main.py
+# TensorFlow, OpenCV y MediaPipe no se importan aquí: se cargan la primera vez que se usan
+# (ver model_registry.py y holistic_pool.py), así que el health check responde de inmediato
+import startup
+import contextlib
+import functools
+import hmac
 import os
+import time
 import numpy as np
-import tensorflow as tf
-from flask import Flask, request, jsonify
-from tensorflow.keras.models import load_model
+from flask import Flask, Response, request, jsonify, got_request_exception
 import constants
-from utils import process_video_sign
+import metrics
+from holistic_pool import HolisticPool, PoolBusyError, PoolTimeoutError, HOLISTIC_POOL_RETRY_AFTER, HOLISTIC_MODEL_COMPLEXITIES
+from keypoint_cache import KeypointCache
+from batching import BATCH_ENDPOINT_MAX_ITEMS
+from model_registry import ModelRegistry, ModelNotFoundError, MODEL_PRELOAD
+from prediction_cache import PredictionCache
+from uploads import iter_upload_chunks, process_upload
+from payloads import PayloadError, decode_frames_request
+from sessions import SessionManager, SessionLimitError, SESSION_INFER_EVERY, SESSIONS_ENABLED, iter_session_events
+from jobs import JobManager, JobError, JobQueueFullError
+from responses import JSONProvider, parse_output_options
+from pipeline import InferencePipeline, keypoints_decoder, batch_decoder, video_decoder
+from transcription import transcribe_keypoints, TRANSCRIPTION_STRIDE, TRANSCRIPTION_MIN_CONFIDENCE, TRANSCRIPTION_MIN_WINDOWS
 from flask_cors import CORS # Importa la extensión CORS
 
 app = Flask(__name__)
+# JSON con orjson si está instalado (ver JSON_SERIALIZER en responses.py)
+app.json = JSONProvider(app)
 
 origins = ["http://localhost:3000", "https://www.colsign.com.co", "https://colsigns-app.vercel.app"]
 CORS(app, origins=origins)
@@ -17,352 +36,672 @@ CORS(app, origins=origins)
 # Cloud Run buscará estos archivos en la misma carpeta que main.py
 MODEL_RECOGNITION_ABECEDARIO_PATH = './models/actionAbecedario.h5'
 MODEL_RECOGNITION_PALABRASV2_PATH = './models/actionPalabrasV2.h5'
-
-
-# Carga de modelos (se cargarán una vez al iniciar la aplicación)
-# Usamos un bloque try-except para manejar errores si los modelos no se encuentran
-try:
-    # Modelo de reconocimiento de señas (entrada: keypoints, salida: etiqueta de seña)
-    print(f"Cargando el modelo de reconocimiento abecedario desde: {MODEL_RECOGNITION_ABECEDARIO_PATH}")
-    model_recognition_abcedario = load_model(MODEL_RECOGNITION_ABECEDARIO_PATH, compile=False) # compile=False si no vas a reentrenar
-    # Compilar el modelo si necesitas usarlo para inferencia después de cargarlo sin compile=True
-    # model_recognition.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
-    print("Modelo de reconocimiento para abecedario cargado exitosamente.")   
-
-    # Modelo de reconocimiento de señas (entrada: keypoints, salida: etiqueta de seña)
-    print(f"Cargando el modelo de reconocimiento palabras V2 desde: {MODEL_RECOGNITION_PALABRASV2_PATH}")
-    model_recognition_palabrasv2 = load_model(MODEL_RECOGNITION_PALABRASV2_PATH, compile=False) # compile=False si no vas a reentrenar
-    # Compilar el modelo si necesitas usarlo para inferencia después de cargarlo sin compile=True
-    # model_recognition.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
-    print("Modelo de reconocimiento para palabras V2 cargado exitosamente.")
-
-except Exception as e:
-    print(f"Error al cargar uno o ambos modelos: {e}")
-    model_recognition_abcedario = None
-    model_recognition_palabrasv2 = None
-    # En un entorno de producción, aquí podrías querer que la aplicación falle
-    # o que el endpoint de salud (health check) falle para que Cloud Run no dirija tráfico.
-
-# Define el número de clases de salida para el modelo de reconocimiento
-# DEBES AJUSTAR ESTO AL NÚMERO REAL DE SEÑAS EN TU ENTRENAMIENTO
-# Por ejemplo, si tienes 28 señas, sería 28. Si tienes 500, sería 500.
-NUM_SIGN_CLASSES_alphabet = len(constants.signs_abc) # Reemplaza con tu número real de clases (acciones.shape[0])
-NUM_SIGN_CLASSES_wordsv2 = len(constants.signs_wordsV2) # Reemplaza con tu número real de clases (acciones.shape[0])
-
-# Opcional: Define una lista de etiquetas de señas para mapear las predicciones numéricas
-# Esto es útil para devolver nombres legibles en lugar de solo números.
-# Asegúrate de que el índice corresponda a la salida de tu modelo.
-SIGN_LABELS_alphabet = constants.signs_abc
-SIGN_LABELS_wordsv2 = constants.signs_wordsV2 # Ejemplo: seña_0, seña_1, ...
-# Si tienes tus etiquetas reales:
-# SIGN_LABELS = ["hola", "gracias", "adios", ...] # Reemplaza con tus etiquetas reales
+# Token para los endpoints de administración de modelos (recarga y activación de versiones).
+# Sin token configurado esos endpoints responden 403.
+MODEL_ADMIN_TOKEN = os.environ.get('MODEL_ADMIN_TOKEN', '')
+
+# Manifiesto usado si no existe models/manifest.json (MODEL_MANIFEST): los dos modelos originales
+DEFAULT_MANIFEST = {
+    "models": {
+        "alphabet": {
+            "default_version": "1",
+            "versions": {"1": {"path": MODEL_RECOGNITION_ABECEDARIO_PATH, "labels": constants.signs_abc,
+                               "input_shape": [constants.sequence_length, constants.point_hands], "type_extract": "hands"}}
+        },
+        "words_v2": {
+            "default_version": "2",
+            "versions": {"2": {"path": MODEL_RECOGNITION_PALABRASV2_PATH, "labels": constants.signs_wordsV2,
+                               "input_shape": [constants.sequence_length, constants.point_hands_pose], "type_extract": "pose_hands"}}
+        }
+    }
+}
+
+# Caché LRU de probabilidades para entradas idénticas, compartida por todos los endpoints
+# (ver PREDICTION_CACHE_MEMORY_MB en prediction_cache.py)
+prediction_cache = PredictionCache()
+
+# Registro de modelos versionados según el manifiesto: cada versión se carga (con su backend) la
+# primera vez que un endpoint la usa, o en segundo plano al arrancar si MODEL_PRELOAD=1.
+# Al descargar una versión se invalidan sus entradas en la caché de predicciones (ver model_registry.py)
+model_registry = ModelRegistry(fallback_manifest=DEFAULT_MANIFEST,
+                               on_unload=lambda model: prediction_cache.invalidate(model.model_id))
+
+# Pool de procesos con instancias persistentes de MediaPipe Holistic para los endpoints de video
+# (ver HOLISTIC_POOL_SIZE y HOLISTIC_POOL_MAX_PENDING en holistic_pool.py)
+holistic_pool = HolisticPool()
+
+# Caché de keypoints extraídos por video (memoria + disco), compartida por ambos endpoints de video
+keypoint_cache = KeypointCache()
+
+# Sesiones de reconocimiento en tiempo real con ventana deslizante
+# (ver SESSION_MAX_ACTIVE y SESSION_IDLE_SECONDS en sessions.py)
+session_manager = SessionManager()
+
+# Trabajos asíncronos para videos largos: cola acotada con resultados consultables en /jobs/<id>
+# (ver JOB_WORKERS, JOB_MAX_QUEUED, JOB_TTL_SECONDS y JOB_STORE en jobs.py)
+job_manager = JobManager()
+
+# Las etiquetas de cada modelo (el índice corresponde a la salida del modelo) se definen por
+# versión en el manifiesto; DEFAULT_MANIFEST usa las de constants.py
+
+# Métricas por solicitud (ver metrics.py): duración, solicitudes en curso y errores por endpoint.
+# El endpoint se etiqueta con la regla de la ruta (/sessions/<session_id>/frames), no con la URL.
+@app.before_request
+def start_request_metrics():
+    if request.endpoint != 'prometheus_metrics':
+        metrics.request_started(request.url_rule.rule if request.url_rule is not None else 'unmatched')
+
+@app.after_request
+def finish_request_metrics(response):
+    metrics.request_finished(request.method, response.status_code)
+    return response
+
+@app.teardown_request
+def abort_request_metrics(error=None):
+    # Solo tiene efecto si after_request no llegó a ejecutarse
+    metrics.request_finished(request.method, 500)
+
+def record_unhandled_exception(sender, exception, **extra):
+    metrics.record_exception(exception)
+
+got_request_exception.connect(record_unhandled_exception, app)
+
+def uses_model(name, not_loaded_message="Modelo de reconocimiento no cargado."):
+    """
+    Decorador de endpoints: toma la versión predeterminada de `name` del registro durante
+    toda la solicitud y la pasa como primer argumento (ModelVersion). Un cambio de versión
+    a mitad de la solicitud no la afecta; la versión anterior se descarga al terminar. Si
+    `name` se eliminó del manifiesto responde 503.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with contextlib.ExitStack() as stack:
+                try:
+                    entry = stack.enter_context(model_registry.acquire(name))
+                except ModelNotFoundError as e:
+                    return jsonify({"error": e.message}), 503
+                if entry is None:
+                    return jsonify({"error": not_loaded_message}), 500
+                return view(entry, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def make_pipeline(entry, **kwargs):
+    """Pipeline de inferencia de una versión del registro, con la caché de predicciones compartida (ver pipeline.py)."""
+    return InferencePipeline.for_model(entry, prediction_cache=prediction_cache, **kwargs)
 
 @app.route('/predict_recognition_alphabet', methods=['POST'])
-def predict_recognition_alphabet():
+@uses_model('alphabet')
+def predict_recognition_alphabet(entry):
     """
     Endpoint para el reconocimiento de señas.
     Recibe una secuencia de puntos de control y devuelve la seña predicha.
     """
-    if model_recognition_abcedario is None:
-        return jsonify({"error": "Modelo de reconocimiento no cargado."}), 500
-
-    if not request.is_json:
-        return jsonify({"error": "La solicitud debe ser en formato JSON."}), 400
-
-    data = request.get_json()
-    keypoints_sequence = data.get('keypoints')
-
-    if keypoints_sequence is None:
-        return jsonify({"error": "Falta el campo 'keypoints' en la solicitud."}), 400
-
-    try:
-        # Convertir la lista de Python a un array NumPy
-        # Asegúrate de que el formato de los keypoints sea consistente (ej. [frame1_flat_array, frame2_flat_array, ...])
-        # Y que la longitud de la secuencia coincida con la entrada del modelo.
-        input_data = np.array(keypoints_sequence, dtype=np.float32)
-
-        # Verificar y ajustar la forma del array
-        # El modelo espera (1, SEQUENCE_LENGTH, 258)
-        # Asumimos que SEQUENCE_LENGTH es la longitud esperada por tu modelo (30 o 60)
-        # La dimensión de las características por fotograma es 258 (x,y,z para 86 keypoints, o 258 si es X,Y,Z para cada keypoint)
-        # Ajusta `expected_sequence_length` según la longitud que estés usando en tu entrenamiento (30 o 60)
-        expected_sequence_length = model_recognition_abcedario.input_shape[1] # Obtiene la longitud de secuencia del modelo
-        expected_feature_dim = model_recognition_abcedario.input_shape[2] # Obtiene la dimensión de las características (258)
-
-        if input_data.shape[0] != expected_sequence_length or input_data.shape[1] != expected_feature_dim:
-            # Aquí puedes implementar padding/truncation si es necesario,
-            # o simplemente rechazar la solicitud con un error.
-            return jsonify({
-                "error": "Forma de la secuencia de keypoints incorrecta.",
-                "expected_shape": (expected_sequence_length, expected_feature_dim),
-                "received_shape": input_data.shape
-            }), 400
-        
-        # Añadir la dimensión del batch (1 para una única inferencia)
-        input_data = np.expand_dims(input_data, axis=0) # Ahora la forma es (1, SEQUENCE_LENGTH, 258)
-
-        # Realizar la predicción
-        predictions = model_recognition_abcedario.predict(input_data)
-
-        # Obtener la clase predicha (el índice con la probabilidad más alta)
-        predicted_class_index = np.argmax(predictions, axis=1)[0]
-        
-        # Mapear el índice a una etiqueta legible
-        predicted_sign_label = SIGN_LABELS_alphabet[predicted_class_index] if predicted_class_index < len(SIGN_LABELS_alphabet) else f"clase_desconocida_{predicted_class_index}"
-
-        # Devolver la predicción y las probabilidades
-        return jsonify({
-            "prediction": predicted_sign_label,
-            "probabilities": predictions[0].tolist() # Convertir a lista para JSON
-        })
-
-    except Exception as e:
-        print(f"Error durante la inferencia de reconocimiento: {e}")
-        return jsonify({"error": f"Error interno del servidor durante la predicción: {str(e)}"}), 500
+    # Keypoints en JSON ({"keypoints": [...]}) para los clientes existentes, o float32 crudo / .npy /
+    # msgpack, verificados contra (SEQUENCE_LENGTH, FEATURES) del modelo. La predicción pasa por la
+    # caché de resultados y el micro-batcher. Opciones de salida: top_k, precision y format=msgpack
+    return make_pipeline(entry, decoder=keypoints_decoder(request), sampler=None).handle()
 
 @app.route('/predict_recognition_words_v2', methods=['POST'])
-def predict_recognition_words_v2():
+@uses_model('words_v2', "Modelo de reconocimiento de palabras V2 no cargado.")
+def predict_recognition_words_v2(entry):
     """
     Endpoint para el reconocimiento de señas.
     Recibe una secuencia de puntos de control y devuelve la seña predicha.
     """
-    if model_recognition_palabrasv2 is None:
-        return jsonify({"error": "Modelo de reconocimiento de palabras V2 no cargado."}), 500
+    return make_pipeline(entry, decoder=keypoints_decoder(request), sampler=None).handle()
 
+@app.route('/predict_recognition_alphabet/batch', methods=['POST'])
+@uses_model('alphabet')
+def predict_recognition_alphabet_batch(entry):
+    """
+    Endpoint para el reconocimiento de alfabeto por lotes.
+    Recibe varias secuencias de keypoints y devuelve una predicción o un error por cada una.
+    """
+    # Una sola pasada del modelo para todas las secuencias válidas que no estén en la caché
+    return make_pipeline(entry, decoder=batch_decoder(request, BATCH_ENDPOINT_MAX_ITEMS), sampler=None).handle(batch=True)
+
+@app.route('/predict_recognition_words_v2/batch', methods=['POST'])
+@uses_model('words_v2', "Modelo de reconocimiento de palabras V2 no cargado.")
+def predict_recognition_words_v2_batch(entry):
+    """
+    Endpoint para el reconocimiento de palabras V2 por lotes.
+    Recibe varias secuencias de keypoints y devuelve una predicción o un error por cada una.
+    """
+    return make_pipeline(entry, decoder=batch_decoder(request, BATCH_ENDPOINT_MAX_ITEMS), sampler=None).handle(batch=True)
+
+def extract_video_keypoints(type_extract, url_video, target_frames, model_complexity=None):
+    """
+    Obtiene los keypoints de un video desde la caché o, si no están, desde el pool de Holistic.
+    La clave incluye la huella del contenido (ETag / Last-Modified), el tipo de extracción,
+    los parámetros de muestreo y los de detección (resolución, recorte y complejidad del modelo),
+    así que un cambio en cualquiera de ellos no reutiliza resultados.
+    """
+    # Importa OpenCV y MediaPipe en el primer video
+    from utils import VIDEO_SAMPLED_EXTRACTION, VIDEO_TRACKING_NEIGHBORHOOD, VIDEO_MAX_SIDE, VIDEO_ROI_CROP, HOLISTIC_MODEL_COMPLEXITY
+    if model_complexity is None:
+        model_complexity = HOLISTIC_MODEL_COMPLEXITY
+    cache_key = keypoint_cache.make_key(url_video, type_extract, target_frames, VIDEO_SAMPLED_EXTRACTION, VIDEO_TRACKING_NEIGHBORHOOD,
+                                        VIDEO_MAX_SIDE, VIDEO_ROI_CROP, model_complexity)
+    cached_keypoints = keypoint_cache.get(cache_key)
+    if cached_keypoints is not None:
+        return cached_keypoints
+
+    keypoints = holistic_pool.process_video(type_extract, url_video, target_frames=target_frames, model_complexity=model_complexity)
+    if keypoints is not None and len(keypoints) > 0:
+        keypoint_cache.put(cache_key, np.asarray(keypoints, dtype=np.float32))
+    return keypoints
+
+def url_video_decoder(url_video, model_complexity=None, empty_message=None):
+    """Keypoints del video en `url_video`, desde la caché o el pool de Holistic (503 si la cola está llena)."""
+    def extract(type_extract, sequence_length):
+        return extract_video_keypoints(type_extract, url_video, sequence_length, model_complexity)
+    return video_decoder(extract, empty_message)
+
+def parse_model_complexity(source):
+    """
+    'model_complexity' opcional de la solicitud (cuerpo JSON o parámetros de la URL): el modelo de
+    pose de Holistic, 0 (más rápido) a 2. None usa HOLISTIC_MODEL_COMPLEXITY. Lanza ValueError si no es válido.
+    """
+    value = source.get('model_complexity')
+    if value is None:
+        return None
+    if str(value) not in [str(option) for option in HOLISTIC_MODEL_COMPLEXITIES]:
+        raise ValueError(f"'model_complexity' debe ser uno de: {', '.join(str(option) for option in HOLISTIC_MODEL_COMPLEXITIES)}.")
+    return int(value)
+
+def predict_video_url(entry, default_type_extract):
+    """
+    Lógica común de los endpoints de video: valida la solicitud y la encola como trabajo con
+    {"async": true}, o extrae los keypoints, los ajusta a la longitud del modelo (muestreo
+    distribuido o relleno con ceros) y devuelve la predicción.
+    """
     if not request.is_json:
         return jsonify({"error": "La solicitud debe ser en formato JSON."}), 400
 
     data = request.get_json()
-    keypoints_sequence = data.get('keypoints')
-
-    if keypoints_sequence is None:
-        return jsonify({"error": "Falta el campo 'keypoints' en la solicitud."}), 400
+    url_video = data.get('url_video')
+    type_extract = data.get('type_extract', default_type_extract)
 
+    if url_video is None:
+        return jsonify({"error": "Falta el campo 'url_video' en la solicitud."}), 400
+    if type_extract not in ['hands', 'pose_hands']:
+        return jsonify({"error": "El campo 'type_extract' debe ser 'hands' o 'pose_hands'."}), 400
     try:
-        # Convertir la lista de Python a un array NumPy
-        # Asegúrate de que el formato de los keypoints sea consistente (ej. [frame1_flat_array, frame2_flat_array, ...])
-        # Y que la longitud de la secuencia coincida con la entrada del modelo.
-        input_data = np.array(keypoints_sequence, dtype=np.float32)
-
-        # Verificar y ajustar la forma del array
-        # El modelo espera (1, SEQUENCE_LENGTH, 258)
-        # Asumimos que SEQUENCE_LENGTH es la longitud esperada por tu modelo (30 o 60)
-        # La dimensión de las características por fotograma es 258 (x,y,z para 86 keypoints, o 258 si es X,Y,Z para cada keypoint)
-        # Ajusta `expected_sequence_length` según la longitud que estés usando en tu entrenamiento (30 o 60)
-        expected_sequence_length = model_recognition_palabrasv2.input_shape[1] # Obtiene la longitud de secuencia del modelo
-        expected_feature_dim = model_recognition_palabrasv2.input_shape[2] # Obtiene la dimensión de las características (258)
-
-        if input_data.shape[0] != expected_sequence_length or input_data.shape[1] != expected_feature_dim:
-            # Aquí puedes implementar padding/truncation si es necesario,
-            # o simplemente rechazar la solicitud con un error.
-            return jsonify({
-                "error": "Forma de la secuencia de keypoints incorrecta.",
-                "expected_shape": (expected_sequence_length, expected_feature_dim),
-                "received_shape": input_data.shape
-            }), 400
-        
-        # Añadir la dimensión del batch (1 para una única inferencia)
-        input_data = np.expand_dims(input_data, axis=0) # Ahora la forma es (1, SEQUENCE_LENGTH, 258)
-
-        # Realizar la predicción
-        predictions = model_recognition_palabrasv2.predict(input_data)
-
-        # Obtener la clase predicha (el índice con la probabilidad más alta)
-        predicted_class_index = np.argmax(predictions, axis=1)[0]
-        
-        # Mapear el índice a una etiqueta legible
-        predicted_sign_label = SIGN_LABELS_wordsv2[predicted_class_index] if predicted_class_index < len(SIGN_LABELS_wordsv2) else f"clase_desconocida_{predicted_class_index}"
-
-        # Devolver la predicción y las probabilidades
-        return jsonify({
-            "prediction": predicted_sign_label,
-            "probabilities": predictions[0].tolist() # Convertir a lista para JSON
-        })
+        model_complexity = parse_model_complexity(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        output_options = parse_output_options(len(entry.labels))
+    except PayloadError as e:
+        return jsonify(e.to_dict()), e.status
+    if wants_async(data):
+        return submit_video_job(entry.name, None, type_extract, url_video, data.get('callback_url'), output_options, model_complexity)
 
-    except Exception as e:
-        print(f"Error durante la inferencia de reconocimiento: {e}")
-        return jsonify({"error": f"Error interno del servidor durante la predicción: {str(e)}"}), 500
+    return make_pipeline(entry, type_extract=type_extract, decoder=url_video_decoder(url_video, model_complexity),
+                         output_options=output_options).handle()
 
 @app.route('/predict_recognition_video_alphabet', methods=['POST'])
-def predict_recognition_video__alphabet():
+@uses_model('alphabet')
+def predict_recognition_video__alphabet(entry):
     """
     Endpoint para el reconocimiento de señas mediante procesamiento de videos.
     Recibe una URL de video y devuelve la seña predicha utilizando muestreo distribuido.
     """
-    if model_recognition_abcedario is None:
-        return jsonify({"error": "Modelo de reconocimiento no cargado."}), 500
+    return predict_video_url(entry, 'hands')  # Por defecto, extrae keypoints de las manos
+
+@app.route('/predict_recognition_video_words_v2', methods=['POST'])
+@uses_model('words_v2', "Modelo de reconocimiento de palabras V2 no cargado.")
+def predict_recognition_video_words_v2(entry):
+    """
+    Endpoint para el reconocimiento de señas mediante procesamiento de videos.
+    Recibe una URL de video y devuelve la seña predicha utilizando muestreo distribuido.
+    """
+    return predict_video_url(entry, 'pose_hands')
+
+def wants_async(data):
+    """La solicitud pide modo asíncrono con {"async": true} en el JSON o ?async=1."""
+    return data.get('async') in (True, 1, '1', 'true') or request.args.get('async') in ('1', 'true')
+
+def run_video_job(model_name, version, type_extract, url_video, output_options=None, model_complexity=None):
+    """
+    Trabajo asíncrono de reconocimiento con video: el mismo pipeline que los endpoints de video
+    (keypoints del pool de Holistic o de la caché, muestreo y predicción) fuera de la solicitud.
+    Se usa la versión del modelo vigente cuando el trabajo se ejecuta. `output_options` aplica
+    top_k y precision al resultado, que siempre se guarda como JSON.
+    """
+    try:
+        with model_registry.acquire(model_name, version) as entry:
+            if entry is None:
+                raise JobError("Modelo de reconocimiento no cargado.", 500)
+
+            pipeline = make_pipeline(entry, type_extract=type_extract, output_options=output_options,
+                                     fields={"model": entry.name, "version": entry.version})
+            all_extracted_keypoints = wait_for_holistic_pool(
+                lambda: extract_video_keypoints(type_extract, url_video, entry.sequence_length, model_complexity))
+            if all_extracted_keypoints is None or len(all_extracted_keypoints) == 0:
+                raise JobError("No se pudieron extraer keypoints del video. El video podría estar vacío o inaccesible.", 400)
+            return pipeline.run(all_extracted_keypoints)
+    except ModelNotFoundError as e:
+        raise JobError(e.message, 404)
+    except PayloadError as e:
+        raise JobError(e.message, e.status)
+    except PoolTimeoutError as e:
+        raise JobError(str(e), 504)
+
+def wait_for_holistic_pool(extract):
+    """
+    Ejecuta `extract()` reintentando mientras el pool de Holistic esté lleno. En segundo plano
+    no hay cliente esperando: el trabajo espera su turno (hasta el timeout del pool) en lugar de fallar.
+    """
+    deadline = time.monotonic() + holistic_pool.timeout
+    while True:
+        try:
+            return extract()
+        except PoolBusyError as e:
+            if time.monotonic() > deadline:
+                raise JobError(str(e), 503)
+            time.sleep(e.retry_after)
+
+def submit_video_job(model_name, version, type_extract, url_video, callback_url=None, output_options=None, model_complexity=None):
+    """Encola un trabajo de video y responde 202 con el trabajo (503 con Retry-After si la cola está llena)."""
+    output_options = {k: v for k, v in (output_options or {}).items() if k != 'format' and v is not None}
+    params = {"model": model_name, "version": version, "type_extract": type_extract, "url_video": url_video, **output_options}
+    if model_complexity is not None:
+        params["model_complexity"] = model_complexity
+    return submit_job('video', functools.partial(run_video_job, model_name, version, type_extract, url_video, output_options, model_complexity),
+                      params, callback_url)
+
+def submit_job(kind, fn, params, callback_url=None):
+    """Encola `fn` como trabajo asíncrono y responde 202 con el trabajo y la cabecera Location."""
+    try:
+        job = job_manager.submit(kind, fn, params=params, callback_url=callback_url)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except JobQueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    return jsonify(job), 202, {"Location": f"/jobs/{job['job_id']}"}
+
+def predict_uploaded_video(entry):
+    """
+    Lógica común de los endpoints /upload: extrae los keypoints del video mientras se recibe
+    (ver uploads.process_upload), ajusta la secuencia y devuelve la predicción.
+    """
+    type_extract = request.args.get('type_extract', entry.type_extract)
+    if type_extract not in ['hands', 'pose_hands']:
+        return jsonify({"error": "El parámetro 'type_extract' debe ser 'hands' o 'pose_hands'."}), 400
+    try:
+        model_complexity = parse_model_complexity(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def extract(type_extract, sequence_length):
+        return process_upload(holistic_pool, type_extract, iter_upload_chunks(request), target_frames=sequence_length,
+                              model_complexity=model_complexity)
+    decoder = video_decoder(extract, "No se pudieron extraer keypoints del video. El video podría estar vacío o en un formato no soportado.")
+    return make_pipeline(entry, type_extract=type_extract, decoder=decoder).handle()
+
+@app.route('/predict_recognition_video_alphabet/upload', methods=['POST'])
+@uses_model('alphabet')
+def predict_recognition_video_alphabet_upload(entry):
+    """
+    Endpoint para el reconocimiento de alfabeto a partir de un video subido.
+    El video se decodifica y procesa con MediaPipe a medida que llegan los bytes.
+    """
+    return predict_uploaded_video(entry)
 
+@app.route('/predict_recognition_video_words_v2/upload', methods=['POST'])
+@uses_model('words_v2', "Modelo de reconocimiento de palabras V2 no cargado.")
+def predict_recognition_video_words_v2_upload(entry):
+    """
+    Endpoint para el reconocimiento de palabras V2 a partir de un video subido.
+    El video se decodifica y procesa con MediaPipe a medida que llegan los bytes.
+    """
+    return predict_uploaded_video(entry)
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Encola el reconocimiento de un video largo y responde de inmediato (202) con el `job_id`.
+    El resultado se consulta en GET /jobs/<id> o se recibe por POST en `callback_url`.
+    """
     if not request.is_json:
         return jsonify({"error": "La solicitud debe ser en formato JSON."}), 400
-
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
+    model_name = data.get('model', 'words_v2')
+    version = data.get('version')
     url_video = data.get('url_video')
-    type_extract = data.get('type_extract', 'hands')  # Por defecto, extrae keypoints de las manos
-
     if url_video is None:
         return jsonify({"error": "Falta el campo 'url_video' en la solicitud."}), 400
+    try:
+        entry = model_registry.resolve(model_name, version)
+    except ModelNotFoundError as e:
+        return jsonify({"error": e.message}), 404
+    type_extract = data.get('type_extract', entry.type_extract)
     if type_extract not in ['hands', 'pose_hands']:
         return jsonify({"error": "El campo 'type_extract' debe ser 'hands' o 'pose_hands'."}), 400
-
     try:
-        # 1. Obtener la longitud de secuencia y la dimensión de características esperada por el modelo
-        expected_sequence_length = model_recognition_abcedario.input_shape[1]
-        expected_feature_dim = model_recognition_abcedario.input_shape[2]
-
-        # 2. Procesar el video y extraer TODOS los keypoints disponibles
-        # La función process_video_sign permanece inalterada y retorna todos los keypoints.
-        all_extracted_keypoints = process_video_sign(type_extract, url_video)
-
-        if all_extracted_keypoints is None or len(all_extracted_keypoints) == 0:
-            return jsonify({"error": "No se pudieron extraer keypoints del video. El video podría estar vacío o inaccesible."}), 400
-
-        # --- Lógica de Muestreo Distribuido (dentro del endpoint) ---
-        total_frames_extracted = len(all_extracted_keypoints)
-        final_sequence_for_model = []
-
-        if total_frames_extracted <= expected_sequence_length:
-            # Si el video es más corto o igual a la longitud esperada:
-            # Usar todos los fotogramas y rellenar con ceros si es necesario (padding).
-            final_sequence_for_model = all_extracted_keypoints
-            if total_frames_extracted < expected_sequence_length:
-                # Determinar la dimensión de la característica a partir del primer keypoint extraído
-                # Esto es seguro porque ya verificamos que all_extracted_keypoints no está vacío.
-                feature_dim = len(all_extracted_keypoints[0]) 
-                padding_needed = expected_sequence_length - total_frames_extracted
-                padding_array = np.zeros((padding_needed, feature_dim), dtype=np.float32)
-                final_sequence_for_model.extend(padding_array.tolist()) # Añadir el padding
-        else:
-            # Si el video es más largo:
-            # Seleccionar 'expected_sequence_length' fotogramas distribuidos uniformemente (muestreo distribuido/truncamiento inteligente).
-            indices = np.linspace(0, total_frames_extracted - 1, expected_sequence_length).astype(int)
-            final_sequence_for_model = [all_extracted_keypoints[i] for i in indices]
-
-        # Convertir la lista de Python a un array NumPy
-        input_data = np.array(final_sequence_for_model, dtype=np.float32)
-
-        # Verificar y ajustar la forma del array (esta verificación ahora es más para asegurar que la lógica funcionó)
-        if input_data.shape[0] != expected_sequence_length or input_data.shape[1] != expected_feature_dim:
-            # Este error debería ser raro si la lógica de muestreo es correcta
-            return jsonify({
-                "error": "Error interno: La forma final de la secuencia de keypoints es incorrecta después del muestreo.",
-                "expected_shape": (expected_sequence_length, expected_feature_dim),
-                "received_shape": input_data.shape
-            }), 500
-        
-        # Añadir la dimensión del batch (1 para una única inferencia)
-        input_data = np.expand_dims(input_data, axis=0) # Ahora la forma es (1, SEQUENCE_LENGTH, 258)
-
-        # Realizar la predicción
-        predictions = model_recognition_abcedario.predict(input_data)
-
-        # Obtener la clase predicha (el índice con la probabilidad más alta)
-        predicted_class_index = np.argmax(predictions, axis=1)[0]
-        
-        # Mapear el índice a una etiqueta legible
-        predicted_sign_label = SIGN_LABELS_alphabet[predicted_class_index] if predicted_class_index < len(SIGN_LABELS_alphabet) else f"clase_desconocida_{predicted_class_index}"
-
-        # Devolver la predicción y las probabilidades
-        return jsonify({
-            "prediction": predicted_sign_label,
-            "probabilities": predictions[0].tolist() # Convertir a lista para JSON
-        })
-
-    except Exception as e:
-        print(f"Error durante la inferencia de reconocimiento: {e}")
-        return jsonify({"error": f"Error interno del servidor durante la predicción: {str(e)}"}), 500
-
-@app.route('/predict_recognition_video_words_v2', methods=['POST'])
-def predict_recognition_video_words_v2():
+        model_complexity = parse_model_complexity(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        output_options = parse_output_options(len(entry.labels))
+    except PayloadError as e:
+        return jsonify(e.to_dict()), e.status
+    return submit_video_job(model_name, version, type_extract, url_video, data.get('callback_url'), output_options, model_complexity)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Estado del trabajo (queued, running, succeeded o failed) con su resultado o error."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "El trabajo no existe o su resultado ya expiró."}), 404
+    return jsonify(job)
+
+def parse_transcription_options(data):
+    """Parámetros opcionales de la transcripción; lanza ValueError si alguno no es válido."""
+    try:
+        options = {
+            "stride": int(data.get('stride', TRANSCRIPTION_STRIDE)),
+            "min_confidence": float(data.get('min_confidence', TRANSCRIPTION_MIN_CONFIDENCE)),
+            "min_windows": int(data.get('min_windows', TRANSCRIPTION_MIN_WINDOWS)),
+        }
+    except (TypeError, ValueError):
+        raise ValueError("Los campos 'stride' y 'min_windows' deben ser enteros y 'min_confidence' un número.")
+    if options["stride"] < 1 or options["min_windows"] < 1:
+        raise ValueError("Los campos 'stride' y 'min_windows' deben ser mayores o iguales a 1.")
+    if not 0.0 <= options["min_confidence"] <= 1.0:
+        raise ValueError("El campo 'min_confidence' debe estar entre 0 y 1.")
+    return options
+
+def run_transcription(model_name, version, type_extract, url_video, options, wait_for_pool=False, model_complexity=None,
+                      serialize=False):
     """
-    Endpoint para el reconocimiento de señas mediante procesamiento de videos.
-    Recibe una URL de video y devuelve la seña predicha utilizando muestreo distribuido.
+    Transcribe un video con varias señas: Holistic procesa todos los fotogramas una sola vez y
+    el modelo recorre los keypoints con una ventana deslizante (ver transcription.py). Las
+    ventanas pasan por el pipeline de inferencia del modelo (caché, backend y hooks de tiempo).
+    Devuelve el resultado, o con `serialize` la respuesta HTTP del pipeline (con Server-Timing).
+    Los errores esperados se lanzan como JobError con el código HTTP equivalente.
+    """
+    try:
+        with model_registry.acquire(model_name, version) as entry:
+            if entry is None:
+                raise JobError("Modelo de reconocimiento no cargado.", 500)
+
+            video_stats = {}
+            def extract(type_extract, sequence_length):
+                # Todos los fotogramas (sin muestreo): la ventana recorre el video completo
+                def submit():
+                    return holistic_pool.result(holistic_pool.submit_video(type_extract, url_video, model_complexity=model_complexity))
+                keypoints, stats = wait_for_holistic_pool(submit) if wait_for_pool else submit()
+                video_stats.update(stats)
+                return keypoints
+
+            pipeline = make_pipeline(entry, type_extract=type_extract, decoder=video_decoder(extract), sampler=None)
+            keypoints = pipeline.decode()
+            if keypoints.shape[1] != entry.feature_dim:
+                raise JobError("La dimensión de los keypoints extraídos no coincide con la del modelo. Verifica 'type_extract'.", 400)
+
+            result = transcribe_keypoints(pipeline, keypoints, video_stats.get('fps'), **options)
+            payload = {"model": entry.name, "version": entry.version, **result}
+            return pipeline.serialize(payload) if serialize else payload
+    except ModelNotFoundError as e:
+        raise JobError(e.message, 404)
+    except PayloadError as e:
+        raise JobError(e.message, e.status)
+    except PoolTimeoutError as e:
+        raise JobError(str(e), 504)
+
+@app.route('/transcribe', methods=['POST'])
+def transcribe_video():
+    """
+    Transcribe un video con varias señas seguidas y devuelve la secuencia de señas con sus
+    marcas de tiempo. Con {"async": true} (o ?async=1) se procesa como trabajo (ver /jobs).
     """
-    if model_recognition_palabrasv2 is None:
-        return jsonify({"error": "Modelo de reconocimiento de palabras V2 no cargado."}), 500
-
     if not request.is_json:
         return jsonify({"error": "La solicitud debe ser en formato JSON."}), 400
-
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
+    model_name = data.get('model', 'words_v2')
+    version = data.get('version')
     url_video = data.get('url_video')
-    type_extract = data.get('type_extract', 'pose_hands')
-    
     if url_video is None:
         return jsonify({"error": "Falta el campo 'url_video' en la solicitud."}), 400
+    try:
+        entry = model_registry.resolve(model_name, version)
+    except ModelNotFoundError as e:
+        return jsonify({"error": e.message}), 404
+    type_extract = data.get('type_extract', entry.type_extract)
     if type_extract not in ['hands', 'pose_hands']:
         return jsonify({"error": "El campo 'type_extract' debe ser 'hands' o 'pose_hands'."}), 400
     try:
-        # 1. Obtener la longitud de secuencia y la dimensión de características esperada por el modelo
-        expected_sequence_length = model_recognition_palabrasv2.input_shape[1]
-        expected_feature_dim = model_recognition_palabrasv2.input_shape[2]
-
-        # 2. Procesar el video y extraer TODOS los keypoints disponibles
-        # La función process_video_sign permanece inalterada y retorna todos los keypoints.
-        all_extracted_keypoints = process_video_sign(type_extract, url_video)
-
-        if all_extracted_keypoints is None or len(all_extracted_keypoints) == 0:
-            return jsonify({"error": "No se pudieron extraer keypoints del video. El video podría estar vacío o inaccesible."}), 400
-
-        # --- Lógica de Muestreo Distribuido (dentro del endpoint) ---
-        total_frames_extracted = len(all_extracted_keypoints)
-        final_sequence_for_model = []
-
-        if total_frames_extracted <= expected_sequence_length:
-            # Si el video es más corto o igual a la longitud esperada:
-            # Usar todos los fotogramas y rellenar con ceros si es necesario (padding).
-            final_sequence_for_model = all_extracted_keypoints
-            if total_frames_extracted < expected_sequence_length:
-                # Determinar la dimensión de la característica a partir del primer keypoint extraído
-                # Esto es seguro porque ya verificamos que all_extracted_keypoints no está vacío.
-                feature_dim = len(all_extracted_keypoints[0]) 
-                padding_needed = expected_sequence_length - total_frames_extracted
-                padding_array = np.zeros((padding_needed, feature_dim), dtype=np.float32)
-                final_sequence_for_model.extend(padding_array.tolist()) # Añadir el padding
-        else:
-            # Si el video es más largo:
-            # Seleccionar 'expected_sequence_length' fotogramas distribuidos uniformemente (muestreo distribuido/truncamiento inteligente).
-            indices = np.linspace(0, total_frames_extracted - 1, expected_sequence_length).astype(int)
-            final_sequence_for_model = [all_extracted_keypoints[i] for i in indices]
-
-        # Convertir la lista de Python a un array NumPy
-        input_data = np.array(final_sequence_for_model, dtype=np.float32)
-
-        # Verificar y ajustar la forma del array (esta verificación ahora es más para asegurar que la lógica funcionó)
-        if input_data.shape[0] != expected_sequence_length or input_data.shape[1] != expected_feature_dim:
-            # Este error debería ser raro si la lógica de muestreo es correcta
-            return jsonify({
-                "error": "Error interno: La forma final de la secuencia de keypoints es incorrecta después del muestreo.",
-                "expected_shape": (expected_sequence_length, expected_feature_dim),
-                "received_shape": input_data.shape
-            }), 500 
-        # Añadir la dimensión del batch (1 para una única inferencia)
-        input_data = np.expand_dims(input_data, axis=0) # Ahora la forma es
-
-        predictions = model_recognition_palabrasv2.predict(input_data)
-
-        predicct_class_index = np.argmax(predictions, axis=1)[0]
-        # Mapear el índice a una etiqueta legible
-        predicted_sign_label = SIGN_LABELS_wordsv2[predicct_class_index] if predicct_class_index < len(SIGN_LABELS_wordsv2) else f"clase_desconocida_{predicct_class_index}"
-
-        # Devolver la predicción y las probabilidades
-        # Devolver la predicción y las probabilidades
-        return jsonify({
-            "prediction": predicted_sign_label,
-            "probabilities": predictions[0].tolist() # Convertir a lista para JSON
-        })
+        options = parse_transcription_options(data)
+        model_complexity = parse_model_complexity(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if wants_async(data):
+        params = {"model": model_name, "version": version, "type_extract": type_extract, "url_video": url_video, **options}
+        if model_complexity is not None:
+            params["model_complexity"] = model_complexity
+        return submit_job('transcription',
+                          functools.partial(run_transcription, model_name, version, type_extract, url_video, options,
+                                            wait_for_pool=True, model_complexity=model_complexity),
+                          params, data.get('callback_url'))
+    try:
+        return run_transcription(model_name, version, type_extract, url_video, options, model_complexity=model_complexity, serialize=True)
+    except PoolBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status
+    except Exception as e:
+        print(f"Error durante la transcripción del video: {e}")
+        return jsonify({"error": f"Error interno del servidor durante la transcripción: {str(e)}"}), 500
+
+def model_admin_allowed():
+    """Los endpoints de administración exigen 'Authorization: Bearer <MODEL_ADMIN_TOKEN>'."""
+    if not MODEL_ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {MODEL_ADMIN_TOKEN}")
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    """Modelos del manifiesto con sus versiones, la predeterminada y cuáles están cargadas."""
+    return jsonify(model_registry.stats())
+
+@app.route('/models/<name>/<version>/predict', methods=['POST'])
+def predict_model_version(name, version):
+    """
+    Endpoint genérico de reconocimiento para cualquier modelo y versión del manifiesto.
+    `version` puede ser un número de versión o 'default' / 'latest' (la predeterminada).
+    Acepta una secuencia de keypoints (mismos formatos que /predict_recognition_*) o un JSON
+    con 'url_video', que se procesa con el tipo de extracción de la versión.
+    """
+    try:
+        with model_registry.acquire(name, version) as entry:
+            if entry is None:
+                return jsonify({"error": f"No se pudo cargar el modelo '{name}'."}), 500
+
+            pipeline = make_pipeline(entry, fields={"model": entry.name, "version": entry.version})
+            data = request.get_json(silent=True) if request.is_json else None
+            if isinstance(data, dict) and 'url_video' in data:
+                try:
+                    model_complexity = parse_model_complexity(data)
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+                if wants_async(data):
+                    try:
+                        output_options = pipeline.parse_options()
+                    except PayloadError as e:
+                        return jsonify(e.to_dict()), e.status
+                    return submit_video_job(name, version, entry.type_extract, data['url_video'], data.get('callback_url'),
+                                            output_options, model_complexity)
+                pipeline.decoder = url_video_decoder(
+                    data['url_video'], model_complexity,
+                    "No se pudieron extraer keypoints del video. El video podría estar vacío o en un formato no soportado.")
+            else:
+                pipeline.decoder, pipeline.sampler = keypoints_decoder(request), None
+            return pipeline.handle()
+    except ModelNotFoundError as e:
+        return jsonify({"error": e.message}), 404
+
+@app.route('/models/reload', methods=['POST'])
+def reload_models():
+    """
+    Vuelve a leer el manifiesto en este worker y aplica los cambios (versiones nuevas o predeterminadas).
+    Los demás workers los aplican al detectar que el manifiesto cambió (MODEL_MANIFEST_CHECK_SECONDS).
+    """
+    if not model_admin_allowed():
+        return jsonify({"error": "No autorizado. Configura MODEL_ADMIN_TOKEN y envía 'Authorization: Bearer <token>'."}), 403
+    try:
+        changes = model_registry.reload()
+    except Exception as e:
+        print(f"Error al recargar el manifiesto de modelos: {e}")
+        return jsonify({"error": f"No se pudo recargar el manifiesto: {str(e)}"}), 400
+    return jsonify({"changes": changes, "models": model_registry.stats()["models"]})
+
+@app.route('/models/<name>/<version>/activate', methods=['POST'])
+def activate_model_version(name, version):
+    """
+    Publica `version` como predeterminada de `name` (la carga antes del cambio) y la guarda en el
+    manifiesto, de donde la toman los demás workers en su siguiente comprobación.
+    """
+    if not model_admin_allowed():
+        return jsonify({"error": "No autorizado. Configura MODEL_ADMIN_TOKEN y envía 'Authorization: Bearer <token>'."}), 403
+    try:
+        entry = model_registry.activate(name, version, persist=True)
+    except ModelNotFoundError as e:
+        return jsonify({"error": e.message}), 404
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"model": entry.name, "default_version": entry.version})
+
+
+@app.route('/sessions', methods=['POST'])
+def create_session():
+    """
+    Crea una sesión de reconocimiento en tiempo real.
+    El cliente envía luego un fotograma a la vez a /sessions/<id>/frames y recibe las
+    predicciones en la respuesta o por el canal SSE /sessions/<id>/events.
+    """
+    if not SESSIONS_ENABLED:
+        return jsonify({"error": "Las sesiones en tiempo real no están disponibles con varios workers (WEB_WORKERS > 1)."}), 503
+    data = request.get_json(silent=True) or {}
+    model_name = data.get('model', 'words_v2')
+    if model_name not in model_registry.names():
+        return jsonify({"error": f"El campo 'model' debe ser uno de: {', '.join(model_registry.names())}."}), 400
+    try:
+        with model_registry.acquire(model_name) as entry:
+            if entry is None:
+                return jsonify({"error": "Modelo de reconocimiento no cargado."}), 500
+            sequence_length, feature_dim = entry.input_shape
+    except ModelNotFoundError as e:
+        # Se retiró del manifiesto entre la comprobación y la carga
+        return jsonify({"error": e.message}), 404
+
+    try:
+        infer_every = int(data.get('infer_every', SESSION_INFER_EVERY))
+    except (TypeError, ValueError):
+        return jsonify({"error": "El campo 'infer_every' debe ser un entero."}), 400
+    try:
+        # top_k y precision se aplican a todas las predicciones de la sesión (respuestas y eventos SSE)
+        output_options = parse_output_options(len(entry.labels))
+    except PayloadError as e:
+        return jsonify(e.to_dict()), e.status
+
+    def predict_window(window):
+        # Cada inferencia usa la versión predeterminada vigente: la sesión sigue los cambios de versión
+        with model_registry.acquire(model_name) as entry:
+            if entry is None or entry.input_shape != window.shape:
+                raise RuntimeError(f"El modelo '{model_name}' no está disponible con la forma de entrada {window.shape}.")
+            pipeline = make_pipeline(entry, sampler=None, output_options=output_options)
+            return {**pipeline.run(window), "version": entry.version}
+
+    try:
+        session = session_manager.create(model_name, sequence_length, feature_dim, predict_window, infer_every)
+    except SessionLimitError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(HOLISTIC_POOL_RETRY_AFTER)}
+    return jsonify(session.info()), 201
+
+@app.route('/sessions/<session_id>/frames', methods=['POST'])
+def push_session_frames(session_id):
+    """Agrega uno o más fotogramas de keypoints a la ventana de la sesión y devuelve la predicción si se ejecutó."""
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({"error": "La sesión no existe o expiró por inactividad."}), 404
+    try:
+        frames = decode_frames_request(request, session.feature_dim, session.sequence_length)
+    except PayloadError as e:
+        return jsonify(e.to_dict()), e.status
 
+    try:
+        result = session.push(frames)
     except Exception as e:
-        print(f"Error durante la inferencia de reconocimiento: {e}")
+        print(f"Error durante la inferencia de la sesión {session_id}: {e}")
         return jsonify({"error": f"Error interno del servidor durante la predicción: {str(e)}"}), 500
-
+    return jsonify({
+        "frames_received": session.info()["frames_received"],
+        "result": result
+    })
+
+@app.route('/sessions/<session_id>/events', methods=['GET'])
+def session_events(session_id):
+    """Canal Server-Sent Events con las predicciones de la sesión."""
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({"error": "La sesión no existe o expiró por inactividad."}), 404
+    return Response(iter_session_events(session, session_manager), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def close_session(session_id):
+    """Cierra la sesión y libera su buffer."""
+    if not session_manager.close(session_id):
+        return jsonify({"error": "La sesión no existe o expiró por inactividad."}), 404
+    return '', 204
+
+@app.route('/stats')
+def stats():
+    """Métricas internas del servicio (pool de Holistic, cachés y sesiones en tiempo real)."""
+    return jsonify({
+        "startup": startup.stats(),
+        "models": model_registry.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "sessions": session_manager.stats(),
+        "jobs": job_manager.stats(),
+        "holistic_pool": holistic_pool.stats(),
+        "keypoint_cache": keypoint_cache.stats()
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas en formato de texto de Prometheus (etapas, solicitudes, errores y colas)."""
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Métricas deshabilitadas: instala prometheus_client y usa METRICS_ENABLED=1."}), 501
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
 
 @app.route('/')
 def health_check():
     """Endpoint simple para verificar la salud del servicio."""
     return "API de reconocimiento y generación de señas funcionando."
 
+startup.mark_ready('import_app')
+
+def on_worker_start():
+    """
+    Inicialización por proceso servidor. Gunicorn la llama en cada worker (ver gunicorn.conf.py);
+    con el servidor de desarrollo se llama antes de app.run.
+    No carga nada por sí misma: con MODEL_PRELOAD=1 los modelos y el pool de Holistic se
+    cargan en un hilo de fondo mientras el servidor ya atiende solicitudes.
+    """
+    if MODEL_PRELOAD:
+        model_registry.preload(on_done=holistic_pool.start)
+
 if __name__ == '__main__':
     # Cloud Run asigna el puerto a través de la variable de entorno PORT
     # Si ejecutas localmente, usará el puerto 8080 por defecto
     port = int(os.environ.get('PORT', 5000))
+    on_worker_start()
     app.run(host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,138 @@
+import contextlib
+import os
+import threading
+import time
+
+try:
+    # Opcional: sin prometheus_client las funciones de este módulo no hacen nada y /metrics responde 501
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+except ImportError:
+    prometheus_client = None
+
+
+# Configuración de las métricas de Prometheus (variables de entorno)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1' and prometheus_client is not None
+# Con varios workers de Gunicorn cada proceso escribe sus métricas en este directorio y /metrics
+# las suma todas (gunicorn.conf.py lo configura y lo vacía al arrancar). Sin él, cada worker
+# reporta solo las suyas.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR') or None
+
+# Etapas medidas en lsc_stage_duration_seconds
+STAGES = ('json_parse', 'array_conversion', 'validation', 'video_decode', 'holistic_frame', 'sampling', 'forward', 'serialization')
+# Desde 0.1 ms (una etapa de un fotograma) hasta 60 s (un video largo completo)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Tipo de error en lsc_errors_total según el código de la respuesta
+ERROR_TYPES = {400: 'bad_request', 403: 'forbidden', 404: 'not_found', 405: 'method_not_allowed', 413: 'payload_too_large',
+               415: 'unsupported_media_type', 429: 'too_many_requests', 500: 'internal', 503: 'unavailable', 504: 'timeout'}
+
+if METRICS_ENABLED:
+    STAGE_SECONDS = Histogram('lsc_stage_duration_seconds', "Duración de cada etapa del procesamiento de una solicitud.",
+                              ['stage', 'endpoint', 'model'], buckets=STAGE_BUCKETS)
+    REQUEST_SECONDS = Histogram('lsc_request_duration_seconds', "Duración total de las solicitudes HTTP.",
+                                ['endpoint', 'method', 'status'], buckets=REQUEST_BUCKETS)
+    ERRORS = Counter('lsc_errors', "Errores por endpoint y tipo (según el código HTTP).", ['endpoint', 'type'])
+    # Aparte de lsc_errors: la respuesta de una excepción no controlada ya cuenta allí como 'internal'
+    EXCEPTIONS = Counter('lsc_exceptions', "Excepciones no controladas por endpoint y clase.", ['endpoint', 'exception'])
+    IN_FLIGHT = Gauge('lsc_requests_in_flight', "Solicitudes HTTP en curso.", ['endpoint'], multiprocess_mode='livesum')
+    QUEUE_DEPTH = Gauge('lsc_queue_depth', "Elementos en espera en cada cola (pool de Holistic, trabajos, micro-batchers).",
+                        ['queue'], multiprocess_mode='livesum')
+
+# Endpoint y modelo de la solicitud (o del trabajo) que atiende el hilo actual; son las
+# etiquetas de las etapas medidas en módulos que no conocen la solicitud (payloads, utils...)
+_context = threading.local()
+
+
+def set_context(endpoint=None, model=''):
+    """Fija las etiquetas del hilo actual al empezar una solicitud o un trabajo en segundo plano."""
+    _context.endpoint = endpoint
+    _context.model = model
+
+
+def set_model(model):
+    _context.model = model
+
+
+def _labels(model=None):
+    endpoint = getattr(_context, 'endpoint', None) or 'background'
+    return endpoint, model if model is not None else getattr(_context, 'model', '')
+
+
+def observe_stage(stage, seconds, model=None):
+    if METRICS_ENABLED:
+        endpoint, model = _labels(model)
+        STAGE_SECONDS.labels(stage, endpoint, model).observe(seconds)
+
+
+def observe_stage_many(stage, values, model=None):
+    """Registra varias duraciones de una etapa (p. ej., el tiempo de Holistic de cada fotograma)."""
+    if METRICS_ENABLED and values:
+        endpoint, model = _labels(model)
+        histogram = STAGE_SECONDS.labels(stage, endpoint, model)
+        for seconds in values:
+            histogram.observe(seconds)
+
+
+@contextlib.contextmanager
+def stage(name, model=None):
+    """Mide el bloque como la etapa `name` con las etiquetas del hilo actual."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start, model)
+
+
+def record_error(error_type, endpoint=None):
+    if METRICS_ENABLED:
+        ERRORS.labels(endpoint or _labels()[0], error_type).inc()
+
+
+def record_exception(exception, endpoint=None):
+    if METRICS_ENABLED:
+        EXCEPTIONS.labels(endpoint or _labels()[0], type(exception).__name__).inc()
+
+
+def error_type(status):
+    return ERROR_TYPES.get(status, f"http_{status}")
+
+
+def set_queue_depth(queue, depth):
+    if METRICS_ENABLED:
+        QUEUE_DEPTH.labels(queue).set(depth)
+
+
+def request_started(endpoint):
+    set_context(endpoint)
+    _context.request_start = time.perf_counter()
+    if METRICS_ENABLED:
+        IN_FLIGHT.labels(endpoint).inc()
+
+
+def request_finished(method, status):
+    """Cierra la solicitud del hilo actual: duración total, errores (status >= 400) y en curso."""
+    start = getattr(_context, 'request_start', None)
+    if start is None:
+        return
+    _context.request_start = None
+    endpoint = _context.endpoint
+    if METRICS_ENABLED:
+        REQUEST_SECONDS.labels(endpoint, method, str(status)).observe(time.perf_counter() - start)
+        IN_FLIGHT.labels(endpoint).dec()
+        if status >= 400:
+            ERRORS.labels(endpoint, error_type(status)).inc()
+
+
+def render():
+    """Texto de exposición de Prometheus; con PROMETHEUS_MULTIPROC_DIR suma los de todos los workers."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,422 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+import metrics
+import startup
+from backends import INFERENCE_BACKEND, load_backend_model
+from batching import MicroBatcher
+
+
+# Precarga en segundo plano de los modelos cuando el servidor ya acepta conexiones.
+# Con 0 (por defecto) cada modelo se carga la primera vez que un endpoint lo usa.
+MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', '0') == '1'
+# Manifiesto con los modelos, sus versiones, etiquetas, formas de entrada y tipo de extracción
+MODEL_MANIFEST = os.environ.get('MODEL_MANIFEST', './models/manifest.json')
+# Cada cuántos segundos se comprueba si el manifiesto cambió (0 = solo con POST /models/reload)
+MODEL_MANIFEST_CHECK_SECONDS = float(os.environ.get('MODEL_MANIFEST_CHECK_SECONDS', 10))
+# Las versiones que no son la predeterminada se descargan tras este tiempo sin solicitudes
+MODEL_IDLE_UNLOAD_SECONDS = float(os.environ.get('MODEL_IDLE_UNLOAD_SECONDS', 300))
+
+# Alias de versión que apuntan a la versión predeterminada del modelo
+DEFAULT_VERSION_ALIASES = (None, 'default', 'latest')
+
+
+class ModelNotFoundError(KeyError):
+    """El modelo o la versión no existen en el manifiesto; el endpoint debe responder 404 (503 si el modelo es fijo)."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def read_manifest(path):
+    """
+    Lee el manifiesto de modelos:
+    {"models": {"<nombre>": {"default_version": "1", "versions": {"1": {"path": ...,
+     "labels": [...], "input_shape": [30, 126], "type_extract": "hands"}}}}}
+    """
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    for name, model in manifest['models'].items():
+        versions = model.get('versions') or {}
+        if str(model.get('default_version')) not in versions:
+            raise ValueError(f"El modelo '{name}' no tiene la versión predeterminada '{model.get('default_version')}' en 'versions'.")
+        for version, spec in versions.items():
+            missing = [field for field in ('path', 'labels', 'input_shape', 'type_extract') if field not in spec]
+            if missing:
+                raise ValueError(f"Faltan campos en {name}/{version}: {', '.join(missing)}")
+    return manifest
+
+
+class ModelVersion:
+    """
+    Una versión de un modelo del manifiesto. El modelo y su micro-batcher se cargan en el
+    primer uso; `in_flight` cuenta las solicitudes que lo están usando, de modo que la
+    versión solo se descarga cuando ya no atiende ninguna.
+    """
+
+    def __init__(self, name, version, spec):
+        self.name = name
+        self.version = str(version)
+        self.spec = spec
+        self.path = spec['path']
+        self.labels = np.asarray(spec['labels'])
+        self.input_shape = tuple(spec['input_shape'])
+        self.type_extract = spec['type_extract']
+        self.model = None
+        self.batcher = None
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.unload_when_idle = False  # Reemplazada por otra versión o retirada del manifiesto
+        self.load_seconds = None
+        self.error = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def sequence_length(self):
+        return self.input_shape[0]
+
+    @property
+    def feature_dim(self):
+        return self.input_shape[1]
+
+    def label(self, index):
+        """Etiqueta legible de la clase `index`."""
+        return str(self.labels[index]) if index < len(self.labels) else f"clase_desconocida_{index}"
+
+    def ensure_loaded(self, backend, before_load=None):
+        if self.model is not None:
+            return True
+        with self._load_lock:
+            if self.model is not None:
+                return True
+            try:
+                if before_load is not None:
+                    before_load()
+                print(f"Cargando el modelo '{self.name}' v{self.version} desde: {self.path} (backend {backend})")
+                start = time.perf_counter()
+                with startup.phase(f"load_model:{self.name}/{self.version}"):
+                    model = load_backend_model(self.path, backend=backend)
+                if tuple(model.input_shape[1:]) != self.input_shape:
+                    raise ValueError(f"La forma de entrada del modelo {tuple(model.input_shape[1:])} no coincide con el manifiesto {self.input_shape}.")
+            except Exception as e:
+                print(f"Error al cargar el modelo '{self.name}' v{self.version} desde {self.path}: {e}")
+                self.error = str(e)
+                return False
+
+            # Micro-batcher de la versión: agrupa las solicitudes concurrentes en una sola pasada
+            # (ver BATCH_MAX_SIZE y BATCH_MAX_WAIT_MS en batching.py)
+            self.batcher = MicroBatcher(model.predict, name=f"{self.name}-{self.version}")
+            self.load_seconds = time.perf_counter() - start
+            self.error = None
+            self.model = model # Se publica al final: quien vea el modelo ya tiene su batcher
+            print(f"Modelo '{self.name}' v{self.version} cargado exitosamente.")
+            return True
+
+    def unload(self):
+        model, batcher = self.model, self.batcher
+        self.model = None
+        self.batcher = None
+        if batcher is not None:
+            batcher.close()
+        return model
+
+    def info(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "input_shape": list(self.input_shape),
+            "type_extract": self.type_extract,
+            "num_labels": len(self.labels),
+            "loaded": self.model is not None,
+            "in_flight": self.in_flight,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """
+    Registro de modelos versionados definido por un manifiesto, con carga bajo demanda.
+
+    Cada versión solo se carga (junto con el runtime del backend, que se importa en ese
+    momento) la primera vez que una solicitud la usa con `acquire()`. El backend (keras,
+    tflite u onnx) se elige con INFERENCE_BACKEND.
+
+    Cambiar la versión predeterminada (`activate()` o un manifiesto nuevo) es atómico: la
+    nueva versión se carga y precalienta antes de publicarla, las solicitudes en curso
+    terminan con la versión que tomaron y la anterior se descarga cuando queda sin uso.
+    Las versiones no predeterminadas se descargan tras MODEL_IDLE_UNLOAD_SECONDS sin uso.
+    """
+
+    def __init__(self, manifest_path=MODEL_MANIFEST, backend=INFERENCE_BACKEND, fallback_manifest=None,
+                 on_unload=None, check_seconds=MODEL_MANIFEST_CHECK_SECONDS, idle_unload_seconds=MODEL_IDLE_UNLOAD_SECONDS):
+        self.manifest_path = manifest_path
+        self.backend = backend
+        self.fallback_manifest = fallback_manifest
+        self.on_unload = on_unload
+        self.check_seconds = check_seconds
+        self.idle_unload_seconds = idle_unload_seconds
+        self._models = {}    # nombre -> {versión: ModelVersion}
+        self._defaults = {}  # nombre -> versión predeterminada
+        self._retired = []   # Versiones fuera del manifiesto que aún deben descargarse
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._threads_configured = False
+        self._manifest_mtime = None
+        self._next_check = 0.0
+        self._swaps = 0
+        self._unloads = 0
+        self.reload()
+
+    # --- Manifiesto -------------------------------------------------------------------
+
+    def _read(self):
+        if os.path.exists(self.manifest_path):
+            return read_manifest(self.manifest_path), os.path.getmtime(self.manifest_path)
+        if self.fallback_manifest is None:
+            raise FileNotFoundError(f"No se encontró el manifiesto de modelos {self.manifest_path}")
+        print(f"No se encontró {self.manifest_path}; se usan los modelos predeterminados.")
+        return self.fallback_manifest, None
+
+    def reload(self):
+        """
+        Vuelve a leer el manifiesto: agrega las versiones nuevas, retira las eliminadas y cambia
+        la versión predeterminada de forma atómica. Devuelve la lista de cambios aplicados.
+
+        Si alguna versión predeterminada nueva no se puede cargar, ese modelo conserva la anterior
+        (aunque se haya eliminado del manifiesto), los demás cambios se aplican igual y se lanza
+        RuntimeError; el manifiesto no se da por aplicado y la siguiente comprobación lo reintenta.
+        """
+        with self._reload_lock:
+            manifest, mtime = self._read()
+            changes = []
+            deferred = []  # Versiones retiradas que aún son las predeterminadas: se quitan tras el cambio
+            with self._lock:
+                for name, model in manifest['models'].items():
+                    versions = self._models.setdefault(name, {})
+                    for version, spec in model['versions'].items():
+                        version = str(version)
+                        current = versions.get(version)
+                        if current is None or current.spec != spec:
+                            if current is not None:
+                                self._retire(current)
+                            versions[version] = ModelVersion(name, version, spec)
+                            changes.append(f"{name}/{version} registrado")
+                    for version in [v for v in versions if v not in map(str, model['versions'])]:
+                        if self._defaults.get(name) == version:
+                            deferred.append((name, version))
+                        else:
+                            self._retire(versions.pop(version))
+                        changes.append(f"{name}/{version} retirado")
+                for name in [n for n in self._models if n not in manifest['models']]:
+                    for entry in self._models.pop(name).values():
+                        self._retire(entry)
+                    self._defaults.pop(name, None)
+                    changes.append(f"{name} retirado")
+
+            errors = []
+            try:
+                for name, model in manifest['models'].items():
+                    default_version = str(model['default_version'])
+                    if self._defaults.get(name) != default_version:
+                        try:
+                            self.activate(name, default_version)
+                            changes.append(f"{name} -> v{default_version}")
+                        except Exception as e:
+                            errors.append(f"{name} -> v{default_version}: {e}")
+            finally:
+                with self._lock:
+                    for name, version in deferred:
+                        # Si el cambio de versión falló sigue siendo la predeterminada: se retira en el reintento
+                        if self._defaults.get(name) != version:
+                            self._retire(self._models[name].pop(version))
+                self._collect()
+            self._manifest_mtime = None if errors else mtime
+        if changes:
+            print(f"Manifiesto de modelos aplicado: {'; '.join(changes)}")
+        if errors:
+            raise RuntimeError(f"No se pudieron activar las versiones del manifiesto: {'; '.join(errors)}")
+        return changes
+
+    def _retire(self, entry):
+        entry.unload_when_idle = True
+        self._retired.append(entry)
+
+    def _maybe_reload(self):
+        """Comprueba (como mucho cada `check_seconds`) si el manifiesto cambió y lo recarga en segundo plano."""
+        if self.check_seconds <= 0 or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.check_seconds
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            return
+        if mtime != self._manifest_mtime and not self._reload_lock.locked():
+            self._manifest_mtime = mtime
+            threading.Thread(target=self._reload_in_background, name='model-manifest-reload', daemon=True).start()
+
+    def _reload_in_background(self):
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"Error al recargar el manifiesto de modelos {self.manifest_path}: {e}")
+
+    # --- Versiones ----------------------------------------------------------------------
+
+    def names(self):
+        return list(self._models)
+
+    def default_version(self, name):
+        return self._defaults.get(name)
+
+    def _resolve(self, name, version):
+        versions = self._models.get(name)
+        if versions is None:
+            raise ModelNotFoundError(f"Modelo no registrado: {name}")
+        version = self._defaults.get(name) if version in DEFAULT_VERSION_ALIASES else str(version)
+        entry = versions.get(version)
+        if entry is None:
+            raise ModelNotFoundError(f"El modelo '{name}' no tiene la versión '{version}'.")
+        return entry
+
+    def resolve(self, name, version=None):
+        """Devuelve la versión pedida (o la predeterminada) sin cargarla; ModelNotFoundError si no existe."""
+        with self._lock:
+            return self._resolve(name, version)
+
+    def activate(self, name, version, persist=False):
+        """
+        Publica `version` como predeterminada de `name`. Si la versión actual ya estaba cargada,
+        la nueva se carga y precalienta antes del cambio para que ninguna solicitud espere.
+        Con `persist` además se escribe en el manifiesto, de donde la toman los demás workers.
+        """
+        with self._lock:
+            entry = self._resolve(name, version)
+            previous = self._models[name].get(self._defaults.get(name))
+        if previous is not None and previous.model is not None and not entry.ensure_loaded(self.backend, self._configure_tensorflow):
+            raise RuntimeError(f"No se pudo cargar {name}/{entry.version}: {entry.error}")
+        with self._lock:
+            self._defaults[name] = entry.version
+            entry.unload_when_idle = False
+            if previous is not None and previous is not entry:
+                previous.unload_when_idle = True
+                self._swaps += 1
+                print(f"Modelo '{name}': versión predeterminada v{previous.version} -> v{entry.version}")
+        if persist:
+            self._write_default_version(name, entry.version)
+        self._collect()
+        return entry
+
+    def _write_default_version(self, name, version):
+        """
+        Guarda `version` como predeterminada de `name` en el manifiesto (escritura atómica). Los
+        demás workers de Gunicorn ven el cambio de fecha del archivo y lo recargan (_maybe_reload).
+        """
+        with self._reload_lock:
+            manifest, _ = self._read()
+            if manifest['models'].get(name, {}).get('versions', {}).get(version) is None:
+                raise RuntimeError(f"La versión {name}/{version} no está en el manifiesto {self.manifest_path}")
+            manifest['models'][name]['default_version'] = version
+            directory = os.path.dirname(self.manifest_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+            # Este worker ya aplicó el cambio: no necesita recargar el manifiesto que acaba de escribir
+            self._manifest_mtime = os.path.getmtime(self.manifest_path)
+
+    @contextmanager
+    def acquire(self, name, version=None):
+        """
+        Entrega la versión pedida (o la predeterminada) cargada y lista, o None si no se pudo
+        cargar. Mientras dura el bloque `with` la versión no se descarga aunque se reemplace.
+        """
+        self._maybe_reload()
+        with self._lock:
+            entry = self._resolve(name, version)
+            entry.in_flight += 1
+        metrics.set_model(entry.name) # Etiqueta 'model' de las etapas medidas en esta solicitud
+        try:
+            loaded = entry.ensure_loaded(self.backend, self._configure_tensorflow)
+            yield entry if loaded else None
+        finally:
+            with self._lock:
+                entry.in_flight -= 1
+                entry.last_used = time.monotonic()
+            self._collect()
+
+    def _configure_tensorflow(self):
+        # La primera carga con Keras importa TensorFlow y fija sus hilos, antes de crear cualquier modelo
+        if self.backend != 'keras':
+            return
+        with self._lock:
+            if self._threads_configured:
+                return
+            with startup.phase('import_tensorflow'):
+                import inference
+            inference.configure_threads()
+            self._threads_configured = True
+
+    def _collect(self):
+        """Descarga las versiones sin solicitudes en curso que fueron reemplazadas o llevan tiempo sin usarse."""
+        now = time.monotonic()
+        unloaded = []
+        with self._lock:
+            candidates = [entry for versions in self._models.values() for entry in versions.values()] + self._retired
+            for entry in candidates:
+                if entry.model is None or entry.in_flight > 0:
+                    continue
+                is_default = self._defaults.get(entry.name) == entry.version and not entry.unload_when_idle
+                idle = now - entry.last_used > self.idle_unload_seconds
+                if entry.unload_when_idle or (not is_default and idle):
+                    unloaded.append(entry.unload())
+                    self._unloads += 1
+                    if entry not in self._retired:
+                        # Sigue en el manifiesto: si se vuelve a pedir, se descarga por inactividad
+                        entry.unload_when_idle = False
+                    print(f"Modelo '{entry.name}' v{entry.version} descargado (sin uso).")
+            # Se siguen vigilando mientras tengan solicitudes en curso (podrían estar cargándose)
+            self._retired = [entry for entry in self._retired if entry.model is not None or entry.in_flight > 0]
+        for model in unloaded:
+            if self.on_unload is not None and model is not None:
+                self.on_unload(model)
+
+    def preload(self, names=None, on_done=None):
+        """Carga en un hilo de fondo la versión predeterminada de los modelos (por defecto, todos)."""
+        names = list(names or self._models)
+
+        def run():
+            with startup.phase('preload'):
+                for name in names:
+                    with self.acquire(name):
+                        pass
+                if on_done is not None:
+                    on_done()
+
+        thread = threading.Thread(target=run, name='model-preload', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "manifest": self.manifest_path,
+                "swaps": self._swaps,
+                "unloads": self._unloads,
+                "models": {
+                    name: {
+                        "default_version": self._defaults.get(name),
+                        "versions": {version: entry.info() for version, entry in versions.items()},
+                    }
+                    for name, versions in self._models.items()
+                },
+            }
@@ -0,0 +1,293 @@
+import io
+
+import numpy as np
+
+import metrics
+
+try:
+    import msgpack # Opcional: solo necesario para cuerpos application/x-msgpack
+except ImportError:
+    msgpack = None
+
+
+# Tipos de contenido aceptados por los endpoints de keypoints
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_RAW = 'application/octet-stream'  # float32 little-endian, orden C, sin cabecera
+CONTENT_TYPE_NPY = 'application/x-npy'         # archivo .npy (np.save)
+CONTENT_TYPES_MSGPACK = ('application/x-msgpack', 'application/msgpack')
+
+
+class PayloadError(ValueError):
+    """Error de formato en el cuerpo de la solicitud; se traduce en una respuesta JSON con `status`."""
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+    def to_dict(self):
+        return {"error": self.message, **self.details}
+
+
+def _check_shape(array, expected_shape):
+    if array.ndim != len(expected_shape) or tuple(array.shape) != tuple(expected_shape):
+        raise PayloadError(
+            "Forma de la secuencia de keypoints incorrecta.",
+            expected_shape=tuple(expected_shape),
+            received_shape=tuple(array.shape),
+        )
+    return array
+
+
+def decode_raw(body, expected_shape):
+    """Interpreta el cuerpo como float32 crudo (sin copia) con la forma que espera el modelo."""
+    expected_size = int(np.prod(expected_shape)) * np.dtype(np.float32).itemsize
+    if len(body) != expected_size:
+        raise PayloadError(
+            "Tamaño del cuerpo binario incorrecto para la forma esperada.",
+            expected_shape=tuple(expected_shape),
+            expected_bytes=expected_size,
+            received_bytes=len(body),
+        )
+    return np.frombuffer(body, dtype='<f4').reshape(expected_shape)
+
+
+def decode_npy(body):
+    """Lee un archivo .npy desde memoria usando np.frombuffer sobre los datos (sin copia)."""
+    fp = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(fp)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+        else:
+            raise ValueError(f"versión {version} no soportada")
+    except ValueError as e:
+        raise PayloadError(f"El cuerpo no es un archivo .npy válido: {e}")
+    if dtype.hasobject:
+        raise PayloadError("El archivo .npy no puede contener objetos de Python.")
+
+    offset = fp.tell()
+    count = int(np.prod(shape))
+    if len(body) - offset < count * dtype.itemsize:
+        raise PayloadError("El archivo .npy está incompleto.")
+    array = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+    array = array.reshape(shape[::-1]).T if fortran_order else array.reshape(shape)
+    # Solo se copia si el cliente no envió float32
+    return array.astype(np.float32, copy=False)
+
+
+def decode_msgpack(body, expected_shape):
+    """Acepta {"keypoints": <bytes float32>} o {"keypoints": [[...], ...]} serializado con msgpack."""
+    if msgpack is None:
+        raise PayloadError("El soporte para msgpack no está instalado en el servidor.", status=415)
+    try:
+        data = msgpack.unpackb(body, raw=False)
+    except Exception:
+        raise PayloadError("El cuerpo msgpack no es válido.")
+    if not isinstance(data, dict) or data.get('keypoints') is None:
+        raise PayloadError("Falta el campo 'keypoints' en la solicitud.")
+    keypoints = data['keypoints']
+    if isinstance(keypoints, (bytes, bytearray)):
+        return decode_raw(keypoints, expected_shape)
+    return np.array(keypoints, dtype=np.float32)
+
+
+def decode_keypoints_request(request, expected_shape):
+    """
+    Decodifica la secuencia de keypoints de una solicitud Flask según su Content-Type
+    y verifica que tenga la forma `expected_shape` (SEQUENCE_LENGTH, FEATURES).
+
+    Formatos soportados: JSON ({"keypoints": [[...], ...]}), float32 crudo
+    (application/octet-stream), .npy (application/x-npy) y msgpack (opcional).
+    Lanza PayloadError si el cuerpo no es válido.
+    """
+    content_type = request.mimetype
+
+    if content_type == CONTENT_TYPE_RAW:
+        with metrics.stage('array_conversion'):
+            return decode_raw(request.get_data(cache=False), expected_shape)
+
+    if content_type == CONTENT_TYPE_NPY:
+        with metrics.stage('array_conversion'):
+            input_data = decode_npy(request.get_data(cache=False))
+    elif content_type in CONTENT_TYPES_MSGPACK:
+        with metrics.stage('array_conversion'):
+            input_data = decode_msgpack(request.get_data(cache=False), expected_shape)
+    else:
+        if not request.is_json:
+            raise PayloadError("La solicitud debe ser en formato JSON, application/octet-stream o application/x-npy.")
+
+        with metrics.stage('json_parse'):
+            data = request.get_json(silent=True)
+        if data is None:
+            raise PayloadError("El cuerpo de la solicitud no es un JSON válido.")
+        keypoints_sequence = data.get('keypoints') if isinstance(data, dict) else None
+        if keypoints_sequence is None:
+            raise PayloadError("Falta el campo 'keypoints' en la solicitud.")
+
+        try:
+            with metrics.stage('array_conversion'):
+                input_data = np.array(keypoints_sequence, dtype=np.float32)
+        except (ValueError, TypeError):
+            raise PayloadError("El campo 'keypoints' debe ser una matriz numérica rectangular.")
+
+    with metrics.stage('validation'):
+        return _check_shape(input_data, expected_shape)
+
+
+def _validate_sequences(sequences, expected_shape):
+    """
+    Convierte una lista de secuencias en un array (N, SEQUENCE_LENGTH, FEATURES).
+    Si la lista es rectangular se hace en una sola conversión; si no, se convierte
+    elemento por elemento para reportar qué secuencias tienen un formato incorrecto.
+    Las filas inválidas quedan en cero y su error en `errors`.
+    """
+    total = len(sequences)
+    errors = [None] * total
+    try:
+        batch = np.array(sequences, dtype=np.float32)
+        if batch.shape == (total, *expected_shape):
+            return batch, errors
+    except (ValueError, TypeError):
+        pass
+
+    batch = np.zeros((total, *expected_shape), dtype=np.float32)
+    for i, sequence in enumerate(sequences):
+        try:
+            item = np.asarray(sequence, dtype=np.float32)
+        except (ValueError, TypeError):
+            errors[i] = "La secuencia debe ser una matriz numérica rectangular."
+            continue
+        if item.shape != tuple(expected_shape):
+            errors[i] = f"Forma de la secuencia incorrecta: se esperaba {tuple(expected_shape)}, se recibió {item.shape}."
+            continue
+        batch[i] = item
+    return batch, errors
+
+
+def decode_keypoints_batch_request(request, expected_shape, max_items):
+    """
+    Decodifica un lote de secuencias de keypoints para los endpoints /batch.
+
+    Acepta JSON ({"sequences": [[[...], ...], ...]}), un tensor (N, SEQUENCE_LENGTH, FEATURES)
+    en float32 crudo o .npy, o msgpack con el mismo campo `sequences`.
+    Devuelve `(batch, errors)`: el array (N, SEQUENCE_LENGTH, FEATURES) y una lista con el
+    mensaje de error de cada secuencia (None si es válida). Las secuencias con valores
+    NaN o infinitos se marcan como inválidas en una sola pasada vectorizada.
+    Lanza PayloadError si el cuerpo completo no se puede interpretar.
+    """
+    expected_shape = tuple(expected_shape)
+    sample_size = int(np.prod(expected_shape)) * np.dtype(np.float32).itemsize
+    content_type = request.mimetype
+
+    if content_type == CONTENT_TYPE_RAW:
+        body = request.get_data(cache=False)
+        if len(body) == 0 or len(body) % sample_size != 0:
+            raise PayloadError(
+                "Tamaño del cuerpo binario incorrecto: debe ser un múltiplo del tamaño de una secuencia.",
+                expected_shape=(None, *expected_shape),
+                sample_bytes=sample_size,
+                received_bytes=len(body),
+            )
+        batch = np.frombuffer(body, dtype='<f4').reshape((-1, *expected_shape))
+        errors = [None] * batch.shape[0]
+    elif content_type == CONTENT_TYPE_NPY:
+        batch = decode_npy(request.get_data(cache=False))
+        if batch.ndim != 3 or batch.shape[1:] != expected_shape:
+            raise PayloadError(
+                "Forma del tensor de keypoints incorrecta.",
+                expected_shape=(None, *expected_shape),
+                received_shape=tuple(batch.shape),
+            )
+        errors = [None] * batch.shape[0]
+    else:
+        if content_type in CONTENT_TYPES_MSGPACK:
+            if msgpack is None:
+                raise PayloadError("El soporte para msgpack no está instalado en el servidor.", status=415)
+            try:
+                with metrics.stage('json_parse'):
+                    data = msgpack.unpackb(request.get_data(cache=False), raw=False)
+            except Exception:
+                raise PayloadError("El cuerpo msgpack no es válido.")
+        elif request.is_json:
+            with metrics.stage('json_parse'):
+                data = request.get_json(silent=True)
+            if data is None:
+                raise PayloadError("El cuerpo de la solicitud no es un JSON válido.")
+        else:
+            raise PayloadError("La solicitud debe ser en formato JSON, application/octet-stream o application/x-npy.")
+
+        sequences = data.get('sequences') if isinstance(data, dict) else None
+        if sequences is None:
+            raise PayloadError("Falta el campo 'sequences' en la solicitud.")
+        if isinstance(sequences, (bytes, bytearray)):
+            if len(sequences) == 0 or len(sequences) % sample_size != 0:
+                raise PayloadError("Tamaño del campo binario 'sequences' incorrecto.", sample_bytes=sample_size)
+            batch = np.frombuffer(sequences, dtype='<f4').reshape((-1, *expected_shape))
+            errors = [None] * batch.shape[0]
+        elif not isinstance(sequences, list) or len(sequences) == 0:
+            raise PayloadError("El campo 'sequences' debe ser una lista no vacía de secuencias.")
+        else:
+            if len(sequences) > max_items:
+                raise PayloadError(f"El lote excede el máximo de {max_items} secuencias.", status=413)
+            with metrics.stage('array_conversion'):
+                batch, errors = _validate_sequences(sequences, expected_shape)
+
+    if batch.shape[0] > max_items:
+        raise PayloadError(f"El lote excede el máximo de {max_items} secuencias.", status=413)
+
+    # Validación vectorizada: una sola pasada sobre todo el tensor
+    with metrics.stage('validation'):
+        finite = np.isfinite(batch).all(axis=(1, 2))
+    for i in np.flatnonzero(~finite):
+        if errors[i] is None:
+            errors[i] = "La secuencia contiene valores NaN o infinitos."
+    return batch, errors
+
+
+def decode_frames_request(request, feature_dim, max_frames):
+    """
+    Decodifica uno o más fotogramas de keypoints para las sesiones en tiempo real.
+
+    Acepta JSON ({"keypoints": [...]} con un fotograma, o [[...], ...] con varios) o
+    float32 crudo (application/octet-stream) con k × feature_dim valores.
+    Devuelve un array (k, feature_dim); lanza PayloadError si el cuerpo no es válido.
+    """
+    if request.mimetype == CONTENT_TYPE_RAW:
+        body = request.get_data(cache=False)
+        frame_size = feature_dim * np.dtype(np.float32).itemsize
+        if len(body) == 0 or len(body) % frame_size != 0:
+            raise PayloadError(
+                "Tamaño del cuerpo binario incorrecto: debe ser un múltiplo del tamaño de un fotograma.",
+                frame_bytes=frame_size,
+                received_bytes=len(body),
+            )
+        frames = np.frombuffer(body, dtype='<f4').reshape(-1, feature_dim)
+    else:
+        if not request.is_json:
+            raise PayloadError("La solicitud debe ser en formato JSON o application/octet-stream.")
+        data = request.get_json(silent=True)
+        keypoints = data.get('keypoints') if isinstance(data, dict) else None
+        if keypoints is None:
+            raise PayloadError("Falta el campo 'keypoints' en la solicitud.")
+        try:
+            frames = np.array(keypoints, dtype=np.float32)
+        except (ValueError, TypeError):
+            raise PayloadError("El campo 'keypoints' debe ser un fotograma o una lista de fotogramas numéricos.")
+        if frames.ndim == 1:
+            frames = frames[np.newaxis]
+        if frames.ndim != 2 or frames.shape[1] != feature_dim:
+            raise PayloadError(
+                "Dimensión de los fotogramas incorrecta.",
+                expected_feature_dim=feature_dim,
+                received_shape=tuple(frames.shape),
+            )
+
+    if frames.shape[0] > max_frames:
+        raise PayloadError(f"Se permiten como máximo {max_frames} fotogramas por solicitud.", status=413)
+    if not np.isfinite(frames).all():
+        raise PayloadError("Los fotogramas contienen valores NaN o infinitos.")
+    return frames
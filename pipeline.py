@@ -0,0 +1,289 @@
+import os
+import time
+
+import numpy as np
+from flask import jsonify
+
+import metrics
+from holistic_pool import PoolBusyError, PoolTimeoutError
+from payloads import PayloadError, decode_keypoints_request, decode_keypoints_batch_request
+from responses import parse_output_options, probability_fields, render
+from uploads import UploadError
+
+
+# Con PIPELINE_SERVER_TIMING=1 las respuestas incluyen la cabecera Server-Timing con la duración
+# de cada etapa del pipeline (visible en las herramientas de desarrollo del navegador)
+PIPELINE_SERVER_TIMING = os.environ.get('PIPELINE_SERVER_TIMING', '0') == '1'
+
+# Etapas del pipeline, en el orden en que se ejecutan
+STAGES = ('decoder', 'sampler', 'batcher', 'backend', 'serializer')
+
+# Funciones hook(pipeline, stage, seconds) llamadas al terminar cada etapa de cualquier pipeline
+_timing_hooks = []
+
+
+def add_timing_hook(hook):
+    """Registra `hook(pipeline, stage, seconds)` para todas las etapas de todos los pipelines."""
+    _timing_hooks.append(hook)
+
+
+def remove_timing_hook(hook):
+    if hook in _timing_hooks:
+        _timing_hooks.remove(hook)
+
+
+def sample_sequence(all_extracted_keypoints, expected_sequence_length):
+    """
+    Ajusta los keypoints extraídos (array float32 de process_video_sign o de la caché) a la
+    longitud que espera el modelo: rellena con ceros si el video es más corto o toma
+    fotogramas distribuidos uniformemente si es más largo. Escribe directamente en un único
+    array (SEQUENCE_LENGTH, FEATURES) contiguo, sin listas intermedias; si ya tiene la
+    longitud exacta se devuelve sin copiar.
+    """
+    with metrics.stage('sampling'):
+        keypoints = np.asarray(all_extracted_keypoints, dtype=np.float32)
+        total_frames_extracted = keypoints.shape[0]
+        if total_frames_extracted == expected_sequence_length:
+            return np.ascontiguousarray(keypoints)
+        input_data = np.empty((expected_sequence_length, keypoints.shape[1]), dtype=np.float32)
+        if total_frames_extracted < expected_sequence_length:
+            input_data[:total_frames_extracted] = keypoints
+            input_data[total_frames_extracted:] = 0
+        else:
+            indices = np.linspace(0, total_frames_extracted - 1, expected_sequence_length).astype(int)
+            np.take(keypoints, indices, axis=0, out=input_data)
+        return input_data
+
+
+# Decodificadores: decoder(pipeline) devuelve los keypoints de la solicitud
+
+def keypoints_decoder(request):
+    """Una secuencia de keypoints en cualquiera de los formatos de payloads.py, con la forma del modelo."""
+    return lambda pipeline: decode_keypoints_request(request, pipeline.input_shape)
+
+
+def batch_decoder(request, max_items):
+    """Varias secuencias: devuelve (lote, errores), con un error (o None) por secuencia."""
+    return lambda pipeline: decode_keypoints_batch_request(request, pipeline.input_shape, max_items)
+
+
+def video_decoder(extract, empty_message=None):
+    """
+    Keypoints de un video: `extract(type_extract, sequence_length)` los obtiene (pool de Holistic,
+    caché o subida). Un video sin keypoints es un error 400 con `empty_message`.
+    """
+    def decode(pipeline):
+        keypoints = extract(pipeline.type_extract, pipeline.sequence_length)
+        if keypoints is None or len(keypoints) == 0:
+            raise PayloadError(empty_message or "No se pudieron extraer keypoints del video. El video podría estar vacío o inaccesible.")
+        return keypoints
+    return decode
+
+
+def model_backend(pipeline, inputs):
+    """Backend por defecto: una pasada del modelo sobre el lote (secuencias, SEQUENCE_LENGTH, FEATURES)."""
+    with metrics.stage('forward'):
+        return pipeline.model.predict(inputs)
+
+
+def micro_batched_backend(pipeline, inputs):
+    """
+    Una sola secuencia a través del micro-batcher del modelo, que la agrupa con las de otras
+    solicitudes concurrentes. El tiempo incluye la espera del lote; la pasada en sí se registra
+    con endpoint 'micro_batcher'.
+    """
+    with metrics.stage('forward'):
+        return [pipeline.micro_batcher.predict(inputs[0])]
+
+
+def cached_batcher(pipeline, inputs):
+    """
+    Batcher por defecto. Las secuencias ya presentes en la caché de predicciones no pasan por
+    el modelo; una sola secuencia pendiente va al micro-batcher del modelo (que la agrupa con
+    las de otras solicitudes concurrentes) y varias van juntas al backend en una sola pasada.
+    El micro-batcher ejecuta el modelo directamente: con un backend distinto de model_backend
+    no se usa, y todas las secuencias pasan por ese backend.
+    """
+    cache = pipeline.prediction_cache
+    probabilities = [None] * len(inputs)
+    cache_keys = [None] * len(inputs)
+    if cache is not None:
+        for i in range(len(inputs)):
+            cache_keys[i] = cache.make_key(pipeline.model.model_id, inputs[i])
+            probabilities[i] = cache.get(cache_keys[i])
+    pending = [i for i, row in enumerate(probabilities) if row is None]
+    if not pending:
+        return probabilities
+
+    if len(pending) == 1 and pipeline.micro_batcher is not None and pipeline.backend is model_backend:
+        predictions = pipeline.forward(inputs[pending], backend=micro_batched_backend)
+    else:
+        predictions = pipeline.forward(inputs[pending])
+    for row, i in enumerate(pending):
+        probabilities[i] = predictions[row]
+        if cache is not None:
+            cache.put(cache_keys[i], predictions[row])
+    return probabilities
+
+
+class InferencePipeline:
+    """
+    Camino común de todas las predicciones: decoder → sampler → batcher → backend → serializer.
+
+    Se parametriza con el modelo, sus etiquetas y el tipo de extracción; cada etapa es una
+    función reemplazable:
+
+    - decoder(pipeline): keypoints de la solicitud (ver keypoints_decoder, batch_decoder y video_decoder).
+    - sampler(keypoints, sequence_length): ajusta un video a la longitud del modelo (None si la
+      entrada ya llega con la forma exacta).
+    - batcher(pipeline, inputs): probabilidades de un lote, con caché y micro-batcher (cached_batcher).
+    - backend(pipeline, inputs): la pasada del modelo (model_backend).
+    - serializer(payload, output_options, status): la respuesta HTTP (responses.render).
+
+    La duración de cada etapa se acumula en `timings` y se pasa a los hooks de tiempo
+    (`hooks` del pipeline y los registrados con add_timing_hook). El batcher incluye al backend
+    cuando lo llama. Un backend propio desactiva el micro-batcher (ver cached_batcher).
+    """
+
+    def __init__(self, model, labels, type_extract=None, micro_batcher=None, prediction_cache=None,
+                 decoder=None, sampler=sample_sequence, batcher=cached_batcher, backend=model_backend,
+                 serializer=render, output_options=None, fields=None, hooks=()):
+        self.model = model
+        self.labels = labels
+        self.type_extract = type_extract
+        self.micro_batcher = micro_batcher
+        self.prediction_cache = prediction_cache
+        self.decoder = decoder
+        self.sampler = sampler
+        self.batcher = batcher
+        self.backend = backend
+        self.serializer = serializer
+        self.output_options = output_options
+        # Campos adicionales de cada predicción (p. ej., modelo y versión en /models/<name>/<version>/predict)
+        self.fields = fields or {}
+        self.hooks = tuple(hooks)
+        self.timings = {}
+
+    @classmethod
+    def for_model(cls, entry, **kwargs):
+        """Pipeline de una versión del registro (ModelVersion): su modelo, etiquetas, extracción y micro-batcher."""
+        kwargs.setdefault('type_extract', entry.type_extract)
+        kwargs.setdefault('micro_batcher', entry.batcher)
+        return cls(entry.model, entry.labels, **kwargs)
+
+    @property
+    def input_shape(self):
+        return tuple(self.model.input_shape[1:])
+
+    @property
+    def sequence_length(self):
+        return self.model.input_shape[1]
+
+    def label(self, index):
+        """Etiqueta legible de la clase `index`."""
+        return str(self.labels[index]) if index < len(self.labels) else f"clase_desconocida_{index}"
+
+    def _timed(self, stage, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+            for hook in (*_timing_hooks, *self.hooks):
+                hook(self, stage, seconds)
+
+    def parse_options(self):
+        """Opciones de salida de la solicitud (top_k, precision, format), si no se indicaron al crear el pipeline."""
+        if self.output_options is None:
+            self.output_options = parse_output_options(len(self.labels))
+        return self.output_options
+
+    def decode(self):
+        return self._timed('decoder', self.decoder, self)
+
+    def sample(self, keypoints):
+        """Ajusta los keypoints a la longitud del modelo y verifica la forma (p. ej., un 'type_extract' que no corresponde)."""
+        if self.sampler is None:
+            return keypoints
+        input_data = self._timed('sampler', self.sampler, keypoints, self.sequence_length)
+        if input_data.shape != self.input_shape:
+            raise PayloadError("La dimensión de los keypoints extraídos no coincide con la del modelo. Verifica 'type_extract'.",
+                               expected_shape=self.input_shape, received_shape=input_data.shape)
+        return input_data
+
+    def forward(self, inputs, backend=None):
+        """Etapa 'backend': probabilidades del lote con `backend` (por defecto, el del pipeline)."""
+        return self._timed('backend', backend or self.backend, self, inputs)
+
+    def predict_many(self, inputs):
+        """Probabilidades de un lote (secuencias, SEQUENCE_LENGTH, FEATURES), una fila por secuencia."""
+        return self._timed('batcher', self.batcher, self, inputs)
+
+    def predict(self, input_data):
+        """Probabilidades de una sola secuencia (SEQUENCE_LENGTH, FEATURES)."""
+        return self.predict_many(np.expand_dims(input_data, axis=0))[0]
+
+    def prediction(self, probabilities):
+        """Cuerpo de una predicción: campos adicionales, clase más probable y probabilidades según las opciones de salida."""
+        return {
+            **self.fields,
+            "prediction": self.label(np.argmax(probabilities)),
+            **probability_fields(probabilities, self.label, self.output_options)
+        }
+
+    def run(self, keypoints=None):
+        """
+        Ejecuta decoder (si no se pasan `keypoints`), sampler y batcher y devuelve el cuerpo de la
+        predicción. Los errores esperados se lanzan como PayloadError, PoolBusyError, PoolTimeoutError o UploadError.
+        """
+        if keypoints is None:
+            keypoints = self.decode()
+        return self.prediction(self.predict(self.sample(keypoints)))
+
+    def run_batch(self):
+        """
+        Predicción por lotes: decodifica todas las secuencias, pasa las válidas por el batcher en
+        una sola llamada y devuelve un resultado (predicción o error) por secuencia, en orden.
+        """
+        batch, errors = self.decode()
+        valid_indices = [i for i, error in enumerate(errors) if error is None]
+        results = [{"index": i, "error": error} for i, error in enumerate(errors)]
+        if valid_indices:
+            for i, probabilities in zip(valid_indices, self.predict_many(batch[valid_indices])):
+                results[i] = {"index": i, **self.prediction(probabilities)}
+        return {
+            "results": results,
+            "total": len(results),
+            "failed": len(results) - len(valid_indices)
+        }
+
+    def serialize(self, payload, status=200):
+        response = self._timed('serializer', self.serializer, payload, self.output_options, status)
+        if PIPELINE_SERVER_TIMING:
+            response.headers['Server-Timing'] = ", ".join(
+                f"{stage};dur={self.timings[stage] * 1000:.2f}" for stage in STAGES if stage in self.timings)
+        return response
+
+    def handle(self, batch=False):
+        """Atiende la solicitud actual de principio a fin y devuelve la respuesta (o el error) de Flask."""
+        try:
+            self.parse_options()
+            payload = self.run_batch() if batch else self.run()
+        except Exception as e:
+            return error_response(e)
+        return self.serialize(payload)
+
+
+def error_response(error):
+    """Respuesta JSON de un error lanzado por alguna etapa del pipeline."""
+    if isinstance(error, PayloadError):
+        return jsonify(error.to_dict()), error.status
+    if isinstance(error, PoolBusyError):
+        return jsonify({"error": str(error)}), 503, {"Retry-After": str(error.retry_after)}
+    if isinstance(error, PoolTimeoutError):
+        return jsonify({"error": str(error)}), 504
+    if isinstance(error, UploadError):
+        return jsonify({"error": error.message}), error.status
+    print(f"Error durante la inferencia de reconocimiento: {error}")
+    return jsonify({"error": f"Error interno del servidor durante la predicción: {str(error)}"}), 500
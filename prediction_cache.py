@@ -0,0 +1,94 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Configuración de la caché de resultados de predicción (variables de entorno)
+PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', '1') == '1'
+PREDICTION_CACHE_MEMORY_MB = float(os.environ.get('PREDICTION_CACHE_MEMORY_MB', 16))
+
+# Memoria aproximada que ocupa cada entrada además del array (clave, tupla y OrderedDict)
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+class PredictionCache:
+    """
+    Caché LRU de probabilidades para tensores de entrada idénticos.
+
+    La clave es el identificador del modelo más un hash BLAKE2b de los bytes float32 de
+    la secuencia, así que reintentos de clientes y secuencias repetidas (por ejemplo, las
+    de solo ceros cuando no se detectan manos) no vuelven a pasar por el modelo. La memoria
+    está acotada por `memory_mb`; al recargar un modelo se invalidan sus entradas.
+    """
+
+    def __init__(self, memory_mb=PREDICTION_CACHE_MEMORY_MB, enabled=PREDICTION_CACHE_ENABLED):
+        self.memory_limit = int(memory_mb * 1024 * 1024)
+        self.enabled = enabled and self.memory_limit > 0
+        self._entries = OrderedDict()  # (model_id, shape, digest) -> probabilidades
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def make_key(self, model_id, input_data):
+        """Calcula la clave de una secuencia (SEQUENCE_LENGTH, FEATURES) para un modelo."""
+        if not self.enabled:
+            return None
+        input_data = np.ascontiguousarray(input_data, dtype=np.float32)
+        digest = hashlib.blake2b(input_data.data, digest_size=16).digest()
+        return (model_id, input_data.shape, digest)
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            probabilities = self._entries.get(key)
+            if probabilities is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return probabilities
+
+    def put(self, key, probabilities):
+        if key is None:
+            return
+        probabilities = np.array(probabilities, copy=True)
+        probabilities.setflags(write=False) # Se comparte entre solicitudes: no debe modificarse
+        size = probabilities.nbytes + _ENTRY_OVERHEAD_BYTES
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes + _ENTRY_OVERHEAD_BYTES
+            self._entries[key] = probabilities
+            self._bytes += size
+            while self._bytes > self.memory_limit and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes + _ENTRY_OVERHEAD_BYTES
+
+    def invalidate(self, model_id=None):
+        """Elimina las entradas de un modelo (por ejemplo, al recargarlo) o todas si `model_id` es None."""
+        with self._lock:
+            if model_id is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [key for key in self._entries if key[0] == model_id]:
+                self._bytes -= self._entries.pop(key).nbytes + _ENTRY_OVERHEAD_BYTES
+
+    def stats(self):
+        """Tasa de aciertos y ocupación de la caché."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else None,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "memory_limit_bytes": self.memory_limit,
+            }
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+from flask import Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+import metrics
+from payloads import PayloadError
+
+try:
+    import orjson # Opcional: codificador JSON en C, varias veces más rápido que json con listas de floats
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack # Opcional: solo necesario para respuestas application/x-msgpack
+except ImportError:
+    msgpack = None
+
+
+# Codificador de las respuestas JSON: auto (orjson si está instalado), orjson o json (biblioteca estándar)
+JSON_SERIALIZER = os.environ.get('JSON_SERIALIZER', 'auto')
+# Máximo de decimales aceptado en el parámetro `precision`
+OUTPUT_MAX_PRECISION = 8
+
+CONTENT_TYPE_MSGPACK = 'application/x-msgpack'
+OUTPUT_FORMATS = ('json', 'msgpack')
+
+_use_orjson = orjson is not None and JSON_SERIALIZER in ('auto', 'orjson')
+if JSON_SERIALIZER == 'orjson' and orjson is None:
+    print("JSON_SERIALIZER=orjson pero orjson no está instalado; se usa json de la biblioteca estándar.")
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Serializador JSON de Flask: usa orjson si está disponible (mismas claves ordenadas que el
+    proveedor por defecto) y registra su duración como la etapa 'serialization' de las métricas.
+    Con `indent` (modo debug) o sin orjson se usa el proveedor estándar.
+    """
+
+    def dumps(self, obj, **kwargs):
+        with metrics.stage('serialization'):
+            if _use_orjson and 'indent' not in kwargs:
+                return orjson.dumps(obj, default=self.default,
+                                    option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+            return super().dumps(obj, **kwargs)
+
+
+def _int_option(name, value, minimum, maximum):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise PayloadError(f"El parámetro '{name}' debe ser un entero.")
+    if not minimum <= number <= maximum:
+        raise PayloadError(f"El parámetro '{name}' debe estar entre {minimum} y {maximum}.")
+    return number
+
+
+def parse_output_options(num_classes):
+    """
+    Opciones de salida de la solicitud actual, desde la URL (?top_k=3&precision=4&format=msgpack)
+    o desde el cuerpo JSON. `format` también se toma de la cabecera Accept. Sin parámetros se
+    devuelve la respuesta de siempre: todas las probabilidades en JSON con precisión completa.
+    Lanza PayloadError si algún valor no es válido.
+    """
+    data = request.get_json(silent=True) if request.is_json else None
+    data = data if isinstance(data, dict) else {}
+
+    def option(name):
+        return request.args.get(name, data.get(name))
+
+    options = {"top_k": None, "precision": None, "format": 'json'}
+    if option('top_k') is not None:
+        options["top_k"] = _int_option('top_k', option('top_k'), 1, num_classes)
+    if option('precision') is not None:
+        options["precision"] = _int_option('precision', option('precision'), 0, OUTPUT_MAX_PRECISION)
+
+    output_format = option('format')
+    if output_format is None and request.accept_mimetypes.best == CONTENT_TYPE_MSGPACK:
+        output_format = 'msgpack'
+    if output_format is not None:
+        if output_format not in OUTPUT_FORMATS:
+            raise PayloadError(f"El parámetro 'format' debe ser uno de: {', '.join(OUTPUT_FORMATS)}.")
+        if output_format == 'msgpack' and msgpack is None:
+            raise PayloadError("El soporte para msgpack no está instalado en el servidor.", status=406)
+        options["format"] = output_format
+    return options
+
+
+def probability_fields(probabilities, label, options=None):
+    """
+    Campos de probabilidades de una predicción: `probabilities` con todas las clases o, con
+    `top_k`, solo `top_k` ([{"label", "probability"}] de mayor a menor). Con `precision` los
+    valores se redondean a ese número de decimales.
+    """
+    options = options or {}
+    probabilities = np.asarray(probabilities)
+    if options.get('precision') is not None:
+        # En float64: redondear en float32 devolvería valores como 0.12349999696016312
+        probabilities = np.round(probabilities.astype(np.float64), options['precision'])
+
+    top_k = options.get('top_k')
+    if top_k is None:
+        return {"probabilities": probabilities.tolist()}
+    if top_k < len(probabilities):
+        indices = np.argpartition(probabilities, -top_k)[-top_k:]
+        indices = indices[np.argsort(probabilities[indices])[::-1]]
+    else:
+        indices = np.argsort(probabilities)[::-1]
+    return {"top_k": [{"label": label(i), "probability": float(probabilities[i])} for i in indices]}
+
+
+def render(payload, options=None, status=200):
+    """Respuesta en el formato pedido: JSON (por defecto) o msgpack."""
+    if options is not None and options.get('format') == 'msgpack':
+        with metrics.stage('serialization'):
+            body = msgpack.packb(payload, use_bin_type=True)
+        return Response(body, status=status, mimetype=CONTENT_TYPE_MSGPACK)
+    response = jsonify(payload)
+    response.status_code = status
+    return response
@@ -0,0 +1,182 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import numpy as np
+
+
+# Configuración de las sesiones de reconocimiento en tiempo real (variables de entorno)
+# Las sesiones viven en la memoria del proceso que las creó: con varios workers de Gunicorn otro
+# worker no las encuentra, así que gunicorn.conf.py las desactiva (SESSIONS_ENABLED=0) en ese caso
+SESSIONS_ENABLED = os.environ.get('SESSIONS_ENABLED', '1') == '1'
+SESSION_MAX_ACTIVE = int(os.environ.get('SESSION_MAX_ACTIVE', 200))
+SESSION_IDLE_SECONDS = float(os.environ.get('SESSION_IDLE_SECONDS', 60))
+# Por defecto se infiere con cada fotograma nuevo una vez que la ventana está completa
+SESSION_INFER_EVERY = int(os.environ.get('SESSION_INFER_EVERY', 1))
+# Eventos pendientes por sesión en el canal SSE; si el cliente no los consume se descartan los más antiguos
+SESSION_EVENT_QUEUE_SIZE = int(os.environ.get('SESSION_EVENT_QUEUE_SIZE', 32))
+# Cada cuántos segundos se envía un comentario keep-alive por el canal SSE
+SESSION_KEEPALIVE_SECONDS = float(os.environ.get('SESSION_KEEPALIVE_SECONDS', 15))
+
+
+class SessionLimitError(RuntimeError):
+    """Se alcanzó el máximo de sesiones activas; el endpoint debe responder 503."""
+
+
+class Session:
+    """
+    Sesión de reconocimiento con ventana deslizante.
+
+    Guarda los últimos `sequence_length` fotogramas en un buffer circular de forma
+    (sequence_length, feature_dim). Cuando la ventana está completa, cada `infer_every`
+    fotogramas nuevos se ejecuta `predict_fn` sobre la ventana ordenada y el resultado se
+    devuelve al llamador y se publica en la cola de eventos (canal SSE).
+    """
+
+    def __init__(self, model_name, sequence_length, feature_dim, predict_fn, infer_every=SESSION_INFER_EVERY):
+        self.id = uuid.uuid4().hex
+        self.model_name = model_name
+        self.sequence_length = sequence_length
+        self.feature_dim = feature_dim
+        self.predict_fn = predict_fn
+        self.infer_every = max(1, int(infer_every))
+        self.events = queue.Queue(maxsize=SESSION_EVENT_QUEUE_SIZE)
+        self.last_activity = time.monotonic()
+        self.closed = False
+        self._buffer = np.zeros((sequence_length, feature_dim), dtype=np.float32)
+        self._position = 0          # Siguiente posición a escribir en el buffer circular
+        self._frames_received = 0
+        self._frames_since_inference = 0
+        self._lock = threading.Lock()
+
+    def window(self):
+        """Devuelve la ventana actual en orden cronológico (del fotograma más antiguo al más reciente)."""
+        if self._position == 0:
+            return self._buffer.copy()
+        return np.concatenate([self._buffer[self._position:], self._buffer[:self._position]])
+
+    def push(self, frames):
+        """
+        Agrega uno o más fotogramas (k, feature_dim) a la ventana. Devuelve el resultado de la
+        inferencia si se ejecutó con estos fotogramas, o None si todavía no correspondía.
+        """
+        with self._lock:
+            self.last_activity = time.monotonic()
+            # Si llegan más fotogramas que la ventana, solo importan los últimos
+            for frame in frames[-self.sequence_length:]:
+                self._buffer[self._position] = frame
+                self._position = (self._position + 1) % self.sequence_length
+            self._frames_received += len(frames)
+            self._frames_since_inference += len(frames)
+
+            if self._frames_received < self.sequence_length or self._frames_since_inference < self.infer_every:
+                return None
+            self._frames_since_inference = 0
+            result = dict(self.predict_fn(self.window()))
+            result["frame"] = self._frames_received
+
+        self.publish(result)
+        return result
+
+    def publish(self, event):
+        while True:
+            try:
+                self.events.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        self.closed = True
+        self.publish(None) # Marca de fin para el canal SSE
+
+    def info(self):
+        return {
+            "session_id": self.id,
+            "model": self.model_name,
+            "sequence_length": self.sequence_length,
+            "feature_dim": self.feature_dim,
+            "infer_every": self.infer_every,
+            "frames_received": self._frames_received,
+        }
+
+
+class SessionManager:
+    """Registro de sesiones activas con límite de concurrencia y desalojo por inactividad."""
+
+    def __init__(self, max_sessions=SESSION_MAX_ACTIVE, idle_seconds=SESSION_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._evicted = 0
+        self._rejected = 0
+
+    def create(self, model_name, sequence_length, feature_dim, predict_fn, infer_every=SESSION_INFER_EVERY):
+        self.evict_idle()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                self._rejected += 1
+                raise SessionLimitError("Se alcanzó el máximo de sesiones activas. Intenta de nuevo más tarde.")
+            session = Session(model_name, sequence_length, feature_dim, predict_fn, infer_every)
+            self._sessions[session.id] = session
+            self._created += 1
+        return session
+
+    def get(self, session_id):
+        self.evict_idle()
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+        return session is not None
+
+    def evict_idle(self):
+        """Cierra las sesiones sin actividad durante más de `idle_seconds`."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [session for session in self._sessions.values() if now - session.last_activity > self.idle_seconds]
+            for session in expired:
+                del self._sessions[session.id]
+            self._evicted += len(expired)
+        for session in expired:
+            session.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "max_active": self.max_sessions,
+                "created": self._created,
+                "evicted_idle": self._evicted,
+                "rejected": self._rejected,
+            }
+
+
+def iter_session_events(session, manager, keepalive_seconds=SESSION_KEEPALIVE_SECONDS):
+    """Genera el flujo Server-Sent Events con las predicciones de una sesión hasta que se cierra."""
+    yield f"event: session\ndata: {json.dumps(session.info())}\n\n"
+    while True:
+        try:
+            event = session.events.get(timeout=keepalive_seconds)
+        except queue.Empty:
+            manager.evict_idle()
+            if session.closed:
+                break
+            yield ": keep-alive\n\n"
+            continue
+        if event is None:
+            break
+        yield f"event: prediction\ndata: {json.dumps(event)}\n\n"
+    yield "event: close\ndata: {}\n\n"
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Momento en que el proceso empezó a importar la aplicación (main.py importa este módulo primero)
+_process_start = time.perf_counter()
+_phases = OrderedDict()  # nombre de la fase -> segundos
+_lock = threading.Lock()
+
+
+def record_phase(name, seconds):
+    """Registra la duración de una fase de arranque y la escribe en el log."""
+    with _lock:
+        _phases[name] = seconds
+    print(f"Arranque [{os.getpid()}]: fase '{name}' completada en {seconds * 1000:.1f} ms.")
+
+
+@contextmanager
+def phase(name):
+    """Mide el bloque como una fase de arranque: `with phase('import_tensorflow'): ...`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
+
+
+def mark_ready(name='app_ready'):
+    """Registra el tiempo transcurrido desde el inicio del proceso hasta este punto."""
+    record_phase(name, time.perf_counter() - _process_start)
+
+
+def import_libraries():
+    """
+    Importa TensorFlow, OpenCV y MediaPipe midiendo cada fase. Se usa para precargarlas
+    (en el maestro de Gunicorn con WEB_PRELOAD=1, o en segundo plano); si ya estaban
+    importadas el costo es nulo.
+    """
+    with phase('import_tensorflow'):
+        import tensorflow  # noqa: F401
+    with phase('import_opencv'):
+        import cv2  # noqa: F401
+    with phase('import_mediapipe'):
+        import mediapipe  # noqa: F401
+
+
+def stats():
+    """Duración de cada fase de arranque de este proceso, en milisegundos."""
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": time.perf_counter() - _process_start,
+            "phases_ms": {name: seconds * 1000 for name, seconds in _phases.items()},
+        }
@@ -0,0 +1,144 @@
+import http.server
+import socket
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobManager, MemoryJobStore, SqliteJobStore, check_public_host, validate_callback_url
+
+
+def resolves_to(monkeypatch, *addresses):
+    def getaddrinfo(host, port, *args, **kwargs):
+        family = lambda address: socket.AF_INET6 if ':' in address else socket.AF_INET
+        return [(family(address), socket.SOCK_STREAM, 6, '', (address, port)) for address in addresses]
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+
+
+@pytest.mark.parametrize("address", ['127.0.0.1', '10.1.2.3', '172.16.0.1', '192.168.1.1', '169.254.169.254',
+                                     '0.0.0.0', '100.64.0.1', '224.0.0.1', '::1', 'fe80::1', 'fd00::1', '::ffff:127.0.0.1'])
+def test_check_public_host_rejects_internal_addresses(monkeypatch, address):
+    resolves_to(monkeypatch, address)
+    with pytest.raises(ValueError):
+        check_public_host('hooks.ejemplo.com', 443)
+
+
+def test_check_public_host_rejects_if_any_address_is_internal(monkeypatch):
+    resolves_to(monkeypatch, '93.184.216.34', '10.0.0.1')
+    with pytest.raises(ValueError):
+        check_public_host('hooks.ejemplo.com', 443)
+
+
+def test_check_public_host_returns_validated_address(monkeypatch):
+    resolves_to(monkeypatch, '93.184.216.34', '2606:2800:220:1:248:1893:25c8:1946')
+    assert check_public_host('hooks.ejemplo.com', 443) == '93.184.216.34'
+
+
+def test_check_public_host_unresolvable(monkeypatch):
+    def getaddrinfo(*args, **kwargs):
+        raise socket.gaierror("Name or service not known")
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+    with pytest.raises(ValueError):
+        check_public_host('no-existe.ejemplo.com', 443)
+
+
+@pytest.mark.parametrize("url, allowed", [
+    ('https://hooks.ejemplo.com/x', ()),                       # Notificaciones desactivadas
+    ('https://otro.com/x', ('hooks.ejemplo.com',)),
+    ('https://ejemplo.com.atacante.com/x', ('*.ejemplo.com',)),
+    ('https://atacanteejemplo.com/x', ('*.ejemplo.com',)),
+    ('ftp://hooks.ejemplo.com/x', ('hooks.ejemplo.com',)),
+    ('http:///sin-host', ('hooks.ejemplo.com',)),
+])
+def test_validate_callback_url_rejects(url, allowed):
+    with pytest.raises(ValueError):
+        validate_callback_url(url, allowed)
+
+
+@pytest.mark.parametrize("url, allowed", [
+    ('https://hooks.ejemplo.com/x', ('hooks.ejemplo.com',)),
+    ('https://HOOKS.ejemplo.com./x', ('hooks.ejemplo.com',)),
+    ('http://a.b.ejemplo.com:8080/x', ('*.ejemplo.com',)),
+])
+def test_validate_callback_url_accepts(url, allowed):
+    assert validate_callback_url(url, allowed).hostname.rstrip('.') in url.lower()
+
+
+def wait_for(manager, job_id, done=lambda job: job['status'] in ('succeeded', 'failed') and job['callback'] is not None):
+    for _ in range(250):
+        job = manager.store.get(job_id)
+        if done(job):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"El trabajo {job_id} no terminó: {manager.store.get(job_id)}")
+
+
+def test_submit_rejects_callback_outside_allowlist():
+    manager = JobManager(store=MemoryJobStore(), callback_allowed_hosts=('hooks.ejemplo.com',))
+    with pytest.raises(ValueError):
+        manager.submit('video', lambda: {}, callback_url='http://169.254.169.254/latest/meta-data')
+    assert manager.stats()['submitted'] == 0
+
+
+def test_callback_to_internal_address_is_not_sent(monkeypatch):
+    resolves_to(monkeypatch, '127.0.0.1')
+    manager = JobManager(store=MemoryJobStore(), callback_allowed_hosts=('hooks.ejemplo.com',), callback_attempts=3)
+    job = manager.submit('video', lambda: {"ok": True}, callback_url='http://hooks.ejemplo.com/cb')
+    job = wait_for(manager, job['job_id'])
+    assert job['status'] == 'succeeded'
+    assert job['callback']['delivered'] is False and job['callback']['attempts'] == 1
+    assert manager.stats()['callbacks_failed'] == 1
+
+
+@pytest.fixture
+def callback_server():
+    received = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, self.headers['Host'], self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(302 if self.path.startswith('/redirect') else 204)
+            self.send_header('Location', 'http://169.254.169.254/')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port, received
+    server.shutdown()
+
+
+def test_callback_connects_to_validated_address(monkeypatch, callback_server):
+    port, received = callback_server
+    # La dirección validada es la que se usa: el nombre no se vuelve a resolver al conectar
+    monkeypatch.setattr(jobs, 'check_public_host', lambda host, port: '127.0.0.1')
+    manager = JobManager(store=MemoryJobStore(), callback_allowed_hosts=('hooks.ejemplo.com',))
+    job = manager.submit('video', lambda: {"ok": True}, callback_url=f'http://hooks.ejemplo.com:{port}/cb?id=1')
+    job = wait_for(manager, job['job_id'])
+    assert job['callback'] == {"delivered": True, "attempts": 1, "http_status": 204}
+    assert received[0][:2] == ('/cb?id=1', f'hooks.ejemplo.com:{port}')
+
+
+def test_callback_redirects_are_not_followed(monkeypatch, callback_server):
+    port, received = callback_server
+    monkeypatch.setattr(jobs, 'check_public_host', lambda host, port: '127.0.0.1')
+    manager = JobManager(store=MemoryJobStore(), callback_allowed_hosts=('hooks.ejemplo.com',), callback_attempts=2)
+    job = manager.submit('video', lambda: {}, callback_url=f'http://hooks.ejemplo.com:{port}/redirect')
+    job = wait_for(manager, job['job_id'], done=lambda job: job['callback'] is not None and job['callback']['attempts'] == 2)
+    assert job['callback']['delivered'] is False
+    assert len(received) == 2
+
+
+def test_unfinished_jobs_are_failed_after_stale_seconds(tmp_path):
+    store = SqliteJobStore(str(tmp_path / 'jobs.sqlite3'))
+    store.save({"job_id": "perdido", "kind": "video", "status": "running", "params": {}, "callback_url": None,
+                "callback": None, "created_at": time.time() - 60, "started_at": time.time() - 60, "finished_at": None,
+                "expires_at": None, "result": None, "error": None, "error_status": None})
+    manager = JobManager(store=store, stale_seconds=30, ttl_seconds=3600)
+    job = manager.get('perdido')
+    assert job['status'] == 'failed' and job['error_status'] == 500
+    assert job['expires_at'] > time.time()
+    assert store.counts()['running'] == 0
@@ -0,0 +1,50 @@
+import json
+import os
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+pytest.importorskip('mediapipe')
+from mediapipe.framework.formats import landmark_pb2
+
+import utils
+
+SEQUENCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test')
+
+
+def landmark_list(values, columns):
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+    for row in values.reshape(-1, columns):
+        point = landmarks.landmark.add()
+        point.x, point.y, point.z = (float(value) for value in row[:3])
+        if columns == 4:
+            point.visibility = float(row[3])
+    return landmarks
+
+
+def recorded_results(name):
+    """Resultados de Holistic reconstruidos a partir de una secuencia grabada de test/ (hands o pose_hands)."""
+    with open(os.path.join(SEQUENCES, name), encoding='utf-8') as f:
+        keypoints = np.asarray(json.load(f)['keypoints'], dtype=np.float32)
+    for frame in keypoints:
+        if frame.size == utils.FEATURES_BY_TYPE['hands']:
+            frame = np.concatenate([np.zeros(132, dtype=np.float32), frame])
+        parts = {'pose_landmarks': (frame[:132], 4), 'left_hand_landmarks': (frame[132:195], 3),
+                 'right_hand_landmarks': (frame[195:258], 3)}
+        # Las partes sin detección (todo ceros) se reciben como None
+        yield types.SimpleNamespace(**{name: landmark_list(values, columns) if values.any() else None
+                                       for name, (values, columns) in parts.items()})
+
+
+@pytest.mark.parametrize("name", sorted(f for f in os.listdir(SEQUENCES) if f.endswith('.json')))
+def test_write_keypoints_matches_list_extraction(name):
+    for results in recorded_results(name):
+        out = np.full(utils.FEATURES_BY_TYPE['pose_hands'], np.nan, dtype=np.float32)
+        utils.write_keypoints_pose_hands(results, out)
+        np.testing.assert_array_equal(out, utils.extract_keypoints_pose_hands(results).astype(np.float32))
+
+        out = np.full(utils.FEATURES_BY_TYPE['hands'], np.nan, dtype=np.float32)
+        utils.write_keypoints_hands(results, out)
+        np.testing.assert_array_equal(out, utils.extract_keypoints_hands(results).astype(np.float32))
@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+import pytest
+
+import model_registry
+from model_registry import ModelNotFoundError, ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+        self.input_shape = (None, 30, 126)
+
+    def predict(self, inputs):
+        return np.zeros((len(inputs), 2), dtype=np.float32)
+
+
+def fake_load(path, backend=None):
+    if 'broken' in path:
+        raise OSError(f"No existe {path}")
+    return FakeModel(path)
+
+
+def spec(path):
+    return {"path": path, "labels": ["A", "B"], "input_shape": [30, 126], "type_extract": "hands"}
+
+
+def write_manifest(path, default_version, versions):
+    manifest = {"models": {"alphabet": {"default_version": default_version,
+                                        "versions": {version: spec(model_path) for version, model_path in versions.items()}}}}
+    path.write_text(json.dumps(manifest), encoding='utf-8')
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'load_backend_model', fake_load)
+    path = tmp_path / 'manifest.json'
+    write_manifest(path, "1", {"1": "v1.h5", "2": "v2.h5", "3": "broken.h5"})
+    return path
+
+
+def make_registry(path):
+    return ModelRegistry(str(path), backend='fake', check_seconds=0, idle_unload_seconds=3600)
+
+
+def test_acquire_loads_lazily_and_counts_in_flight(manifest):
+    registry = make_registry(manifest)
+    entry = registry.resolve('alphabet')
+    assert entry.model is None
+    with registry.acquire('alphabet') as acquired:
+        assert acquired is entry and entry.model is not None
+        assert entry.in_flight == 1
+        with registry.acquire('alphabet'):
+            assert entry.in_flight == 2
+    assert entry.in_flight == 0
+
+
+def test_unknown_model_or_version(manifest):
+    registry = make_registry(manifest)
+    with pytest.raises(ModelNotFoundError):
+        with registry.acquire('words'):
+            pass
+    with pytest.raises(ModelNotFoundError):
+        registry.activate('alphabet', '9')
+
+
+def test_activate_keeps_in_flight_version_until_released(manifest):
+    registry = make_registry(manifest)
+    with registry.acquire('alphabet') as old:
+        new = registry.activate('alphabet', '2')
+        assert new.model is not None # Se carga antes del cambio
+        assert registry.default_version('alphabet') == '2'
+        assert old.model is not None # La solicitud en curso sigue con su versión
+        with registry.acquire('alphabet') as current:
+            assert current is new
+    assert old.model is None
+    assert new.model is not None
+
+
+def test_activate_failure_keeps_default(manifest):
+    registry = make_registry(manifest)
+    with registry.acquire('alphabet'):
+        pass
+    with pytest.raises(RuntimeError):
+        registry.activate('alphabet', '3')
+    assert registry.default_version('alphabet') == '1'
+    with registry.acquire('alphabet') as entry:
+        assert entry.version == '1' and entry.model is not None
+
+
+def test_activate_persist_writes_manifest(manifest):
+    registry = make_registry(manifest)
+    registry.activate('alphabet', '2', persist=True)
+    assert json.loads(manifest.read_text(encoding='utf-8'))['models']['alphabet']['default_version'] == '2'
+    assert make_registry(manifest).default_version('alphabet') == '2'
+
+
+def test_reload_switches_default_and_retires_removed_version(manifest):
+    registry = make_registry(manifest)
+    with registry.acquire('alphabet') as old:
+        write_manifest(manifest, "2", {"2": "v2.h5"})
+        changes = registry.reload()
+        assert "alphabet -> v2" in changes
+        assert old.model is not None # Retirada, pero aún en uso
+        with pytest.raises(ModelNotFoundError):
+            registry.resolve('alphabet', '1')
+    assert old.model is None
+    with registry.acquire('alphabet') as entry:
+        assert entry.version == '2'
+
+
+def test_failed_reload_keeps_default_and_is_retried(manifest):
+    registry = make_registry(manifest)
+    with registry.acquire('alphabet'):
+        pass
+    write_manifest(manifest, "3", {"3": "broken.h5"})
+    with pytest.raises(RuntimeError):
+        registry.reload()
+    assert registry.default_version('alphabet') == '1'
+    with registry.acquire('alphabet') as entry:
+        assert entry.version == '1' and entry.model is not None
+
+    write_manifest(manifest, "2", {"2": "v2.h5"})
+    registry.reload()
+    assert registry.default_version('alphabet') == '2'
+    with pytest.raises(ModelNotFoundError):
+        registry.resolve('alphabet', '1')
@@ -0,0 +1,125 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from payloads import (CONTENT_TYPE_NPY, CONTENT_TYPE_RAW, PayloadError, decode_frames_request,
+                      decode_keypoints_batch_request, decode_keypoints_request)
+
+SHAPE = (30, 126)
+app = Flask(__name__)
+
+
+def request_context(body, content_type):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode('utf-8')
+    return app.test_request_context('/', method='POST', data=body, content_type=content_type)
+
+
+def npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def decode(body, content_type='application/json'):
+    with request_context(body, content_type):
+        from flask import request
+        return decode_keypoints_request(request, SHAPE)
+
+
+def decode_batch(body, content_type='application/json', max_items=4):
+    with request_context(body, content_type):
+        from flask import request
+        return decode_keypoints_batch_request(request, SHAPE, max_items)
+
+
+def test_decode_formats_agree():
+    keypoints = np.random.default_rng(0).random(SHAPE, dtype=np.float32)
+    from_json = decode({"keypoints": keypoints.tolist()})
+    from_raw = decode(keypoints.tobytes(), CONTENT_TYPE_RAW)
+    from_npy = decode(npy_bytes(keypoints), CONTENT_TYPE_NPY)
+    assert from_json.dtype == from_raw.dtype == from_npy.dtype == np.float32
+    np.testing.assert_array_equal(from_raw, keypoints)
+    np.testing.assert_array_equal(from_npy, keypoints)
+    np.testing.assert_allclose(from_json, keypoints)
+
+
+@pytest.mark.parametrize("body, content_type, message", [
+    (b'{no es json', 'application/json', "no es un JSON válido"),
+    ({"otro": 1}, 'application/json', "Falta el campo 'keypoints'"),
+    ({"keypoints": [[1, 2], [3]]}, 'application/json', "matriz numérica rectangular"),
+    ({"keypoints": np.zeros((29, 126)).tolist()}, 'application/json', "Forma de la secuencia"),
+    (b'\x00' * 12, CONTENT_TYPE_RAW, "Tamaño del cuerpo binario"),
+    (b'no es npy', CONTENT_TYPE_NPY, "no es un archivo .npy"),
+    (b'texto', 'text/plain', "La solicitud debe ser en formato JSON"),
+])
+def test_decode_errors_are_400(body, content_type, message):
+    with pytest.raises(PayloadError) as error:
+        decode(body, content_type)
+    assert error.value.status == 400
+    assert message in error.value.message
+
+
+def test_decode_shape_error_reports_shapes():
+    with pytest.raises(PayloadError) as error:
+        decode({"keypoints": np.zeros((30, 258)).tolist()})
+    assert error.value.to_dict()["expected_shape"] == SHAPE
+    assert error.value.to_dict()["received_shape"] == (30, 258)
+
+
+def test_decode_npy_rejects_objects():
+    with pytest.raises(PayloadError):
+        decode(npy_bytes(np.array([None] * 3, dtype=object)), CONTENT_TYPE_NPY)
+
+
+def test_batch_marks_invalid_sequences():
+    valid = np.zeros(SHAPE).tolist()
+    with_nan = np.zeros(SHAPE)
+    with_nan[3, 5] = np.nan
+    batch, errors = decode_batch({"sequences": [valid, np.zeros((10, 126)).tolist(), with_nan.tolist()]})
+    assert batch.shape == (3, *SHAPE)
+    assert errors[0] is None
+    assert "Forma de la secuencia incorrecta" in errors[1]
+    assert "NaN" in errors[2]
+
+
+def test_batch_limits():
+    with pytest.raises(PayloadError) as error:
+        decode_batch({"sequences": [np.zeros(SHAPE).tolist()] * 5})
+    assert error.value.status == 413
+    with pytest.raises(PayloadError) as error:
+        decode_batch(np.zeros((5, *SHAPE), np.float32).tobytes(), CONTENT_TYPE_RAW)
+    assert error.value.status == 413
+    with pytest.raises(PayloadError) as error:
+        decode_batch({"sequences": []})
+    assert error.value.status == 400
+
+
+def test_batch_raw_and_npy():
+    sequences = np.random.default_rng(1).random((2, *SHAPE), dtype=np.float32)
+    batch, errors = decode_batch(sequences.tobytes(), CONTENT_TYPE_RAW)
+    np.testing.assert_array_equal(batch, sequences)
+    assert errors == [None, None]
+    batch, _ = decode_batch(npy_bytes(sequences), CONTENT_TYPE_NPY)
+    np.testing.assert_array_equal(batch, sequences)
+    with pytest.raises(PayloadError):
+        decode_batch(npy_bytes(sequences[0]), CONTENT_TYPE_NPY)
+
+
+def test_frames_request():
+    with request_context({"keypoints": [0.0] * 126}, 'application/json'):
+        from flask import request
+        assert decode_frames_request(request, 126, 4).shape == (1, 126)
+    with request_context(np.zeros((5, 126), np.float32).tobytes(), CONTENT_TYPE_RAW):
+        from flask import request
+        with pytest.raises(PayloadError) as error:
+            decode_frames_request(request, 126, 4)
+        assert error.value.status == 413
+    with request_context({"keypoints": [float('nan')] * 126}, 'application/json'):
+        from flask import request
+        with pytest.raises(PayloadError) as error:
+            decode_frames_request(request, 126, 4)
+        assert error.value.status == 400
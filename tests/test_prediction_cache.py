@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from prediction_cache import _ENTRY_OVERHEAD_BYTES, PredictionCache
+
+SHAPE = (30, 126)
+
+
+def sequence(seed):
+    return np.random.default_rng(seed).random(SHAPE, dtype=np.float32)
+
+
+def entry_bytes(probabilities):
+    return probabilities.nbytes + _ENTRY_OVERHEAD_BYTES
+
+
+def test_same_input_hits_and_other_model_misses():
+    cache = PredictionCache(memory_mb=1, enabled=True)
+    probabilities = np.array([0.1, 0.9], dtype=np.float32)
+    cache.put(cache.make_key('a', sequence(0)), probabilities)
+    assert np.array_equal(cache.get(cache.make_key('a', sequence(0).copy())), probabilities)
+    assert cache.get(cache.make_key('b', sequence(0))) is None
+    assert cache.get(cache.make_key('a', sequence(1))) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_entries_are_read_only_copies():
+    cache = PredictionCache(memory_mb=1, enabled=True)
+    probabilities = np.array([0.1, 0.9], dtype=np.float32)
+    key = cache.make_key('a', sequence(0))
+    cache.put(key, probabilities)
+    probabilities[0] = 1.0
+    cached = cache.get(key)
+    assert cached[0] == pytest.approx(0.1)
+    with pytest.raises(ValueError):
+        cached[0] = 0.5
+
+
+def test_eviction_is_lru_and_bounded_in_bytes():
+    probabilities = np.zeros(1000, dtype=np.float32)
+    cache = PredictionCache(memory_mb=3.5 * entry_bytes(probabilities) / (1024 * 1024), enabled=True)
+    keys = [cache.make_key('m', sequence(i)) for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, probabilities)
+    assert cache.get(keys[0]) is not None # keys[0] pasa a ser la más reciente
+    cache.put(keys[3], probabilities)
+
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) is not None for key in (keys[0], keys[2], keys[3]))
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["memory_bytes"] == 3 * entry_bytes(probabilities) <= stats["memory_limit_bytes"]
+
+
+def test_replacing_a_key_does_not_leak_bytes():
+    cache = PredictionCache(memory_mb=1, enabled=True)
+    key = cache.make_key('m', sequence(0))
+    for size in (10, 100, 10):
+        cache.put(key, np.zeros(size, dtype=np.float32))
+    assert cache.stats()["memory_bytes"] == entry_bytes(np.zeros(10, dtype=np.float32))
+
+
+def test_invalidate_by_model():
+    cache = PredictionCache(memory_mb=1, enabled=True)
+    probabilities = np.zeros(2, dtype=np.float32)
+    cache.put(cache.make_key('a', sequence(0)), probabilities)
+    cache.put(cache.make_key('b', sequence(0)), probabilities)
+    cache.invalidate('a')
+    assert cache.get(cache.make_key('a', sequence(0))) is None
+    assert cache.get(cache.make_key('b', sequence(0))) is not None
+    assert cache.stats()["memory_bytes"] == entry_bytes(probabilities)
+
+
+def test_disabled_cache_has_no_keys():
+    assert PredictionCache(memory_mb=1, enabled=False).make_key('a', sequence(0)) is None
+    assert PredictionCache(memory_mb=0, enabled=True).make_key('a', sequence(0)) is None
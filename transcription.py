@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+
+
+# Configuración de la transcripción de videos con varias señas (variables de entorno)
+# Fotogramas entre el inicio de una ventana y el de la siguiente
+TRANSCRIPTION_STRIDE = int(os.environ.get('TRANSCRIPTION_STRIDE', 5))
+# Probabilidad mínima para que una ventana cuente como seña reconocida
+TRANSCRIPTION_MIN_CONFIDENCE = float(os.environ.get('TRANSCRIPTION_MIN_CONFIDENCE', 0.6))
+# Ventanas consecutivas con la misma seña necesarias para aceptarla (descarta detecciones sueltas)
+TRANSCRIPTION_MIN_WINDOWS = int(os.environ.get('TRANSCRIPTION_MIN_WINDOWS', 2))
+# Ventanas por pasada del modelo: un video normal cabe en una sola; acota la memoria en videos muy largos
+TRANSCRIPTION_MAX_BATCH = int(os.environ.get('TRANSCRIPTION_MAX_BATCH', 512))
+
+
+def window_starts(num_frames, window, stride):
+    """
+    Primer fotograma de cada ventana de `window` fotogramas, cada `stride`. La última ventana
+    siempre termina en el último fotograma, aunque el paso no encaje exactamente.
+    """
+    if num_frames <= window:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.arange(0, num_frames - window + 1, stride)
+    if starts[-1] != num_frames - window:
+        starts = np.append(starts, num_frames - window)
+    return starts
+
+
+def iter_window_batches(keypoints, window, starts, max_batch=TRANSCRIPTION_MAX_BATCH):
+    """
+    Genera lotes (ventanas, window, features) listos para el modelo. Las ventanas se toman
+    de una vista deslizante de `keypoints` (sin copiar el video) y solo se copia cada lote.
+    Un video más corto que `window` produce una única ventana rellenada con ceros.
+    """
+    if len(keypoints) < window:
+        padded = np.zeros((1, window, keypoints.shape[1]), dtype=np.float32)
+        padded[0, :len(keypoints)] = keypoints
+        yield padded
+        return
+    # sliding_window_view coloca la dimensión de la ventana al final: (n - window + 1, features, window)
+    windows = np.lib.stride_tricks.sliding_window_view(keypoints, window, axis=0).transpose(0, 2, 1)
+    for i in range(0, len(starts), max_batch):
+        yield np.ascontiguousarray(windows[starts[i:i + max_batch]], dtype=np.float32)
+
+
+def merge_window_predictions(probabilities, starts, window, num_frames, label, fps=None,
+                             min_confidence=TRANSCRIPTION_MIN_CONFIDENCE, min_windows=TRANSCRIPTION_MIN_WINDOWS):
+    """
+    Une las predicciones de ventanas consecutivas en una secuencia de señas.
+
+    Las ventanas seguidas con la misma clase y probabilidad >= `min_confidence` forman un
+    segmento; una ventana poco confiable o de otra clase lo cierra. Los segmentos con menos
+    de `min_windows` ventanas se descartan. Cada seña indica los fotogramas que cubren sus
+    ventanas (fin exclusivo), en segundos si se conoce `fps`, y la probabilidad media.
+    `label(index)` convierte el índice de clase en la etiqueta.
+    """
+    classes = np.argmax(probabilities, axis=1)
+    confidences = probabilities[np.arange(len(probabilities)), classes]
+
+    segments = []
+    run_start = None
+    for i in range(len(classes) + 1):
+        confident = i < len(classes) and confidences[i] >= min_confidence
+        if run_start is not None and (not confident or classes[i] != classes[run_start]):
+            if i - run_start >= min_windows:
+                segments.append((run_start, i))
+            run_start = None
+        if confident and run_start is None:
+            run_start = i
+
+    signs = []
+    for first, end in segments:
+        start_frame = int(starts[first])
+        end_frame = int(min(starts[end - 1] + window, num_frames))
+        signs.append({
+            "sign": label(classes[first]),
+            "start_frame": start_frame,
+            "end_frame": end_frame,
+            "start_seconds": round(start_frame / fps, 3) if fps else None,
+            "end_seconds": round(end_frame / fps, 3) if fps else None,
+            "confidence": float(confidences[first:end].mean()),
+            "windows": end - first,
+        })
+    return signs
+
+
+def transcribe_keypoints(pipeline, keypoints, fps=None, stride=TRANSCRIPTION_STRIDE,
+                         min_confidence=TRANSCRIPTION_MIN_CONFIDENCE, min_windows=TRANSCRIPTION_MIN_WINDOWS,
+                         max_batch=TRANSCRIPTION_MAX_BATCH):
+    """
+    Transcribe los keypoints de un video completo (fotogramas, features): recorre el video con
+    una ventana de la longitud de secuencia del modelo y paso `stride`, predice todas las
+    ventanas en lotes (una sola pasada si caben en `max_batch`) y une las predicciones en
+    señas con marca de tiempo (ver merge_window_predictions).
+
+    Los lotes pasan por `pipeline.predict_many` (ver pipeline.py): la caché de predicciones, el
+    backend del modelo y los hooks de tiempo son los mismos que en los demás endpoints.
+    """
+    keypoints = np.asarray(keypoints, dtype=np.float32)
+    window = pipeline.sequence_length
+    num_frames = len(keypoints)
+    starts = window_starts(num_frames, window, stride)
+    batches = []
+    for batch in iter_window_batches(keypoints, window, starts, max_batch):
+        batches.append(np.asarray(pipeline.predict_many(batch)))
+    probabilities = np.concatenate(batches)
+    signs = merge_window_predictions(probabilities, starts, window, num_frames, pipeline.label, fps, min_confidence, min_windows)
+    return {
+        "frames": num_frames,
+        "fps": fps,
+        "duration_seconds": round(num_frames / fps, 3) if fps else None,
+        "window": window,
+        "stride": stride,
+        "windows": len(starts),
+        "signs": signs,
+        "transcription": " ".join(sign["sign"] for sign in signs),
+    }
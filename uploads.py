@@ -0,0 +1,188 @@
+import errno
+import os
+import shutil
+import tempfile
+import time
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+
+# Configuración de la subida de videos (variables de entorno)
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_BYTES', 64 * 1024))
+# Nombre del campo del archivo en las subidas multipart/form-data
+UPLOAD_FILE_FIELD = 'video'
+
+# La decodificación incremental usa una tubería con nombre (FIFO); no existe en Windows
+STREAMING_SUPPORTED = hasattr(os, 'mkfifo')
+
+
+class UploadError(ValueError):
+    """Error en el cuerpo de la subida; se traduce en una respuesta JSON con `status`."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def iter_upload_chunks(request, chunk_size=UPLOAD_CHUNK_BYTES, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Itera sobre los bytes del video a medida que llegan, sin acumular el cuerpo completo.
+
+    Acepta el video como cuerpo crudo (video/*, application/octet-stream; también con
+    Transfer-Encoding: chunked) o como campo `video` de un multipart/form-data, que se
+    decodifica de forma incremental.
+    """
+    stream = request.stream
+    received = 0
+
+    if request.mimetype != 'multipart/form-data':
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadError(f"El video excede el tamaño máximo de {max_bytes} bytes.", status=413)
+            yield chunk
+
+    boundary = request.mimetype_params.get('boundary')
+    if not boundary:
+        raise UploadError("Falta el boundary de multipart/form-data.")
+    decoder = MultipartDecoder(boundary.encode('latin1'))
+    in_video = False
+    found_video = False
+    while True:
+        chunk = stream.read(chunk_size)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while not isinstance(event, (NeedData, Epilogue)):
+            if isinstance(event, File):
+                in_video = event.name == UPLOAD_FILE_FIELD
+                found_video = found_video or in_video
+            elif isinstance(event, Field):
+                in_video = False
+            elif isinstance(event, Data) and in_video and event.data:
+                received += len(event.data)
+                if received > max_bytes:
+                    raise UploadError(f"El video excede el tamaño máximo de {max_bytes} bytes.", status=413)
+                yield event.data
+            event = decoder.next_event()
+        if isinstance(event, Epilogue) or not chunk:
+            break
+    if not found_video:
+        raise UploadError(f"Falta el campo de archivo '{UPLOAD_FILE_FIELD}' en la solicitud multipart.")
+
+
+class _FifoWriter:
+    """
+    Extremo de escritura de la FIFO que lee el proceso de Holistic.
+
+    Nunca bloquea la apertura: se reintenta en cada fragmento hasta que el lector abre la
+    FIFO, y mientras tanto los datos solo se guardan en el archivo de respaldo. Al conectar
+    se reenvía desde el archivo lo que aún no se ha enviado. Si el lector cierra (por ejemplo,
+    porque el contenedor no se puede leer como flujo), se deja de escribir en la FIFO.
+    """
+
+    def __init__(self, fifo_path, spool_path):
+        self.fifo_path = fifo_path
+        self.spool_path = spool_path
+        self.fd = None
+        self.sent = 0
+        self.broken = False
+
+    def try_connect(self):
+        if self.fd is not None or self.broken:
+            return self.fd is not None
+        try:
+            self.fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            if e.errno == errno.ENXIO: # Todavía no hay lector
+                return False
+            raise
+        os.set_blocking(self.fd, True)
+        return True
+
+    def flush(self, spooled_bytes):
+        """Envía a la FIFO lo que ya está en el archivo de respaldo y aún no se envió."""
+        if not self.try_connect() or self.sent >= spooled_bytes:
+            return
+        try:
+            with open(self.spool_path, 'rb') as spool:
+                spool.seek(self.sent)
+                while self.sent < spooled_bytes:
+                    data = spool.read(min(UPLOAD_CHUNK_BYTES, spooled_bytes - self.sent))
+                    if not data:
+                        break
+                    view = memoryview(data)
+                    while view:
+                        written = os.write(self.fd, view)
+                        view = view[written:]
+                    self.sent += len(data)
+        except BrokenPipeError:
+            self.close()
+            self.broken = True
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def process_upload(pool, type_extract, chunks, target_frames=None, model_complexity=None):
+    """
+    Extrae los keypoints de un video subido mientras se recibe.
+
+    Los bytes se guardan en un archivo temporal y, a la vez, se escriben en una FIFO que un
+    proceso del pool de Holistic decodifica fotograma a fotograma, de modo que la transferencia
+    y el cómputo se solapan. Si el contenedor no se puede decodificar como flujo (por ejemplo,
+    un MP4 con el índice `moov` al final) se procesa el archivo completo al terminar la subida.
+    Sin soporte de FIFO (Windows) solo se usa el archivo temporal. `model_complexity` elige el
+    modelo de pose de Holistic (None: el predeterminado).
+    """
+    tmpdir = tempfile.mkdtemp(prefix='lsc-upload-')
+    spool_path = os.path.join(tmpdir, 'video')
+    try:
+        if not STREAMING_SUPPORTED:
+            with open(spool_path, 'wb') as spool:
+                for chunk in chunks:
+                    spool.write(chunk)
+            return pool.process_video(type_extract, spool_path, target_frames=target_frames, model_complexity=model_complexity)
+
+        import cv2 # Solo para la constante del backend; se importa con el primer video subido
+        fifo_path = os.path.join(tmpdir, 'stream')
+        os.mkfifo(fifo_path)
+        # El número de fotogramas de un flujo no se conoce de antemano: se procesan todos.
+        # Solo FFmpeg abre la FIFO una única vez (otros backends la reabrirían y quedarían bloqueados).
+        async_result = pool.submit_video(type_extract, fifo_path, api_preference=cv2.CAP_FFMPEG, model_complexity=model_complexity)
+        writer = _FifoWriter(fifo_path, spool_path)
+        spooled_bytes = 0
+        try:
+            with open(spool_path, 'wb') as spool:
+                for chunk in chunks:
+                    spool.write(chunk)
+                    spool.flush()
+                    spooled_bytes += len(chunk)
+                    writer.flush(spooled_bytes)
+        finally:
+            # El lector siempre termina abriendo la FIFO (incluso si la subida falló): hay que
+            # conectar y cerrar para que reciba EOF y libere su proceso del pool
+            deadline = time.monotonic() + pool.timeout
+            while not writer.broken and not writer.try_connect() and not async_result.ready():
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.01)
+            writer.flush(spooled_bytes)
+            writer.close()
+
+        keypoints, _ = pool.result(async_result)
+        if keypoints is not None and len(keypoints) > 0:
+            return keypoints
+
+        # Respaldo: decodificar el archivo completo (permite leer el índice al final del MP4)
+        if spooled_bytes == 0:
+            return None
+        return pool.process_video(type_extract, spool_path, target_frames=target_frames, model_complexity=model_complexity)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
@@ -1,7 +1,15 @@
+import os
+import queue
+import stat
+import threading
+import time
+
 import numpy as np
 import cv2
 import mediapipe as mp
 
+import constants
+
 
 try:
     # cargar modelos de mediapipe
@@ -12,12 +20,42 @@ except Exception as e:
     mp_holistic = None
     mp_drawing = None
 
-def mediapipe_detection(image, model):
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) # COLOR CONVERSION BGR 2 RGB
-    image.flags.writeable = False                  # Image is no longer writeable
-    results = model.process(image)                 # Make prediction
-    image.flags.writeable = True                   # Image is now writeable 
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR) # COLOR COVERSION RGB 2 BGR
+# Extracción con muestreo: si el video tiene más fotogramas de los que necesita el modelo,
+# solo se ejecuta Holistic sobre los fotogramas seleccionados (los demás se saltan con grab()).
+# VIDEO_SAMPLED_EXTRACTION=0 vuelve a procesar todos los fotogramas.
+VIDEO_SAMPLED_EXTRACTION = os.environ.get('VIDEO_SAMPLED_EXTRACTION', '1') == '1'
+# Fotogramas previos a cada fotograma seleccionado que también pasan por Holistic (sin
+# guardarse) para que el seguimiento se estabilice. 0 = máxima velocidad, menor calidad.
+VIDEO_TRACKING_NEIGHBORHOOD = int(os.environ.get('VIDEO_TRACKING_NEIGHBORHOOD', 1))
+# Decodificación en paralelo: un hilo lee y decodifica los fotogramas con OpenCV mientras
+# Holistic procesa los anteriores. VIDEO_PARALLEL_DECODE=0 vuelve a hacerlo todo en un solo hilo.
+VIDEO_PARALLEL_DECODE = os.environ.get('VIDEO_PARALLEL_DECODE', '1') == '1'
+# Fotogramas decodificados que pueden esperar a Holistic (cada uno es una imagen completa en memoria)
+VIDEO_DECODE_QUEUE_FRAMES = max(1, int(os.environ.get('VIDEO_DECODE_QUEUE_FRAMES', 4)))
+# Lado mayor (píxeles) de la imagen que recibe Holistic: los fotogramas más grandes se reducen
+# antes de convertirlos a RGB (Holistic trabaja internamente a 256 px). 0 = resolución original.
+VIDEO_MAX_SIDE = int(os.environ.get('VIDEO_MAX_SIDE', 0))
+# Recorte a la región de la persona: cada fotograma se recorta a la caja de la pose y las manos del
+# fotograma anterior, ampliada en VIDEO_ROI_MARGIN (fracción del lado mayor de la caja) por lado
+VIDEO_ROI_CROP = os.environ.get('VIDEO_ROI_CROP', '0') == '1'
+VIDEO_ROI_MARGIN = float(os.environ.get('VIDEO_ROI_MARGIN', 0.25))
+# Complejidad del modelo de pose de Holistic: 0 (lite, mucho más rápido en CPU), 1 (full) o 2 (heavy).
+# Los endpoints de video aceptan 'model_complexity' por solicitud; este es el valor por defecto.
+HOLISTIC_MODEL_COMPLEXITY = int(os.environ.get('HOLISTIC_MODEL_COMPLEXITY', 1))
+# Filas iniciales del buffer de keypoints cuando el contenedor no declara el número de fotogramas
+VIDEO_BUFFER_INITIAL_FRAMES = 64
+
+# Dimensión del vector de keypoints por fotograma según el tipo de extracción
+FEATURES_BY_TYPE = {'hands': constants.point_hands, 'pose_hands': constants.point_hands_pose}
+
+def mediapipe_detection(image, model, rgb_buffer=None):
+    # `rgb_buffer` (array con la forma de `image`) recibe la conversión a RGB en lugar de
+    # asignar una imagen nueva en cada fotograma. `image` no se modifica, así que se devuelve
+    # tal cual en vez de convertir de nuevo a BGR.
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb_buffer) # COLOR CONVERSION BGR 2 RGB
+    rgb_image.flags.writeable = False              # Image is no longer writeable
+    results = model.process(rgb_image)             # Make prediction
+    rgb_image.flags.writeable = True               # Image is now writeable
     return image, results
 
 
@@ -33,36 +71,382 @@ def extract_keypoints_pose_hands(results):
     rh = np.array([[res.x, res.y, res.z] for res in results.right_hand_landmarks.landmark]).flatten() if results.right_hand_landmarks else np.zeros(21*3)
     return np.concatenate([pose,lh, rh])
 
-def process_video_sign(type_extract, url_video):
+def write_landmarks(landmark_list, out):
+    """
+    Copia los puntos de `landmark_list` en `out`, una vista float32 de forma (puntos, 3) con
+    x, y, z o (puntos, 4) con x, y, z, visibility. Si no hay detección escribe ceros.
+
+    Los valores se leen con un solo np.fromiter sobre los atributos de cada punto, sin listas
+    intermedias, y se copian en `out` de una vez.
+    """
+    if landmark_list is None:
+        out[:] = 0
+        return
+    num_landmarks, columns = out.shape
+    if columns == 4:
+        values = (value for res in landmark_list.landmark for value in (res.x, res.y, res.z, res.visibility))
+    else:
+        values = (value for res in landmark_list.landmark for value in (res.x, res.y, res.z))
+    out[:] = np.fromiter(values, dtype=np.float32, count=num_landmarks * columns).reshape(num_landmarks, columns)
+
+def write_keypoints_hands(results, out):
+    """Escribe en `out` (126 float32) los keypoints de ambas manos, igual que extract_keypoints_hands."""
+    write_landmarks(results.left_hand_landmarks, out[:63].reshape(21, 3))
+    write_landmarks(results.right_hand_landmarks, out[63:126].reshape(21, 3))
+
+def write_keypoints_pose_hands(results, out):
+    """Escribe en `out` (258 float32) los keypoints de pose y manos, igual que extract_keypoints_pose_hands."""
+    write_landmarks(results.pose_landmarks, out[:132].reshape(33, 4))
+    write_keypoints_hands(results, out[132:258])
+
+def create_holistic(model_complexity=None):
+    """
+    Crea una instancia de MediaPipe Holistic con la configuración usada por la API.
+    `model_complexity` None usa HOLISTIC_MODEL_COMPLEXITY. Los modelos de pose 0 y 2 no vienen
+    con mediapipe: se descargan en el primer uso (la imagen de Docker los descarga al construirse).
+    """
     if mp_holistic is None:
         raise RuntimeError("MediaPipe no está disponible. Asegúrate de que la biblioteca esté instalada correctamente.")
+    if model_complexity is None:
+        model_complexity = HOLISTIC_MODEL_COMPLEXITY
+    return mp_holistic.Holistic(static_image_mode=False, model_complexity=model_complexity, smooth_landmarks=True, enable_segmentation=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+class DetectionInput:
+    """
+    Prepara cada fotograma para Holistic: recorte opcional a la región de la persona, reducción
+    a `max_side` píxeles de lado mayor y conversión a RGB, sobre buffers que se reutilizan.
+
+    Holistic devuelve los puntos normalizados respecto de la imagen que recibe. La reducción no
+    los cambia (conserva la proporción), pero el recorte sí: `to_frame` pasa los keypoints
+    escritos a coordenadas del fotograma completo, de modo que la salida no depende del recorte.
+    La región se calcula con la pose y las manos de cada fotograma y solo cambia cuando la
+    persona se sale de ella o ocupa menos de la mitad (así el seguimiento de Holistic no recibe
+    una imagen distinta en cada fotograma); si se pierde la pose se vuelve al fotograma completo.
+    """
+
+    def __init__(self, max_side=VIDEO_MAX_SIDE, roi_crop=VIDEO_ROI_CROP, roi_margin=VIDEO_ROI_MARGIN):
+        self.max_side = max_side
+        self.roi_crop = roi_crop
+        self.roi_margin = roi_margin
+        self.roi = None # (x0, y0, x1, y1) normalizados para el siguiente fotograma; None = fotograma completo
+        self.crop = None # (x0, y0, ancho, alto) normalizados del recorte aplicado al fotograma actual
+        self._resized = None
+        self._rgb = None
+        self._points = np.empty((33 + 21 + 21, 4), dtype=np.float32)
+
+    def detect(self, frame, holistic):
+        """Ejecuta Holistic sobre el fotograma (recortado y reducido) y devuelve sus resultados."""
+        image = frame
+        self.crop = None
+        if self.roi is not None:
+            height, width = frame.shape[:2]
+            x0, y0 = int(self.roi[0] * width), int(self.roi[1] * height)
+            x1, y1 = int(np.ceil(self.roi[2] * width)), int(np.ceil(self.roi[3] * height))
+            image = frame[y0:y1, x0:x1] # Vista, sin copiar
+            self.crop = (x0 / width, y0 / height, (x1 - x0) / width, (y1 - y0) / height)
+
+        height, width = image.shape[:2]
+        if self.max_side and max(height, width) > self.max_side:
+            scale = self.max_side / max(height, width)
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            if self._resized is None or self._resized.shape[:2] != (size[1], size[0]):
+                self._resized = np.empty((size[1], size[0], 3), dtype=frame.dtype)
+            image = cv2.resize(image, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+
+        if self._rgb is None or self._rgb.shape != image.shape:
+            self._rgb = np.empty_like(image)
+        _, results = mediapipe_detection(image, holistic, self._rgb)
+        return results
+
+    def to_frame(self, results, out):
+        """Pasa a coordenadas del fotograma completo los keypoints escritos en `out` (126 o 258 floats)."""
+        if self.crop is None:
+            return
+        parts = []
+        hands = out
+        if len(out) == constants.point_hands_pose:
+            parts.append((results.pose_landmarks, out[:132].reshape(33, 4)))
+            hands = out[132:]
+        parts.append((results.left_hand_landmarks, hands[:63].reshape(21, 3)))
+        parts.append((results.right_hand_landmarks, hands[63:126].reshape(21, 3)))
+        x0, y0, width, height = self.crop
+        for landmarks, points in parts:
+            if landmarks is not None:
+                points[:, 0] = points[:, 0] * width + x0
+                points[:, 1] = points[:, 1] * height + y0
+                points[:, 2] *= width # z usa la misma escala que x
+
+    def update_roi(self, results):
+        """Calcula la región del siguiente fotograma a partir de los puntos detectados en este."""
+        if not self.roi_crop:
+            return
+        if results.pose_landmarks is None:
+            self.roi = None
+            return
+        points = self._points
+        write_landmarks(results.pose_landmarks, points[:33])
+        write_landmarks(results.left_hand_landmarks, points[33:54, :3])
+        write_landmarks(results.right_hand_landmarks, points[54:75, :3])
+        visible = np.empty(len(points), dtype=bool)
+        visible[:33] = points[:33, 3] >= 0.5
+        visible[33:54] = results.left_hand_landmarks is not None
+        visible[54:75] = results.right_hand_landmarks is not None
+        if not visible.any():
+            self.roi = None
+            return
+        xy = points[visible, :2]
+        if self.crop is not None:
+            x0, y0, width, height = self.crop
+            xy = xy * (width, height) + (x0, y0)
+        low, high = xy.min(axis=0), xy.max(axis=0)
+        margin = self.roi_margin * (high - low).max()
+        candidate = (*np.clip(low - margin, 0.0, 1.0), *np.clip(high + margin, 0.0, 1.0))
+
+        def area(box):
+            return (box[2] - box[0]) * (box[3] - box[1])
+        if area(candidate) >= 0.8:
+            # La persona ocupa casi todo el fotograma: recortar no ahorra nada
+            candidate = None
+        if (candidate is None or self.roi is None
+                or not (self.roi[0] <= candidate[0] and self.roi[1] <= candidate[1] and candidate[2] <= self.roi[2] and candidate[3] <= self.roi[3])
+                or area(candidate) < 0.5 * area(self.roi)):
+            self.roi = candidate
+
+def select_frames(total_frames, target_frames, neighborhood=VIDEO_TRACKING_NEIGHBORHOOD):
+    """
+    Elige los fotogramas a muestrear con la misma distribución uniforme que usan los endpoints
+    (np.linspace). Devuelve `(keep, process)`: los índices cuyos keypoints se conservan y el
+    conjunto de índices que deben pasar por Holistic (los de `keep` más `neighborhood`
+    fotogramas previos a cada uno, para estabilizar el seguimiento).
+    """
+    keep = np.linspace(0, total_frames - 1, target_frames).astype(int)
+    process = set()
+    for index in keep:
+        process.update(range(max(0, index - neighborhood), index + 1))
+    return keep, process
+
+def iter_frames(cap, process_frames=None, timings=None, get_buffer=None):
+    """
+    Genera `(índice, fotograma)` de cada fotograma del video que debe pasar por Holistic. Con
+    `process_frames` (conjunto de índices) los demás se saltan con grab(), sin decodificarse,
+    y la lectura termina después del último índice del conjunto. El tiempo de lectura y
+    decodificación se acumula en timings['decode_seconds'] y, si el video se acaba antes (o
+    falla la lectura), en timings['end_of_video'] queda el número de fotogramas leídos.
+
+    Cada fotograma se decodifica sobre el array que devuelve `get_buffer()`; por defecto, sobre
+    el fotograma anterior, que ya no se usa cuando el consumidor pide el siguiente.
+    """
+    last_frame = max(process_frames) if process_frames else None
+    decode_seconds = 0.0
+    end_of_video = None
+    frame = None
+    frame_index = -1
+    try:
+        while cap.isOpened():
+            frame_index += 1
+            if process_frames is not None:
+                if frame_index > last_frame:
+                    break
+                if frame_index not in process_frames:
+                    # Avanzar sin decodificar la imagen completa
+                    start = time.perf_counter()
+                    grabbed = cap.grab()
+                    decode_seconds += time.perf_counter() - start
+                    if not grabbed:
+                        end_of_video = frame_index
+                        break
+                    continue
+
+            buffer = get_buffer() if get_buffer is not None else frame # Puede esperar a que se libere uno
+            start = time.perf_counter()
+            ret, frame = cap.read(buffer)
+            decode_seconds += time.perf_counter() - start
+            if not ret:
+                end_of_video = frame_index
+                break # No hay más frames o hubo un error de lectura
+            yield frame_index, frame
+    finally:
+        if timings is not None:
+            timings['decode_seconds'] = timings.get('decode_seconds', 0.0) + decode_seconds
+            if end_of_video is not None:
+                timings['end_of_video'] = end_of_video
+
+def iter_frames_threaded(cap, process_frames=None, timings=None, max_queued=VIDEO_DECODE_QUEUE_FRAMES):
+    """
+    Igual que iter_frames, pero la lectura y la decodificación ocurren en un hilo aparte, de
+    modo que OpenCV decodifica los fotogramas siguientes mientras el consumidor (Holistic)
+    procesa el actual. Ambos liberan el GIL en su trabajo nativo, así que las etapas se solapan.
+
+    El hilo decodifica sobre un conjunto fijo de `max_queued + 1` arrays que se reciclan: cuando
+    todos están en la cola o en uso se detiene hasta que el consumidor pide el siguiente
+    fotograma (devolviendo el anterior). Se entregan los mismos fotogramas, en el mismo orden.
+    Al cerrar el generador (fin del video, excepción o `close()`) se detiene el hilo y se espera
+    a que termine, así que la captura puede liberarse justo después.
+    """
+    free_buffers = queue.Queue()
+    for _ in range(max_queued + 1):
+        free_buffers.put(None) # Cada array se crea en su primera lectura, con la resolución del video
+    ready = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def decode():
+        frames = iter_frames(cap, process_frames, timings, get_buffer=free_buffers.get)
+        try:
+            for item in frames:
+                if stop.is_set():
+                    break
+                ready.put(item)
+        except Exception as e:
+            ready.put(e)
+        finally:
+            frames.close()
+            ready.put(done)
+
+    thread = threading.Thread(target=decode, name="video-decoder", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            free_buffers.put(item[1]) # El consumidor ya terminó con este fotograma
+    finally:
+        stop.set()
+        free_buffers.put(None) # Despierta al hilo si esperaba un buffer
+        thread.join()
+
+def process_video_sign(type_extract, url_video, holistic=None, stats=None, target_frames=None, tracking_neighborhood=VIDEO_TRACKING_NEIGHBORHOOD, api_preference=cv2.CAP_ANY,
+                       max_side=VIDEO_MAX_SIDE, roi_crop=VIDEO_ROI_CROP, model_complexity=None, total_frames=None):
+    """
+    Extrae los keypoints de los fotogramas de un video.
+
+    Si se pasa `target_frames` y el video declara más fotogramas (CAP_PROP_FRAME_COUNT), solo
+    se decodifican completamente y se procesan con Holistic los `target_frames` fotogramas
+    muestreados uniformemente (más `tracking_neighborhood` previos a cada uno); el resto se
+    salta con `grab()`. En ese caso se devuelven exactamente los keypoints muestreados.
+    Sin `target_frames`, o si el número de fotogramas no se conoce, se procesan todos.
+
+    CAP_PROP_FRAME_COUNT es una estimación del contenedor y puede ser mayor que los fotogramas
+    reales: si el video se acaba antes de los últimos fotogramas muestreados, se vuelve a
+    abrir y se muestrea sobre el número de fotogramas leídos (`total_frames`), que sustituye
+    al declarado. Si no se puede volver a abrir (FIFO), se remuestrean los keypoints obtenidos.
+
+    `api_preference` fuerza un backend de OpenCV (por ejemplo, cv2.CAP_FFMPEG para leer de
+    una FIFO, que otros backends intentarían abrir varias veces).
+
+    Devuelve un array float32 (fotogramas, 126 | 258): los keypoints se escriben directamente
+    en un buffer preasignado (ver write_keypoints_hands), sin listas ni arrays por fotograma.
+
+    Antes de Holistic cada fotograma se reduce a `max_side` píxeles de lado mayor y, con
+    `roi_crop`, se recorta a la región de la persona (ver DetectionInput); los keypoints siempre
+    se devuelven en coordenadas del fotograma completo.
+
+    Si se pasa `holistic`, se reutiliza esa instancia (reiniciando su estado de seguimiento)
+    en lugar de construir un grafo nuevo para cada video; si no, se crea una con `model_complexity`. Si se pasa un diccionario `stats`,
+    se acumulan en él 'frames' (fotogramas procesados con Holistic), 'detection_seconds',
+    'decode_seconds' (lectura y decodificación con OpenCV) y 'frame_seconds' (el tiempo de
+    Holistic de cada fotograma, para las métricas), y se guarda 'fps' (fotogramas por segundo
+    declarados por el contenedor, None si no los declara). Si el video se vuelve a muestrear,
+    solo se acumula la segunda lectura.
+    """
+    if mp_holistic is None:
+        raise RuntimeError("MediaPipe no está disponible. Asegúrate de que la biblioteca esté instalada correctamente.")
+    if type_extract not in ('hands', 'pose_hands'):
+        # Esto ya se valida antes en el endpoint, pero es una buena práctica aquí también
+        raise ValueError("El tipo de extracción enviado no existe debe ser 'hands' o 'pose_hands'.")
     
-    cap = cv2.VideoCapture(url_video) # Usa url_video directamente
+    cap = cv2.VideoCapture(url_video, api_preference) # Usa url_video directamente
     if not cap.isOpened():
         print(f"Error: No se pudo abrir el video desde la URL: {url_video}")
         return None # O lanzar una excepción específica
 
-    sequence_keypoints = []
+    write_keypoints = write_keypoints_hands if type_extract == 'hands' else write_keypoints_pose_hands
+    fps = cap.get(cv2.CAP_PROP_FPS) or None
+    detection_seconds = 0.0
+    frame_seconds = []
+    processed_frames = 0
 
-    with mp_holistic.Holistic(static_image_mode=False, model_complexity=1, smooth_landmarks=True, enable_segmentation=False, min_detection_confidence=0.5, min_tracking_confidence=0.5) as holistic:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break # Sale del bucle cuando no hay más frames o hay un error de lectura
-
-            image, results = mediapipe_detection(frame, holistic)
-            
-            if type_extract == 'hands':
-                keypoints = extract_keypoints_hands(results)
-            elif type_extract == 'pose_hands':
-                keypoints = extract_keypoints_pose_hands(results)
-            else:
-                # Esto ya se valida antes en el endpoint, pero es una buena práctica aquí también
-                raise ValueError("El tipo de extracción enviado no existe debe ser 'hands' o 'pose_hands'.") 
-            
-            sequence_keypoints.append(keypoints)
-    
-    cap.release() # Cierra el objeto de captura de video
-    cv2.destroyAllWindows() # Cierra las ventanas de OpenCV, si se abrieron
+    # Selección de fotogramas a partir del conteo declarado por el contenedor
+    keep_frames = process_frames = None
+    if target_frames is not None and VIDEO_SAMPLED_EXTRACTION:
+        declared_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if total_frames is None else total_frames
+        if declared_frames > target_frames:
+            keep_frames, process_frames = select_frames(declared_frames, target_frames, tracking_neighborhood)
+            keep_frames = set(keep_frames.tolist())
+
+    # Buffer de keypoints: una fila por fotograma conservado. Si el contenedor no declara el
+    # número de fotogramas (o declara menos de los que tiene), crece al doble cuando se llena.
+    if keep_frames is not None:
+        capacity = len(keep_frames)
+    else:
+        capacity = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0) or VIDEO_BUFFER_INITIAL_FRAMES
+    sequence_keypoints = np.zeros((capacity, FEATURES_BY_TYPE[type_extract]), dtype=np.float32)
+    num_keypoints = 0
+
+    owns_holistic = holistic is None
+    if owns_holistic:
+        holistic = create_holistic(model_complexity)
+    else:
+        # El video anterior no debe influir en el seguimiento de este
+        holistic.reset()
+
+    read_frames = iter_frames_threaded if VIDEO_PARALLEL_DECODE else iter_frames
+    timings = {'decode_seconds': 0.0}
+    frames = read_frames(cap, process_frames, timings)
+    detection_input = DetectionInput(max_side, roi_crop)
+    try:
+        for frame_index, frame in frames:
+            # El recorte, la reducción y la conversión a RGB reutilizan sus buffers: ninguna
+            # imagen nueva por fotograma mientras no cambie la resolución
+            start = time.perf_counter()
+            results = detection_input.detect(frame, holistic)
+            elapsed = time.perf_counter() - start
+            detection_seconds += elapsed
+            frame_seconds.append(elapsed)
+            processed_frames += 1
+
+            # Los keypoints de los fotogramas conservados se escriben en la secuencia a medida que se producen
+            if keep_frames is None or frame_index in keep_frames:
+                if num_keypoints == len(sequence_keypoints):
+                    sequence_keypoints = np.concatenate([sequence_keypoints, np.zeros_like(sequence_keypoints)])
+                write_keypoints(results, sequence_keypoints[num_keypoints])
+                detection_input.to_frame(results, sequence_keypoints[num_keypoints])
+                num_keypoints += 1
+            detection_input.update_roi(results)
+    finally:
+        # Cerrar el generador detiene el hilo de decodificación antes de liberar la captura
+        frames.close()
+        if owns_holistic:
+            holistic.close()
+        cap.release() # Cierra el objeto de captura de video
+        cv2.destroyAllWindows() # Cierra las ventanas de OpenCV, si se abrieron
+    decode_seconds = timings['decode_seconds']
+
+    keypoints = sequence_keypoints[:num_keypoints]
+    frames_read = timings.get('end_of_video')
+    if keep_frames is not None and num_keypoints < len(keep_frames) and frames_read is not None and total_frames is None:
+        # El contenedor declaró más fotogramas de los que tiene: el muestreo se quedó corto
+        print(f"El video {url_video} declara {declared_frames} fotogramas pero tiene {frames_read}; se vuelve a muestrear.")
+        if not (os.path.exists(url_video) and stat.S_ISFIFO(os.stat(url_video).st_mode)):
+            resampled = process_video_sign(type_extract, url_video, holistic=None if owns_holistic else holistic, stats=stats,
+                                           target_frames=target_frames, tracking_neighborhood=tracking_neighborhood,
+                                           api_preference=api_preference, max_side=max_side, roi_crop=roi_crop,
+                                           model_complexity=model_complexity, total_frames=frames_read)
+            if resampled is not None:
+                return resampled # `stats` solo recoge la segunda lectura, la que produce los keypoints
+        if num_keypoints > 0:
+            # Sin otra lectura: se reparten los keypoints obtenidos sobre `target_frames` para no rellenar con ceros
+            keypoints = sequence_keypoints[np.linspace(0, num_keypoints - 1, min(target_frames, frames_read)).astype(int)]
+
+    if stats is not None:
+        stats['frames'] = stats.get('frames', 0) + processed_frames
+        stats['detection_seconds'] = stats.get('detection_seconds', 0.0) + detection_seconds
+        stats['decode_seconds'] = stats.get('decode_seconds', 0.0) + decode_seconds
+        stats.setdefault('frame_seconds', []).extend(frame_seconds)
+        stats['fps'] = fps
 
-    return sequence_keypoints
\ No newline at end of file
+    return keypoints